@@ -0,0 +1,41 @@
+from models.backup_model import BackupModel
+
+
+class BackupController:
+    def __init__(self, plugin_name, data_directory):
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.model = BackupModel(plugin_name, data_directory)
+
+    def create_backup(self, *args, **kwargs):
+        """立即创建快照，db_name 为空时备份全部数据库"""
+        try:
+            db_name = kwargs.get('db_name')
+            results = self.model.create_snapshot(db_name)
+            success = all(item['success'] for item in results)
+            return {
+                'success': success,
+                'data': results,
+                'message': '快照创建成功' if success else '部分快照创建失败'
+            }
+        except Exception as e:
+            return {'success': False, 'message': f'快照创建失败：{str(e)}'}
+
+    def get_backup_list(self, *args, **kwargs):
+        """获取快照列表"""
+        try:
+            db_name = kwargs.get('db_name')
+            return {'success': True, 'data': self.model.get_snapshots(db_name)}
+        except Exception as e:
+            return {'success': False, 'message': f'获取快照列表失败：{str(e)}'}
+
+    def restore_backup(self, *args, **kwargs):
+        """从快照恢复数据库"""
+        snapshot = kwargs.get('snapshot')
+        if not snapshot:
+            return {'success': False, 'message': '请选择要恢复的快照'}
+        try:
+            result = self.model.restore_snapshot(snapshot)
+            return {'success': True, 'data': result, 'message': '恢复成功'}
+        except Exception as e:
+            return {'success': False, 'message': f'恢复失败：{str(e)}'}
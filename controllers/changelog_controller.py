@@ -0,0 +1,22 @@
+from models.changelog_model import ChangeLogModel
+
+
+class ChangelogController:
+    def __init__(self, plugin_name, data_directory):
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.model = ChangeLogModel(plugin_name, data_directory)
+
+    def get_changes(self, *args, **kwargs):
+        """
+        获取 since_seq 之后的增量变更
+        :param kwargs: since_seq 上次同步到的序号，tables 需要的表名列表，limit 单次最多条数
+        """
+        try:
+            since_seq = int(kwargs.get('since_seq', 0) or 0)
+            tables = kwargs.get('tables') or None
+            limit = int(kwargs.get('limit', 500))
+            result = self.model.get_changes(since_seq, tables, limit)
+            return {'success': True, 'data': result}
+        except Exception as e:
+            return {'success': False, 'data': f'获取变更失败：{str(e)}'}
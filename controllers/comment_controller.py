@@ -1,7 +1,10 @@
 from models.comment_model import CommentModel
 from models.accountmanage_model import AccountmanageModel
+from models.changelog_model import ChangeLogModel
 from utils.task_progress_manager import TaskProgressManager
 from utils.example_util import ExampleUtil
+from utils.ingest_pipeline import IngestPipeline
+from utils.rate_limiter import RateLimiter, DEFAULT_RATE_PER_MINUTE
 
 
 class CommentController:
@@ -10,6 +13,7 @@ class CommentController:
         self.data_directory = data_directory
         self.model = CommentModel(plugin_name, data_directory)
         self.account_model = AccountmanageModel(plugin_name, data_directory)
+        self.changelog_model = ChangeLogModel(plugin_name, data_directory)
 
     def add_comment(self, *args, **kwargs):
         link = kwargs.get('link')
@@ -26,7 +30,12 @@ class CommentController:
         page = int(kwargs.get('page', 1))
         page_size = int(kwargs.get('page_size', 10))
         keyword = kwargs.get('keyword', '')
-        result = self.model.get_comments(page, page_size, keyword)
+        # 勾选“包含历史”时才检索归档库
+        include_history = kwargs.get('include_history') in (True, 1, '1', 'true')
+        # 先取变更序号再查询，前端从该序号开始增量同步不会漏数据
+        last_seq = self.changelog_model.get_last_seq()
+        result = self.model.get_comments(page, page_size, keyword, include_history)
+        result['last_seq'] = last_seq
         return {'success': True, 'data': result}
 
     def update_comment(self, *args, **kwargs):
@@ -64,6 +73,8 @@ class CommentController:
         try:
             keyword = kwargs.get('keyword', '').strip()
             account_id = kwargs.get('account_id', '').strip()
+            lean_mode = kwargs.get('lean_mode') in (True, 1, '1', 'true')
+            rate_per_minute = float(kwargs.get('rate_per_minute') or DEFAULT_RATE_PER_MINUTE)
             if not keyword:
                 return {'success': False, 'data': '关键词不能为空'}
             if not account_id:
@@ -77,40 +88,43 @@ class CommentController:
             username = account.get('username')
 
             # 进度管理（可选，用于控制窗口展示）
-            task_progress = TaskProgressManager()
+            task_progress = TaskProgressManager(self.plugin_name, self.data_directory)
             task_progress.init_task('评论采集')
-            task_progress.update_status(f'开始按关键词采集：{keyword} ...')
-
-            collected_count = 0
+            task_progress.update_progress(processed=0, stage='采集', status_text=f'开始按关键词采集：{keyword} ...')
 
             # 设置采集工具与回调，收到批量数据时写入评论表
-            util = ExampleUtil(self.data_directory)
+            util = ExampleUtil(self.data_directory, lean_mode=lean_mode, streaming=True)
+
+            # 写线程批量入库，每批写完刷新控制窗口进度和吞吐统计
+            def on_flush(stats):
+                task_progress.update_progress(processed=stats['written'], status_text=f"已保存 {stats['written']} 条", metrics=stats)
+            pipeline = IngestPipeline(self.model.add_comments, on_flush=on_flush, name='comment')
 
             def on_batch(data):
-                nonlocal collected_count
                 videos = data.get('videos') or []
                 if not videos:
                     return True
-                for v in videos:
-                    link = v.get('link') or ''
-                    title = v.get('title') or ''
-                    author = v.get('author') or ''
-                    # 将视频信息映射为一条“评论”记录（示例：内容用标题占位）
-                    try:
-                        self.model.add_comment(link=link, content=title, comment_time=None, author=author, ip=None)
-                        collected_count += 1
-                        task_progress.update_status(f"已保存 {collected_count} 条: {title[:20]}")
-                    except Exception as e:
-                        task_progress.update_status(f"保存出错: {str(e)[:30]}")
+                # 将视频信息映射为“评论”记录（示例：内容用标题占位），只入队不写库
+                pipeline.put([{
+                    'link': v.get('link') or '',
+                    'content': v.get('title') or '',
+                    'author': v.get('author') or ''
+                } for v in videos])
                 return True
 
             util.set_callback(on_batch)
+            # 与其他采集进程共用该账号的限流桶
+            util.set_rate_limiter(RateLimiter.for_account(self.data_directory, platform_name, username, rate_per_minute))
 
-            # 启动浏览器采集（内部会不断滚动触发接口响应，回调逐批写库）
-            util.get_douyinlink_list(keyword, platform_name, username)
+            # 启动浏览器采集（内部会不断滚动触发接口响应，回调逐批入队）
+            try:
+                util.get_douyinlink_list(keyword, platform_name, username)
+            finally:
+                ingest_stats = pipeline.close()
+            collected_count = ingest_stats['written']
 
             task_progress.complete_task(f'采集完成，共保存 {collected_count} 条')
-            return {'success': True, 'data': f'采集任务完成，已保存 {collected_count} 条'}
+            return {'success': True, 'data': f'采集任务完成，已保存 {collected_count} 条', 'stats': util.get_stats(), 'ingest': ingest_stats}
 
         except Exception as e:
             return {'success': False, 'data': f'采集失败：{str(e)}'}
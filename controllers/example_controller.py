@@ -1,8 +1,21 @@
+import functools
+from pathlib import Path
+import threading
 from models.example_model import ExampleModel
 from utils.example_util import ExampleUtil
 from utils.task_progress_manager import TaskProgressManager
 from models.accountmanage_model import AccountmanageModel
+from models.changelog_model import ChangeLogModel
+from models.account_lease_model import AccountLeaseModel
+from models.checkpoint_model import CheckpointModel
+from models.known_video_model import KnownVideoModel
 from utils.enhanced_control import with_enhanced_control
+from utils.ingest_pipeline import IngestPipeline
+from utils.rate_limiter import RateLimiter, DEFAULT_RATE_PER_MINUTE
+from utils.search_replay import SearchRecorder
+from utils.response_archive import ResponseArchive
+from utils.browser_pool import BrowserPool
+from utils.cancellation import current_token, bind_token
 
 
 class ExampleController():
@@ -11,6 +24,10 @@ class ExampleController():
         self.data_directory=data_directory
         self.model = ExampleModel(plugin_name,data_directory)
         self.account_model = AccountmanageModel(plugin_name,data_directory)
+        self.changelog_model = ChangeLogModel(plugin_name,data_directory)
+        self.lease_model = AccountLeaseModel(plugin_name,data_directory)
+        self.checkpoint_model = CheckpointModel(plugin_name,data_directory)
+        self.known_model = KnownVideoModel(plugin_name,data_directory)
         self.initialize()
        
     def initialize(self):
@@ -31,8 +48,13 @@ class ExampleController():
         page = int(kwargs.get('page', 1))
         page_size = int(kwargs.get('page_size', 10))
         keyword = kwargs.get('keyword', '')
+        # 勾选“包含历史”时才检索归档库
+        include_history = kwargs.get('include_history') in (True, 1, '1', 'true')
         
-        result = self.model.get_items(page, page_size, keyword)
+        # 先取变更序号再查询，前端从该序号开始增量同步不会漏数据
+        last_seq = self.changelog_model.get_last_seq()
+        result = self.model.get_items(page, page_size, keyword, include_history)
+        result['last_seq'] = last_seq
         
         return {'success': True, 'data': result}
     
@@ -60,6 +82,70 @@ class ExampleController():
         
         self.model.batch_delete_items(ids)
         return {'success': True, 'data': '批量删除成功'}
+
+
+    def _create_ingest_pipeline(self, task_progress, keyword=None):
+        """
+        采集结果入库流水线：回调只负责入队，写线程批量写库并刷新控制窗口的进度和吞吐统计
+        入库的同时把视频ID记到关键词的高水位表（视频自带 keyword 时以视频为准），供增量采集使用
+        """
+        def writer(items):
+            self.model.add_items(items)
+            ids_by_keyword = {}
+            for item in items:
+                item_keyword = item.get('keyword') or keyword
+                if item_keyword and item.get('aweme_id'):
+                    ids_by_keyword.setdefault(item_keyword, []).append(item['aweme_id'])
+            for item_keyword, aweme_ids in ids_by_keyword.items():
+                self.known_model.add_known_ids(item_keyword, aweme_ids)
+
+        def on_flush(stats):
+            task_progress.update_progress(processed=stats['written'], status_text=f"已采集 {stats['written']} 个视频", metrics=stats)
+
+        return IngestPipeline(writer, on_flush=on_flush, name='example')
+
+
+    def _hold_leases(self, func, lease_ids):
+        """
+        采集函数运行期间持有账号租约，结束后归还
+        with_enhanced_control 启动工作线程后立即返回，租约必须在工作线程里归还
+        采集可能超过租约有效期，持有期间每 ttl/3 续约一次，避免被其他任务当作超时租约清理
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            done = threading.Event()
+
+            def renew():
+                while not done.wait(self.lease_model.ttl / 3):
+                    for lease_id in lease_ids:
+                        try:
+                            self.lease_model.renew(lease_id)
+                        except Exception as e:
+                            print(f"租约 {lease_id} 续约失败: {e}")
+
+            threading.Thread(target=renew, daemon=True).start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                done.set()
+                self._release_leases(lease_ids)
+        return wrapper
+
+    def _release_leases(self, lease_ids):
+        """归还租约，任务没能启动时由调用方直接调用"""
+        for lease_id in lease_ids:
+            try:
+                self.lease_model.release(lease_id)
+            except Exception as e:
+                print(f"租约 {lease_id} 归还失败: {e}")
+
+
+    def _attach_response_archive(self, example_util):
+        """把原始搜索响应追加写入归档，之后可用 utils/response_archive.py 离线重新提取字段"""
+        archive_dir = Path(self.data_directory) / 'Archive' / 'Responses' / self.plugin_name
+        response_archive = ResponseArchive(archive_dir)
+        example_util.add_response_sink(response_archive)
+        return response_archive
     
     
     
@@ -69,9 +155,28 @@ class ExampleController():
         :param kwargs: 包含 keyword 参数
         :return: 返回采集结果
         """
+        # 租约在工作线程启动前出错时由 except 归还
+        lease_ids = []
         try:
             keyword = kwargs.get('keyword', '')
             account_id = kwargs.get('account_id', '')
+            # 精简模式：无头运行并拦截媒体资源
+            lean_mode = kwargs.get('lean_mode') in (True, 1, '1', 'true')
+            # 归档原始搜索响应
+            archive_raw = kwargs.get('archive_raw') in (True, 1, '1', 'true')
+            # 每个账号每分钟最多滚动次数，所有进程共享
+            rate_per_minute = float(kwargs.get('rate_per_minute') or DEFAULT_RATE_PER_MINUTE)
+            # 借用账号的常驻浏览器，采集结束只关闭标签页
+            use_browser_pool = kwargs.get('use_browser_pool') in (True, 1, '1', 'true')
+            # 从上次未完成的断点继续
+            resume = kwargs.get('resume') in (True, 1, '1', 'true')
+            # 增量采集：连续 known_stop_after 批都是以前采过的视频就停止
+            incremental = kwargs.get('incremental') in (True, 1, '1', 'true')
+            known_stop_after = int(kwargs.get('known_stop_after') or 3)
+            # 录制搜索接口原始响应，供 utils/search_replay.py 离线回放
+            record_dir = kwargs.get('record_dir')
+            # 采集引擎：browser 浏览器滚动；http 用导出的会话直接请求搜索接口，被拒绝时自动改用浏览器
+            engine = kwargs.get('engine') or 'browser'
             
             if not keyword:
                 return {'success': False, 'data': '关键词不能为空'}
@@ -81,13 +186,16 @@ class ExampleController():
                 return {'success': False, 'data': '账号ID不能为空'}
             
             
-             # 获取账号信息
-            account = self.account_model.get_account_by_id(account_id)
+             # 租用账号，防止与其他任务同时打开同一个浏览器用户目录
+            account = self.lease_model.acquire(f"采集: {keyword}", account_id=account_id)
+            if account is None:
+                return {'success': False, 'data': '该账号未登录、已停用或正被其他采集任务使用'}
+            lease_ids.append(account['lease_id'])
             platform_name = account.get('platform_name')
             username = account.get('username')
             
             # 🚀 创建任务进度管理器
-            task_progress = TaskProgressManager()
+            task_progress = TaskProgressManager(self.plugin_name, self.data_directory)
             
             # 使用装饰器处理批量采集 - 整个批量操作使用一次装饰器
             def process_collection_batch(keyword, platform_name, username):
@@ -99,41 +207,65 @@ class ExampleController():
                 # 🚀 更新初始状态
                 task_progress.update_status(f"正在初始化采集: {keyword}...")
                 
-                # 简化的回调函数
+                # 回调只入队，由写线程批量入库，避免磁盘慢拖住页面事件处理
+                pipeline = self._create_ingest_pipeline(task_progress, keyword)
                 def collection_callback(data):
-                    nonlocal collected_count
                     if 'videos' in data and data['videos']:
-                        try:
-                            batch_videos = data['videos']
-                            for video in batch_videos:
-                                self.add_item(title=video['title'], link=video['link'], author=video['author'])
-                                collected_count += 1
-                                
-                                # 🚀 实时更新采集进度
-                                task_progress.update_status(f"已采集 {collected_count} 个视频: {video['title'][:20]}...")
-                                
-                            print(f"已采集 {collected_count} 个视频")
-                        except Exception as e:
-                            print(f"处理采集回调时出错: {str(e)}")
-                            # 🚀 显示错误状态
-                            task_progress.update_status(f"⚠️ 处理出错: {str(e)[:20]}...")
+                        pipeline.put(data['videos'])
                     return True
                 
                 # 初始化抖音链接工具
-                example_util = ExampleUtil(self.data_directory)
+                example_util = ExampleUtil(self.data_directory, lean_mode=lean_mode, streaming=True)
                 example_util.set_callback(collection_callback)
+                example_util.set_rate_limiter(RateLimiter.for_account(self.data_directory, platform_name, username, rate_per_minute))
+                if use_browser_pool:
+                    example_util.set_browser_pool(BrowserPool(self.data_directory))
+                
+                # 断点：定期保存游标和已见视频，结束时标记完成或中断
+                if resume:
+                    checkpoint = self.checkpoint_model.get_checkpoint(keyword, platform_name, username)
+                    if checkpoint and checkpoint['status'] != 'completed':
+                        example_util.resume_from(checkpoint)
+                        task_progress.update_status(f"从断点继续: 已采集 {checkpoint['seen_count']} 个视频...")
+                def on_checkpoint(state):
+                    if state['completed']:
+                        status = 'completed'
+                    else:
+                        status = 'stopped' if state['final'] else 'running'
+                    self.checkpoint_model.save_checkpoint(
+                        keyword, platform_name, username,
+                        state['cursor'], state.get('seen_ids'), state['counters'], status,
+                        seen_filter=state.get('seen_filter'), seen_count=state['seen_count']
+                    )
+                example_util.set_checkpoint_callback(on_checkpoint)
+                
+                if incremental:
+                    example_util.set_known_ids(self.known_model.get_known_ids(keyword), known_stop_after)
+                
+                if record_dir:
+                    example_util.add_response_sink(SearchRecorder(record_dir))
+                response_archive = self._attach_response_archive(example_util) if archive_raw else None
                 
                 # 🚀 更新开始采集状态
-                task_progress.update_status(f"开始采集关键词: {keyword}...")
+                task_progress.update_progress(processed=0, stage='采集', status_text=f"开始采集关键词: {keyword}...")
                 print(f"开始采集关键词: {keyword}")
                 
                 try:
                     # 调用采集方法（这里不再使用装饰器，因为已经在外层使用了）
-                    videos = example_util.get_douyinlink_list(
-                        keyword, 
-                        platform_name, 
-                        username
-                    )
+                    try:
+                        if engine == 'http':
+                            videos = example_util.get_douyinlink_list_http(keyword, platform_name, username)
+                        else:
+                            videos = example_util.get_douyinlink_list(
+                                keyword, 
+                                platform_name, 
+                                username
+                            )
+                    finally:
+                        if response_archive:
+                            response_archive.close()
+                    ingest_stats = pipeline.close()
+                    collected_count = ingest_stats['written']
                     
                     # 🚀 任务完成 - 简化显示
                     final_message = f'🎉 采集完成！共采集 {collected_count} 个视频'
@@ -144,10 +276,13 @@ class ExampleController():
                     return {
                         'success': True, 
                         'collected_count': collected_count,
-                        'message': f'采集完成，共采集 {collected_count} 个视频'
+                        'message': f'采集完成，共采集 {collected_count} 个视频',
+                        'stats': example_util.get_stats(),
+                        'ingest': ingest_stats
                     }
                     
                 except Exception as e:
+                    collected_count = pipeline.close()['written']
                     # 🚀 采集失败状态
                     error_message = f'❌ 采集失败: {str(e)[:50]}...'
                     print(f"采集失败: {str(e)}")
@@ -162,14 +297,270 @@ class ExampleController():
                     }
             
             # 使用装饰器执行整个批量任务
-            result = with_enhanced_control(process_collection_batch)(keyword, platform_name, username)
-            
-            
+            result = with_enhanced_control(
+                self._hold_leases(process_collection_batch, lease_ids)
+            )(keyword, platform_name, username)
+            if not result.get('success'):
+                self._release_leases(lease_ids)
+                return {'success': False, 'data': f"采集失败: {result.get('error')}"}
             
             return {'success': True, 'data': '采集任务已开始'}
             
         except Exception as e:
             print(f"collect_links error: {str(e)}")
+            self._release_leases(lease_ids)
             return {'success': False, 'data': f'采集失败: {str(e)}'}
             
-    
\ No newline at end of file
+    
+
+    def collect_links_batch(self, *args, **kwargs):
+        """
+        多关键词批量采集
+        :param kwargs: keywords 关键词列表或以逗号/换行分隔的字符串，account_id，concurrency 并发标签页数，lean_mode
+        :return: 返回采集结果
+        """
+        lease_ids = []
+        try:
+            keywords = kwargs.get('keywords', [])
+            if isinstance(keywords, str):
+                keywords = keywords.replace('，', ',').replace('\n', ',').split(',')
+            keywords = [keyword.strip() for keyword in keywords if keyword and keyword.strip()]
+            account_id = kwargs.get('account_id', '')
+            concurrency = int(kwargs.get('concurrency') or 3)
+            lean_mode = kwargs.get('lean_mode') in (True, 1, '1', 'true')
+            # 归档原始搜索响应
+            archive_raw = kwargs.get('archive_raw') in (True, 1, '1', 'true')
+            # 每个账号每分钟最多滚动次数，所有进程共享
+            rate_per_minute = float(kwargs.get('rate_per_minute') or DEFAULT_RATE_PER_MINUTE)
+            # 借用账号的常驻浏览器，采集结束只关闭标签页
+            use_browser_pool = kwargs.get('use_browser_pool') in (True, 1, '1', 'true')
+
+            if not keywords:
+                return {'success': False, 'data': '关键词不能为空'}
+
+            if not account_id:
+                return {'success': False, 'data': '账号ID不能为空'}
+
+            account = self.lease_model.acquire(f"批量采集: {len(keywords)} 个关键词", account_id=account_id)
+            if account is None:
+                return {'success': False, 'data': '该账号未登录、已停用或正被其他采集任务使用'}
+            lease_ids.append(account['lease_id'])
+            platform_name = account.get('platform_name')
+            username = account.get('username')
+
+            task_progress = TaskProgressManager(self.plugin_name, self.data_directory)
+
+            def process_collection_batch(keywords, platform_name, username):
+                collected_count = 0
+                task_progress.init_task("批量采集")
+                task_progress.update_status(f"正在初始化采集: {len(keywords)} 个关键词...")
+
+                # 所有标签页的结果都经过这一个回调进入同一条入库流水线
+                pipeline = self._create_ingest_pipeline(task_progress)
+                def collection_callback(data):
+                    if 'videos' in data and data['videos']:
+                        pipeline.put(data['videos'])
+                    return True
+
+                example_util = ExampleUtil(self.data_directory, lean_mode=lean_mode, streaming=True)
+                example_util.set_callback(collection_callback)
+                example_util.set_rate_limiter(RateLimiter.for_account(self.data_directory, platform_name, username, rate_per_minute))
+                if use_browser_pool:
+                    example_util.set_browser_pool(BrowserPool(self.data_directory))
+                response_archive = self._attach_response_archive(example_util) if archive_raw else None
+                task_progress.update_progress(processed=0, stage='采集', status_text=f"开始采集关键词: {'、'.join(keywords)[:30]}...")
+
+                try:
+                    try:
+                        example_util.get_douyinlink_list_batch(keywords, platform_name, username, concurrency)
+                    finally:
+                        if response_archive:
+                            response_archive.close()
+                    ingest_stats = pipeline.close()
+                    collected_count = ingest_stats['written']
+
+                    final_message = f'🎉 采集完成！{len(keywords)} 个关键词共采集 {collected_count} 个视频'
+                    print(final_message)
+                    task_progress.complete_task(final_message)
+
+                    return {
+                        'success': True,
+                        'collected_count': collected_count,
+                        'message': final_message,
+                        'stats': example_util.get_stats(),
+                        'ingest': ingest_stats
+                    }
+
+                except Exception as e:
+                    collected_count = pipeline.close()['written']
+                    error_message = f'❌ 采集失败: {str(e)[:50]}...'
+                    print(f"批量采集失败: {str(e)}")
+                    task_progress.update_status(error_message)
+                    task_progress.complete_task(error_message)
+
+                    return {
+                        'success': False,
+                        'collected_count': collected_count,
+                        'error': str(e)
+                    }
+
+            result = with_enhanced_control(
+                self._hold_leases(process_collection_batch, lease_ids)
+            )(keywords, platform_name, username)
+            if not result.get('success'):
+                self._release_leases(lease_ids)
+                return {'success': False, 'data': f"批量采集失败: {result.get('error')}"}
+
+            return {'success': True, 'data': '批量采集任务已开始'}
+
+        except Exception as e:
+            print(f"collect_links_batch error: {str(e)}")
+            self._release_leases(lease_ids)
+            return {'success': False, 'data': f'批量采集失败: {str(e)}'}
+
+
+    def collect_links_parallel(self, *args, **kwargs):
+        """
+        多账号并行采集：租用多个空闲账号，把关键词平均分给各账号，每个账号一个浏览器同时采集
+        :param kwargs: keywords，max_accounts 最多使用的账号数，concurrency 每个账号的并发标签页数，
+                       require_login 是否只使用已登录账号，lean_mode
+        :return: 返回采集结果
+        """
+        lease_ids = []
+        try:
+            keywords = kwargs.get('keywords', [])
+            if isinstance(keywords, str):
+                keywords = keywords.replace('，', ',').replace('\n', ',').split(',')
+            keywords = list(dict.fromkeys(keyword.strip() for keyword in keywords if keyword and keyword.strip()))
+            max_accounts = int(kwargs.get('max_accounts') or len(keywords))
+            concurrency = int(kwargs.get('concurrency') or 3)
+            require_login = kwargs.get('require_login', True) in (True, 1, '1', 'true')
+            lean_mode = kwargs.get('lean_mode') in (True, 1, '1', 'true')
+            # 归档原始搜索响应
+            archive_raw = kwargs.get('archive_raw') in (True, 1, '1', 'true')
+            # 每个账号每分钟最多滚动次数，所有进程共享
+            rate_per_minute = float(kwargs.get('rate_per_minute') or DEFAULT_RATE_PER_MINUTE)
+            # 借用账号的常驻浏览器，采集结束只关闭标签页
+            use_browser_pool = kwargs.get('use_browser_pool') in (True, 1, '1', 'true')
+
+            if not keywords:
+                return {'success': False, 'data': '关键词不能为空'}
+
+            accounts = self.lease_model.acquire_many(
+                f"并行采集: {len(keywords)} 个关键词",
+                min(max_accounts, len(keywords)),
+                require_login=require_login
+            )
+            if not accounts:
+                return {'success': False, 'data': '没有空闲的已登录账号'}
+            lease_ids.extend(account['lease_id'] for account in accounts)
+
+            task_progress = TaskProgressManager(self.plugin_name, self.data_directory)
+
+            def process_parallel_collection(keywords, accounts):
+                results = {}
+                # 账号线程绑定同一个取消令牌，停止/暂停对所有账号同时生效
+                token = current_token()
+                task_progress.init_task("并行采集")
+                task_progress.update_progress(processed=0, stage='采集', status_text=f"{len(accounts)} 个账号并行采集 {len(keywords)} 个关键词...")
+
+                # 各账号线程共用一条入库流水线
+                pipeline = self._create_ingest_pipeline(task_progress)
+                def collection_callback(data):
+                    if 'videos' in data and data['videos']:
+                        pipeline.put(data['videos'])
+                    return True
+
+                def run_account(account, account_keywords):
+                    with bind_token(token):
+                        username = account.get('username')
+                        try:
+                            example_util = ExampleUtil(self.data_directory, lean_mode=lean_mode, streaming=True)
+                            example_util.set_callback(collection_callback)
+                            example_util.set_rate_limiter(RateLimiter.for_account(
+                                self.data_directory, account.get('platform_name'), username, rate_per_minute
+                            ))
+                            if use_browser_pool:
+                                example_util.set_browser_pool(BrowserPool(self.data_directory))
+                            # 每个账号线程各写自己的归档分段
+                            response_archive = self._attach_response_archive(example_util) if archive_raw else None
+                            try:
+                                example_util.get_douyinlink_list_batch(
+                                    account_keywords, account.get('platform_name'), username, concurrency
+                                )
+                            finally:
+                                if response_archive:
+                                    response_archive.close()
+                            results[username] = {'success': True, 'keywords': account_keywords, 'stats': example_util.get_stats()}
+                        except Exception as e:
+                            print(f"账号 {username} 采集失败: {str(e)}")
+                            results[username] = {'success': False, 'keywords': account_keywords, 'error': str(e)}
+
+                # 关键词轮流分配给各账号
+                threads = []
+                for index, account in enumerate(accounts):
+                    account_keywords = keywords[index::len(accounts)]
+                    print(f"账号 {account.get('username')} 分配关键词: {account_keywords}")
+                    thread = threading.Thread(target=run_account, args=(account, account_keywords), daemon=True)
+                    thread.start()
+                    threads.append(thread)
+
+                # 用令牌睡眠轮询等待，停止时立即退出等待；账号线程各自在令牌上响应停止
+                try:
+                    while any(thread.is_alive() for thread in threads):
+                        token.sleep(0.5)
+                finally:
+                    ingest_stats = pipeline.close()
+                collected_count = ingest_stats['written']
+
+                final_message = f'🎉 采集完成！{len(accounts)} 个账号共采集 {collected_count} 个视频'
+                print(final_message)
+                task_progress.complete_task(final_message)
+                return {'success': True, 'collected_count': collected_count, 'message': final_message, 'accounts': results, 'ingest': ingest_stats}
+
+            result = with_enhanced_control(
+                self._hold_leases(process_parallel_collection, lease_ids)
+            )(keywords, accounts)
+            if not result.get('success'):
+                self._release_leases(lease_ids)
+                return {'success': False, 'data': f"并行采集失败: {result.get('error')}"}
+
+            return {'success': True, 'data': f'并行采集任务已开始，使用 {len(accounts)} 个账号'}
+
+        except Exception as e:
+            print(f"collect_links_parallel error: {str(e)}")
+            self._release_leases(lease_ids)
+            return {'success': False, 'data': f'并行采集失败: {str(e)}'}
+
+
+    def get_account_leases(self, *args, **kwargs):
+        """查看当前账号租用情况"""
+        try:
+            return {'success': True, 'data': self.lease_model.get_leases()}
+        except Exception as e:
+            return {'success': False, 'data': f'获取账号租用情况失败: {str(e)}'}
+
+
+    def get_checkpoints(self, *args, **kwargs):
+        """采集断点列表，可按 status 筛选（running/stopped/completed）"""
+        try:
+            return {'success': True, 'data': self.checkpoint_model.get_checkpoints(kwargs.get('status'))}
+        except Exception as e:
+            return {'success': False, 'data': f'获取采集断点失败: {str(e)}'}
+
+
+    def get_browser_pool(self, *args, **kwargs):
+        """查看常驻浏览器池的状态"""
+        try:
+            return {'success': True, 'data': BrowserPool(self.data_directory).get_status()}
+        except Exception as e:
+            return {'success': False, 'data': f'获取浏览器池状态失败: {str(e)}'}
+
+
+    def close_browser_pool(self, *args, **kwargs):
+        """关闭所有空闲的常驻浏览器"""
+        try:
+            closed = BrowserPool(self.data_directory).shutdown_all()
+            return {'success': True, 'data': f'已关闭 {closed} 个常驻浏览器'}
+        except Exception as e:
+            return {'success': False, 'data': f'关闭常驻浏览器失败: {str(e)}'}
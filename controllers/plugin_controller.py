@@ -13,6 +13,8 @@ from pathlib import Path
 import json
 import threading
 from utils.main_process_control_window import MainProcessControlWindow
+from utils.process_group import ProcessGroup
+from utils.task_scheduler import start_main_scheduler
 
 class PluginController:
     def __init__(self):
@@ -25,9 +27,23 @@ class PluginController:
         self.user_id="10032"
         self.data_directory=self.data_directory+"\\"+self.user_id
         print("data_directory============="+self.data_directory)
+        # 主进程常驻的调度器：数据库维护、快照、归档、回收常驻浏览器等内置任务在这里定时执行
+        # runner 子进程随调用结束退出，不能承担定时任务
+        try:
+            self.scheduler = start_main_scheduler(self.get_plugin_name(), self.data_directory)
+        except Exception as e:
+            self.scheduler = None
+            print(f"启动内置定时任务失败: {e}")
         print("PluginController initialized")
         
 
+    def get_plugin_name(self):
+        """插件名称（manifest.json 的 plugin_name）"""
+        manifest_path = Path(__file__).parent.parent / 'manifest.json'
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('plugin_name', '')
+        
+
     def handle_api_call(self, *args, **kwargs):
         """处理API调用 - 完全透传"""
         print(f"中间层收到 args: {args}")
@@ -41,10 +57,7 @@ class PluginController:
             
             # 🚀 添加系统参数到kwargs中
             if not kwargs.get('plugin_name'):
-                manifest_path = Path(__file__).parent.parent / 'manifest.json'
-                with open(manifest_path, 'r', encoding='utf-8') as f:
-                    manifest = json.load(f)
-                    kwargs['plugin_name'] = manifest.get('plugin_name', '')
+                kwargs['plugin_name'] = self.get_plugin_name()
             
             
             
@@ -96,8 +109,8 @@ class PluginController:
         
         print(f"启动子进程命令: {cmd}")
         
-        # subprocess逻辑...
-        proc = subprocess.Popen(
+        # runner 及其启动的浏览器放在单独的进程组中，停止时按进程组结束整棵进程树
+        proc = ProcessGroup(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
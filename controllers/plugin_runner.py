@@ -83,23 +83,14 @@ def run_plugin_method():
         
         return error_result
 
-def wait_for_all_threads_to_complete():
-    """等待所有非守护线程完成，支持外部控制"""
-    control_file = os.environ.get('PROCESS_CONTROL_FILE')
+def wait_for_all_threads_to_complete(stop_grace=4):
+    """等待所有非守护线程完成，支持外部控制：收到停止指令后给任务 stop_grace 秒自行收尾再退出"""
+    from utils.control_block import open_control_block
+    control_block = open_control_block()
+    seq = None
+    stop_deadline = None
     
     while True:
-        # 检查控制指令
-        if control_file and os.path.exists(control_file):
-            try:
-                with open(control_file, 'r', encoding='utf-8') as f:
-                    control_state = json.load(f)
-                    if control_state.get('action') == 'stop':
-                        print("接收到停止指令，终止所有线程")
-                        # 强制退出进程
-                        os._exit(0)
-            except Exception as e:
-                print(f"读取控制文件失败: {e}")
-        
         # 获取所有非守护线程
         non_daemon_threads = [t for t in threading.enumerate() 
                              if not t.daemon and t != threading.main_thread()]
@@ -107,12 +98,29 @@ def wait_for_all_threads_to_complete():
         if not non_daemon_threads:
             print("所有非守护线程已完成")
             break
+        
+        if stop_deadline is not None and time.time() >= stop_deadline:
+            print("任务未在限定时间内结束，强制退出")
+            os._exit(0)
             
         print(f"等待 {len(non_daemon_threads)} 个非守护线程完成...")
         for thread in non_daemon_threads:
             print(f"   - 线程: {thread.name}")
         
-        time.sleep(1)
+        if control_block is None:
+            time.sleep(1)
+            continue
+        
+        # 阻塞在控制块门铃上，指令到达立即醒来
+        try:
+            seq, action = control_block.wait_control(seq, timeout=1.0)
+        except Exception as e:
+            print(f"读取控制块失败: {e}")
+            control_block = None
+            continue
+        if action == 'stop' and stop_deadline is None:
+            print("接收到停止指令，等待任务收尾")
+            stop_deadline = time.time() + stop_grace
 
 if __name__ == '__main__':
     run_plugin_method()
\ No newline at end of file
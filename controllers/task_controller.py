@@ -2,6 +2,7 @@ from datetime import datetime
 import importlib
 import traceback
 from models.task_model import TaskModel
+from models.progress_sample_model import ProgressSampleModel
 import json
 
 
@@ -79,8 +80,8 @@ class TaskController:
     def execute_task(self, task_id: int):
         """手工执行任务"""
         try:
-            # 获取任务详情
-            task = self.model.get_task_by_id(task_id)
+            # 获取任务详情（连同账号信息一次查出）
+            task = self.model.get_task_with_account(task_id)
             if not task:
                 return {
                     'success': False,
@@ -117,6 +118,8 @@ class TaskController:
                 start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 
                 log_text = f"手工执行任务: {task['name']}\n"
+                if task.get('account_username'):
+                    log_text += f"执行账号: {task['account_platform_name']} / {task['account_username']}\n"
                 log_text += f"执行结果: {result}\n"
                 
                 # 保存执行日志
@@ -154,4 +157,74 @@ class TaskController:
                 'success': False,
                 'message': str(e)
             }
-        
\ No newline at end of file
+            
+            
+    def run_db_maintenance(self, *args, **kwargs):
+        """
+        手工执行数据库维护（ANALYZE / optimize / 增量VACUUM / WAL检查点）
+        full=True 时把未开启增量 auto_vacuum 的库切换过去，需要一次完整 VACUUM，库越大耗时越长
+        """
+        try:
+            full = str(kwargs.get('full', '')).lower() in ('1', 'true')
+            result = self.task_scheduler.run_maintenance_job(full)
+            return {
+                'success': result['result'] == "成功",
+                'message': '数据库维护完成' if result['result'] == "成功" else '数据库维护失败',
+                'data': result['log']
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }
+            
+            
+    def run_archive(self, *args, **kwargs):
+        """手工归档超过 days 天的采集数据"""
+        try:
+            days = int(kwargs.get('days', 90))
+            result = self.task_scheduler.run_archive_job(days)
+            return {
+                'success': result['result'] == "成功",
+                'message': '历史数据归档完成' if result['result'] == "成功" else '历史数据归档失败',
+                'data': result['log']
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }
+            
+            
+    def get_progress_runs(self, *args, **kwargs):
+        """最近的任务运行及其平均吞吐"""
+        try:
+            limit = int(kwargs.get('limit', 50))
+            runs = ProgressSampleModel(self.plugin_name, self.data_directory).get_runs(limit)
+            return {
+                'success': True,
+                'data': runs
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }
+            
+            
+    def get_progress_samples(self, *args, **kwargs):
+        """某次运行的进度采样（吞吐曲线）"""
+        try:
+            run_id = kwargs.get('run_id')
+            if not run_id:
+                return {'success': False, 'message': 'run_id 不能为空'}
+            samples = ProgressSampleModel(self.plugin_name, self.data_directory).get_samples(run_id)
+            return {
+                'success': True,
+                'data': samples
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }
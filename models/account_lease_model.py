@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import time
+import psutil
+from pathlib import Path
+from datetime import datetime
+
+
+class AccountLeaseModel:
+    """
+    账号租约：采集任务先租用账号再启动浏览器，避免多个任务同时打开同一个 Chrome 用户目录
+    租约表与账号表同在 account-manage.db，租用在 BEGIN IMMEDIATE 事务中完成，多进程之间也不会重复分配
+    持有进程已退出或租约超时的记录会在下次租用时自动清理，持有期间由调用方定期 renew 续约
+    """
+
+    def __init__(self, plugin_name: str, data_directory: str, max_per_account: int = 1, ttl: int = 7200):
+        """
+        :param max_per_account: 每个账号同时允许的租约数，同一个用户目录只能被一个 Chrome 打开，默认 1
+        :param ttl: 租约有效期（秒），超时未续约视为失效
+        """
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.max_per_account = max_per_account
+        self.ttl = ttl
+        self.table_name = 'account_lease'
+        self.db_path = self.get_db_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.create_tables()
+
+    def get_db_path(self) -> Path:
+        """与 AccountmanageModel 使用同一个账号库"""
+        return Path(self.data_directory) / 'Tables' / 'account-manage.db'
+
+    def get_connection(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_tables(self):
+        conn = self.get_connection()
+        try:
+            conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_id INTEGER NOT NULL,
+                holder TEXT,
+                pid INTEGER,
+                acquired_at DATETIME DEFAULT (datetime('now', 'localtime')),
+                expires_at REAL
+            )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_account ON {self.table_name} (account_id)")
+        finally:
+            conn.close()
+
+    def cleanup(self, conn):
+        """清理超时租约和持有进程已退出的租约，需在事务内调用"""
+        removed = conn.execute(f"DELETE FROM {self.table_name} WHERE expires_at < ?", (time.time(),)).rowcount
+        for row in conn.execute(f"SELECT id, pid FROM {self.table_name}").fetchall():
+            if row['pid'] and not psutil.pid_exists(row['pid']):
+                conn.execute(f"DELETE FROM {self.table_name} WHERE id = ?", (row['id'],))
+                removed += 1
+        if removed:
+            print(f"清理失效账号租约 {removed} 条")
+        return removed
+
+    def acquire(self, holder: str, require_login: bool = True, platform_name: str = '抖音', exclude_ids=None, account_id=None):
+        """
+        租用一个空闲账号
+        优先分配当前租约最少、最久没被租用的账号
+        :param holder: 租用方说明，如任务名称
+        :param require_login: 只分配已登录（login_status=1）的账号
+        :param exclude_ids: 不参与分配的账号ID
+        :param account_id: 指定账号，不再按平台筛选，但同样要求账号启用且（require_login 时）已登录
+        :return: 账号信息（附带 lease_id），没有可用的空闲账号时返回 None
+        """
+        exclude_ids = [int(i) for i in (exclude_ids or [])]
+        conn = self.get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.cleanup(conn)
+                if account_id:
+                    conditions = ["a.status = 1", "a.id = ?"]
+                    params = [int(account_id)]
+                else:
+                    conditions = ["a.status = 1", "a.platform_name = ?"]
+                    params = [platform_name]
+                if require_login:
+                    conditions.append("a.login_status = 1")
+                if exclude_ids:
+                    conditions.append(f"a.id NOT IN ({','.join(['?' for _ in exclude_ids])})")
+                    params += exclude_ids
+
+                account = conn.execute(f"""
+                    SELECT a.*, COUNT(l.id) AS lease_count, MAX(l.acquired_at) AS last_leased_at
+                    FROM accountmanage a
+                    LEFT JOIN {self.table_name} l ON l.account_id = a.id
+                    WHERE {' AND '.join(conditions)}
+                    GROUP BY a.id
+                    HAVING COUNT(l.id) < ?
+                    ORDER BY lease_count ASC, last_leased_at ASC, a.id ASC
+                    LIMIT 1
+                """, params + [self.max_per_account]).fetchone()
+
+                if account is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                lease_id = conn.execute(
+                    f"INSERT INTO {self.table_name} (account_id, holder, pid, expires_at) VALUES (?, ?, ?, ?)",
+                    (account['id'], holder, os.getpid(), time.time() + self.ttl)
+                ).lastrowid
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            account = dict(account)
+            account['lease_id'] = lease_id
+            print(f"账号 {account['username']} 已租用给 {holder}，租约 {lease_id}")
+            return account
+        finally:
+            conn.close()
+
+    def acquire_many(self, holder: str, count: int, require_login: bool = True, platform_name: str = '抖音'):
+        """租用最多 count 个不同账号，中途出错时归还已租到的账号"""
+        accounts = []
+        try:
+            for _ in range(max(int(count), 0)):
+                account = self.acquire(holder, require_login, platform_name, exclude_ids=[a['id'] for a in accounts])
+                if account is None:
+                    break
+                accounts.append(account)
+        except Exception:
+            for account in accounts:
+                self.release(account['lease_id'])
+            raise
+        return accounts
+
+    def renew(self, lease_id):
+        """续约"""
+        conn = self.get_connection()
+        try:
+            return conn.execute(
+                f"UPDATE {self.table_name} SET expires_at = ? WHERE id = ?",
+                (time.time() + self.ttl, lease_id)
+            ).rowcount > 0
+        finally:
+            conn.close()
+
+    def release(self, lease_id):
+        """归还账号"""
+        conn = self.get_connection()
+        try:
+            released = conn.execute(f"DELETE FROM {self.table_name} WHERE id = ?", (lease_id,)).rowcount > 0
+            if released:
+                print(f"租约 {lease_id} 已归还")
+            return released
+        finally:
+            conn.close()
+
+    def get_leases(self):
+        """当前有效的租约列表"""
+        conn = self.get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self.cleanup(conn)
+            conn.execute("COMMIT")
+            rows = conn.execute(f"""
+                SELECT l.id AS lease_id, l.account_id, l.holder, l.pid, l.acquired_at, l.expires_at,
+                       a.username, a.platform_name
+                FROM {self.table_name} l
+                LEFT JOIN accountmanage a ON a.id = l.account_id
+                ORDER BY l.id
+            """).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def get_current_time(self):
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,189 @@
+import os
+import sqlite3
+from pathlib import Path
+from datetime import datetime, timedelta
+
+
+class ArchiveModel:
+    """
+    冷热分离：把超过指定天数的采集数据按月份搬到归档库
+    归档库位于 Tables/Archive/<plugin_name>/<plugin_name>_YYYYMM.db，查询历史时通过 ATTACH 联合检索
+    """
+
+    # 需要归档的业务表
+    ARCHIVE_TABLES = ('example_table', 'comments')
+    # SQLite 默认一个连接最多 ATTACH 10 个库，历史检索按这个数量分批
+    MAX_ATTACHED = 10
+
+    def __init__(self, plugin_name: str, data_directory: str):
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.db_path = self.get_db_path()
+        self.archive_dir = self.get_archive_dir()
+
+    def get_db_path(self) -> Path:
+        db_dir = Path(self.data_directory) / 'Tables'
+        if not db_dir.exists():
+            db_dir.mkdir(parents=True, exist_ok=True)
+        return db_dir / f'{self.plugin_name}.db'
+
+    def get_archive_dir(self) -> Path:
+        archive_dir = Path(self.data_directory) / 'Tables' / 'Archive' / self.plugin_name
+        if not archive_dir.exists():
+            archive_dir.mkdir(parents=True, exist_ok=True)
+        return archive_dir
+
+    def get_archive_path(self, month: str) -> Path:
+        return self.archive_dir / f'{self.plugin_name}_{month}.db'
+
+    def get_connection(self):
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def get_columns(self, conn, table_name, schema='main'):
+        """获取表字段 名称 -> 类型，表不存在时返回空字典"""
+        rows = conn.execute(f"PRAGMA {schema}.table_info({table_name})").fetchall()
+        return {row[1]: row[2] for row in rows}
+
+    def get_archive_files(self):
+        """归档库文件列表，按月份倒序"""
+        return sorted(self.archive_dir.glob(f'{self.plugin_name}_*.db'), reverse=True)
+
+    def ensure_archive_table(self, conn, table_name, columns):
+        """在已 ATTACH 的 archive 库中建表，并补齐主表后来新增的字段"""
+        column_definitions = ["id INTEGER PRIMARY KEY"]
+        column_definitions += [f"{col} {type_}" for col, type_ in columns.items() if col != 'id']
+        conn.execute(f"CREATE TABLE IF NOT EXISTS archive.{table_name} ({', '.join(column_definitions)})")
+
+        archive_columns = self.get_columns(conn, table_name, 'archive')
+        for col, type_ in columns.items():
+            if col not in archive_columns:
+                conn.execute(f"ALTER TABLE archive.{table_name} ADD COLUMN {col} {type_}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_{table_name}_created_at ON {table_name} (created_at)")
+
+    def archive_table(self, table_name, cutoff):
+        """
+        把 created_at 早于 cutoff 的数据按月搬到归档库
+        每个月份在一个事务中完成复制和删除，主库与归档库同时提交
+        :return: {月份: 行数}
+        """
+        moved = {}
+        conn = self.get_connection()
+        try:
+            columns = self.get_columns(conn, table_name)
+            if not columns:
+                return moved
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_created_at ON {table_name} (created_at)")
+
+            months = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT strftime('%Y%m', created_at) FROM {table_name} WHERE created_at < ?",
+                (cutoff,)
+            ).fetchall() if row[0]]
+
+            column_list = ', '.join(columns.keys())
+            for month in months:
+                conn.execute("ATTACH DATABASE ? AS archive", (str(self.get_archive_path(month)),))
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    self.ensure_archive_table(conn, table_name, columns)
+                    where = f"created_at < ? AND strftime('%Y%m', created_at) = ?"
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO archive.{table_name} ({column_list}) SELECT {column_list} FROM main.{table_name} WHERE {where}",
+                        (cutoff, month)
+                    )
+                    cursor = conn.execute(f"DELETE FROM main.{table_name} WHERE {where}", (cutoff, month))
+                    conn.commit()
+                    moved[month] = cursor.rowcount
+                    print(f"归档 {table_name} {month}: {cursor.rowcount} 行")
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.execute("DETACH DATABASE archive")
+        finally:
+            conn.close()
+        return moved
+
+    def archive_older_than(self, days: int = 90):
+        """
+        归档超过 days 天的数据
+        :return: {表名: {月份: 行数}}
+        """
+        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        results = {}
+        for table_name in self.ARCHIVE_TABLES:
+            try:
+                results[table_name] = self.archive_table(table_name, cutoff)
+            except Exception as e:
+                print(f"归档 {table_name} 失败: {str(e)}")
+                results[table_name] = {'error': str(e)}
+        return results
+
+    def format_results(self, results, days):
+        """将归档结果格式化为运行日志文本"""
+        lines = [f"历史数据归档（{days} 天前）: {self.get_current_time()}"]
+        for table_name, months in results.items():
+            if 'error' in months:
+                lines.append(f"[{table_name}] 失败: {months['error']}")
+            elif not months:
+                lines.append(f"[{table_name}] 没有需要归档的数据")
+            else:
+                detail = '，'.join(f"{month}: {count} 行" for month, count in sorted(months.items()))
+                lines.append(f"[{table_name}] {detail}")
+        return "\n".join(lines) + "\n"
+
+    def page_with_history(self, table_name, where="1=1", params=None, order_by='created_at', page=1, page_size=10):
+        """
+        在主表和全部归档库上分页查询（按 order_by 倒序），返回 (总数, 当前页数据)，archived=1 的行来自归档库
+        SQLite 一个连接最多 ATTACH MAX_ATTACHED 个库，归档库按批检索：
+        每批统计总数并取排序后的前 offset+page_size 行，合并排序后切出当前页，不会漏掉较早的月份
+        """
+        params = list(params or [])
+        offset = (page - 1) * page_size
+        archive_files = self.get_archive_files()
+        total = 0
+        rows = []
+
+        conn = self.get_connection()
+        conn.row_factory = sqlite3.Row
+        try:
+            columns = list(self.get_columns(conn, table_name).keys())
+            for start in range(0, max(len(archive_files), 1), self.MAX_ATTACHED):
+                selects = []
+                if start == 0:
+                    selects.append(f"SELECT {', '.join(columns)}, 0 AS archived FROM main.{table_name}")
+                aliases = []
+                try:
+                    for index, archive_path in enumerate(archive_files[start:start + self.MAX_ATTACHED]):
+                        alias = f"archive_{index}"
+                        conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(archive_path),))
+                        aliases.append(alias)
+                        archive_columns = self.get_columns(conn, table_name, alias)
+                        if not archive_columns:
+                            continue
+                        # 归档库可能缺少主表后来新增的字段，用 NULL 补齐
+                        select_columns = [col if col in archive_columns else f"NULL AS {col}" for col in columns]
+                        selects.append(f"SELECT {', '.join(select_columns)}, 1 AS archived FROM {alias}.{table_name}")
+                    if not selects:
+                        continue
+
+                    source = f"({' UNION ALL '.join(selects)})"
+                    total += conn.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+                    rows += [dict(row) for row in conn.execute(
+                        f"SELECT * FROM {source} WHERE {where} ORDER BY {order_by} DESC LIMIT ?",
+                        params + [offset + page_size]
+                    ).fetchall()]
+                finally:
+                    for alias in aliases:
+                        try:
+                            conn.execute(f"DETACH DATABASE {alias}")
+                        except Exception:
+                            pass
+        finally:
+            conn.close()
+
+        # 与 SQLite 的 DESC 一致：NULL 排在最后
+        rows.sort(key=lambda row: (row.get(order_by) is not None, row.get(order_by)), reverse=True)
+        return total, rows[offset:offset + page_size]
+
+    def get_current_time(self):
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from datetime import datetime
+
+
+class BackupModel:
+    """数据库在线热备份：基于 sqlite3 backup API 分步复制，支持快照轮换与恢复"""
+
+    def __init__(self, plugin_name: str, data_directory: str, pages_per_step: int = 256, step_sleep: float = 0.05, keep_count: int = 7,
+                 copy_timeout: float = 600, max_backoff: float = 30):
+        """
+        :param pages_per_step: 每一步复制的页数，步与步之间释放读锁
+        :param step_sleep: 每一步之间的休眠秒数，给采集写入让出时间
+        :param keep_count: 每个数据库保留的快照数量
+        :param copy_timeout: 单个库分步复制的总时限（秒），超过则本次快照失败
+        :param max_backoff: 备份因源库写入重启后最多等待的秒数
+        """
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.keep_count = keep_count
+        self.copy_timeout = copy_timeout
+        self.max_backoff = max_backoff
+        self.backup_dir = self.get_backup_dir()
+
+    def get_backup_dir(self) -> Path:
+        backup_dir = Path(self.data_directory) / 'Backups' / self.plugin_name
+        if not backup_dir.exists():
+            backup_dir.mkdir(parents=True, exist_ok=True)
+        return backup_dir
+
+    def get_db_paths(self):
+        """可备份的数据库：名称 -> 路径"""
+        db_dir = Path(self.data_directory) / 'Tables'
+        return {
+            self.plugin_name: db_dir / f'{self.plugin_name}.db',
+            'account-manage': db_dir / 'account-manage.db'
+        }
+
+    def get_connection(self, db_path):
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        return conn
+
+    def copy_database(self, src_path, dst_path):
+        """
+        使用 backup API 把 src_path 分步复制到 dst_path，每步只短暂持有读锁
+        源库在复制过程中被修改时备份从头开始，之后等待的时间逐次加倍（最多 max_backoff 秒），
+        等采集写入的空档再复制；超过 copy_timeout 仍未完成则抛出 TimeoutError，
+        不退回一次性复制（整个复制期间持有读锁，会阻塞采集写入）
+        返回: {'pages': 总页数, 'steps': 步数, 'restarts': 重启次数}
+        """
+        stats = {'pages': 0, 'steps': 0, 'restarts': 0}
+        last_remaining = None
+        backoff = self.step_sleep
+        deadline = time.time() + self.copy_timeout
+
+        def progress(status, remaining, total):
+            nonlocal last_remaining, backoff
+            stats['steps'] += 1
+            stats['pages'] = total
+            if not remaining:
+                return
+            if time.time() >= deadline:
+                raise TimeoutError(f"分步备份 {self.copy_timeout} 秒内未完成（重启 {stats['restarts']} 次）")
+            # remaining 变大说明源库被修改，备份重新开始
+            if last_remaining is not None and remaining > last_remaining:
+                stats['restarts'] += 1
+                backoff = min(backoff * 2, self.max_backoff)
+                time.sleep(min(backoff, max(deadline - time.time(), 0)))
+            else:
+                time.sleep(self.step_sleep)
+            last_remaining = remaining
+
+        src = self.get_connection(src_path)
+        dst = sqlite3.connect(str(dst_path))
+        try:
+            src.backup(dst, pages=self.pages_per_step, progress=progress, sleep=self.step_sleep)
+            return stats
+        finally:
+            dst.close()
+            src.close()
+
+    def check_snapshot(self, snapshot_path):
+        """快速校验快照完整性"""
+        conn = sqlite3.connect(str(snapshot_path))
+        try:
+            return conn.execute("PRAGMA quick_check").fetchone()[0] == 'ok'
+        finally:
+            conn.close()
+
+    def create_snapshot(self, db_name=None, label='snapshot'):
+        """
+        创建快照
+        :param db_name: 数据库名称，为空时备份全部
+        :param label: 快照标签，用于区分定时快照与恢复前的安全快照
+        :return: 每个库的快照结果列表
+        """
+        results = []
+        for name, db_path in self.get_db_paths().items():
+            if db_name and name != db_name:
+                continue
+            if not os.path.exists(db_path):
+                continue
+
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            snapshot_path = self.backup_dir / f'{name}_{label}_{timestamp}.db'
+            temp_path = Path(f'{snapshot_path}.part')
+            start = time.time()
+            try:
+                stats = self.copy_database(db_path, temp_path)
+                if not self.check_snapshot(temp_path):
+                    raise Exception("快照完整性校验失败")
+                os.replace(temp_path, snapshot_path)
+                results.append({
+                    'db': name,
+                    'success': True,
+                    'snapshot': snapshot_path.name,
+                    'size': os.path.getsize(snapshot_path),
+                    'duration': round(time.time() - start, 3),
+                    **stats
+                })
+                print(f"数据库快照完成: {snapshot_path}")
+            except Exception as e:
+                if temp_path.exists():
+                    temp_path.unlink()
+                results.append({'db': name, 'success': False, 'error': str(e)})
+                print(f"数据库快照失败 {db_path}: {str(e)}")
+
+        self.rotate_snapshots()
+        return results
+
+    def get_snapshots(self, db_name=None):
+        """获取快照列表，按时间倒序"""
+        snapshots = []
+        for name in self.get_db_paths():
+            if db_name and name != db_name:
+                continue
+            for path in self.backup_dir.glob(f'{name}_*.db'):
+                stat = path.stat()
+                snapshots.append({
+                    'db': name,
+                    'snapshot': path.name,
+                    'size': stat.st_size,
+                    'created_at': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                    'mtime': stat.st_mtime
+                })
+        snapshots.sort(key=lambda item: item['mtime'], reverse=True)
+        return snapshots
+
+    def rotate_snapshots(self):
+        """每个库、每种标签只保留最近 keep_count 个快照"""
+        for name in self.get_db_paths():
+            for label in ('snapshot', 'pre_restore'):
+                snapshots = [s for s in self.get_snapshots(name) if s['snapshot'].startswith(f'{name}_{label}_')]
+                for expired in snapshots[self.keep_count:]:
+                    try:
+                        (self.backup_dir / expired['snapshot']).unlink()
+                        print(f"删除过期快照: {expired['snapshot']}")
+                    except Exception as e:
+                        print(f"删除过期快照失败 {expired['snapshot']}: {str(e)}")
+
+    def restore_snapshot(self, snapshot_name):
+        """
+        从快照恢复数据库
+        恢复前会先给当前库做一次 pre_restore 快照，恢复同样通过 backup API 写入，已打开的连接可直接看到新数据
+        """
+        snapshot_path = self.backup_dir / snapshot_name
+        if not snapshot_path.exists() or snapshot_path.parent != self.backup_dir:
+            raise FileNotFoundError(f"快照不存在: {snapshot_name}")
+
+        db_name = None
+        for name in self.get_db_paths():
+            if snapshot_name.startswith(f'{name}_'):
+                db_name = name
+                break
+        if not db_name:
+            raise ValueError(f"无法识别快照所属数据库: {snapshot_name}")
+
+        if not self.check_snapshot(snapshot_path):
+            raise Exception(f"快照完整性校验失败: {snapshot_name}")
+
+        self.create_snapshot(db_name, label='pre_restore')
+
+        db_path = self.get_db_paths()[db_name]
+        src = sqlite3.connect(str(snapshot_path))
+        dst = self.get_connection(db_path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        print(f"已从快照恢复 {db_name}: {snapshot_name}")
+        return {'db': db_name, 'snapshot': snapshot_name}
+
+    def format_results(self, results):
+        """将快照结果格式化为运行日志文本"""
+        lines = [f"数据库快照: {self.get_current_time()}"]
+        for item in results:
+            if item['success']:
+                lines.append(
+                    f"[{item['db']}] {item['snapshot']}，{item['size']} 字节，"
+                    f"{item['pages']} 页 / {item['steps']} 步，重启 {item['restarts']} 次，耗时 {item['duration']} 秒"
+                )
+            else:
+                lines.append(f"[{item['db']}] 失败: {item['error']}")
+        return "\n".join(lines) + "\n"
+
+    def get_current_time(self):
+        """获取当前北京时间"""
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
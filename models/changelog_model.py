@@ -0,0 +1,215 @@
+import os
+import sqlite3
+from pathlib import Path
+from datetime import datetime
+
+
+class ChangeLogModel:
+    """
+    变更日志（CDC）
+    由触发器在业务表增删改时写入 change_log，前端和缓存按 seq 增量同步
+    """
+
+    # 需要记录变更的业务表
+    TRACKED_TABLES = ('example_table', 'comments', 'tasks', 'task_runlog')
+    # 变更日志保留的条数；每写入 PRUNE_EVERY 条由触发器裁剪一次，不依赖定时任务
+    KEEP_COUNT = 20000
+    PRUNE_EVERY = 1000
+
+    def __init__(self, plugin_name: str, data_directory: str):
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.table_name = 'change_log'
+        self.db_path = self.get_db_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.create_tables()
+
+    def get_db_path(self) -> Path:
+        db_dir = Path(self.data_directory) / 'Tables'
+        if not db_dir.exists():
+            db_dir.mkdir(parents=True, exist_ok=True)
+        return db_dir / f'{self.plugin_name}.db'
+
+    def get_connection(self):
+        return sqlite3.connect(str(self.db_path))
+
+    def execute(self, query: str, params=None):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                conn.commit()
+                return cursor.lastrowid
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+    def fetch_all(self, query: str, params=None):
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            rows = cursor.fetchall()
+            return [dict(r) for r in rows]
+
+    def get_schema_names(self, names):
+        """sqlite_master 中已存在的表/索引/触发器名称"""
+        placeholders = ','.join(['?' for _ in names])
+        rows = self.fetch_all(f"SELECT name FROM sqlite_master WHERE name IN ({placeholders})", list(names))
+        return {row['name'] for row in rows}
+
+    def create_tables(self):
+        """建表、索引和裁剪触发器；都已存在时只有一次 sqlite_master 查询，各模型初始化时反复创建本类的开销很小"""
+        index_name = f"idx_{self.table_name}_table_seq"
+        prune_trigger = f"trg_{self.table_name}_prune"
+        if len(self.get_schema_names([self.table_name, index_name, prune_trigger])) == 3:
+            return
+
+        query = f"""
+        CREATE TABLE IF NOT EXISTS {self.table_name} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER,
+            op TEXT NOT NULL,
+            changed_at DATETIME DEFAULT (datetime('now', 'localtime'))
+        )
+        """
+        self.execute(query)
+        self.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {self.table_name} (table_name, seq)")
+        # 每写入 PRUNE_EVERY 条裁剪一次，按主键范围删除，只保留最近 KEEP_COUNT 条
+        self.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {prune_trigger}
+        AFTER INSERT ON {self.table_name}
+        WHEN NEW.seq % {self.PRUNE_EVERY} = 0
+        BEGIN
+            DELETE FROM {self.table_name} WHERE seq <= NEW.seq - {self.KEEP_COUNT};
+        END
+        """)
+
+    def ensure_triggers(self, table_name: str):
+        """
+        为业务表创建增删改触发器，只创建缺少的
+        业务表重建（modify_column_type）会连带删除触发器，所以建表后都要调用；触发器都在时只查询一次 sqlite_master
+        """
+        if table_name not in self.TRACKED_TABLES:
+            raise ValueError(f"不支持记录变更的表: {table_name}")
+
+        triggers = {
+            'insert': ('AFTER INSERT', 'NEW.id'),
+            'update': ('AFTER UPDATE', 'NEW.id'),
+            'delete': ('AFTER DELETE', 'OLD.id')
+        }
+        names = {op: f"trg_{table_name}_{op}_changelog" for op in triggers}
+        existing = self.get_schema_names(names.values())
+        for op, (event, row_id) in triggers.items():
+            if names[op] in existing:
+                continue
+            self.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {names[op]}
+            {event} ON {table_name}
+            BEGIN
+                INSERT INTO {self.table_name} (table_name, row_id, op) VALUES ('{table_name}', {row_id}, '{op}');
+            END
+            """)
+
+    def get_last_seq(self):
+        """当前最新的变更序号"""
+        result = self.fetch_all(f"SELECT COALESCE(MAX(seq), 0) AS last_seq FROM {self.table_name}")
+        return result[0]['last_seq']
+
+    def get_min_seq(self):
+        result = self.fetch_all(f"SELECT COALESCE(MIN(seq), 0) AS min_seq FROM {self.table_name}")
+        return result[0]['min_seq']
+
+    def get_changes(self, since_seq: int = 0, table_names=None, limit: int = 500):
+        """
+        获取 since_seq 之后的变更
+        同一行的多次变更合并为最后一次；insert/update 附带当前行数据，行已不存在的视为 delete
+        :return: {'changes': [...], 'last_seq': 本次读到的最大序号, 'has_more': 是否还有未读变更, 'reset': 是否需要全量刷新}
+        """
+        since_seq = int(since_seq or 0)
+        table_names = [t for t in (table_names or self.TRACKED_TABLES) if t in self.TRACKED_TABLES]
+        if not table_names:
+            return {'changes': [], 'last_seq': since_seq, 'has_more': False, 'reset': False}
+
+        # 变更日志已被裁剪到 since_seq 之后，增量无法衔接，需要前端全量刷新
+        min_seq = self.get_min_seq()
+        if since_seq and min_seq and since_seq < min_seq - 1:
+            return {'changes': [], 'last_seq': self.get_last_seq(), 'has_more': False, 'reset': True}
+
+        # 先取全局最新序号，避免查询期间新提交的变更被游标跳过
+        head_seq = self.get_last_seq()
+        placeholders = ','.join(['?' for _ in table_names])
+        rows = self.fetch_all(f"""
+            SELECT seq, table_name, row_id, op, changed_at
+            FROM {self.table_name}
+            WHERE seq > ? AND table_name IN ({placeholders})
+            ORDER BY seq
+            LIMIT ?
+        """, [since_seq] + table_names + [limit + 1])
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        # 过滤后的表可能没有新变更，用全局最新序号推进游标
+        last_seq = rows[-1]['seq'] if has_more else max([since_seq, head_seq] + [r['seq'] for r in rows])
+
+        # 合并同一行的变更，保留最后一次
+        merged = {}
+        for row in rows:
+            key = (row['table_name'], row['row_id'])
+            if key in merged and merged[key]['op'] == 'insert' and row['op'] == 'update':
+                # 本批次内新增后又修改，对前端来说仍是新增
+                merged[key].update({'seq': row['seq'], 'changed_at': row['changed_at']})
+                continue
+            merged.pop(key, None)
+            merged[key] = row
+
+        # 批量读取 insert/update 行的当前数据
+        ids_by_table = {}
+        for (table_name, row_id), row in merged.items():
+            if row['op'] != 'delete':
+                ids_by_table.setdefault(table_name, []).append(row_id)
+
+        current_rows = {}
+        for table_name, ids in ids_by_table.items():
+            id_placeholders = ','.join(['?' for _ in ids])
+            for item in self.fetch_all(f"SELECT * FROM {table_name} WHERE id IN ({id_placeholders})", ids):
+                current_rows[(table_name, item['id'])] = item
+
+        changes = []
+        for key, row in merged.items():
+            change = {
+                'seq': row['seq'],
+                'table': row['table_name'],
+                'id': row['row_id'],
+                'op': row['op'],
+                'changed_at': row['changed_at']
+            }
+            if row['op'] != 'delete':
+                data = current_rows.get(key)
+                if data is None:
+                    change['op'] = 'delete'
+                else:
+                    change['data'] = data
+            changes.append(change)
+        changes.sort(key=lambda c: c['seq'])
+
+        return {'changes': changes, 'last_seq': last_seq, 'has_more': has_more, 'reset': False}
+
+    def prune(self, keep_count: int = KEEP_COUNT):
+        """只保留最近 keep_count 条变更记录（写入时触发器已按 KEEP_COUNT 裁剪，数据库维护时再兜底一次）"""
+        query = f"DELETE FROM {self.table_name} WHERE seq <= (SELECT COALESCE(MAX(seq), 0) FROM {self.table_name}) - ?"
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (keep_count,))
+            conn.commit()
+            return cursor.rowcount
+
+    def get_current_time(self):
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,151 @@
+import os
+import json
+import zlib
+import sqlite3
+from array import array
+from pathlib import Path
+from datetime import datetime
+
+
+class CheckpointModel:
+    """
+    采集断点：按 关键词 + 平台 + 账号 记录滚动游标、已见视频ID（布隆过滤器模式下为位数组）和计数
+    采集过程中定期保存，任务被停止或浏览器崩溃后可以从断点继续
+    """
+
+    def __init__(self, plugin_name: str, data_directory: str):
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.table_name = 'collect_checkpoint'
+        self.db_path = self.get_db_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.create_tables()
+
+    def get_db_path(self) -> Path:
+        db_dir = Path(self.data_directory) / 'Tables'
+        if not db_dir.exists():
+            db_dir.mkdir(parents=True, exist_ok=True)
+        return db_dir / f'{self.plugin_name}.db'
+
+    def get_connection(self):
+        return sqlite3.connect(str(self.db_path))
+
+    def execute(self, query: str, params=None):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                conn.commit()
+                return cursor.lastrowid
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+    def fetch_all(self, query: str, params=None):
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            rows = cursor.fetchall()
+            return [dict(r) for r in rows]
+
+    def create_tables(self):
+        query = f"""
+        CREATE TABLE IF NOT EXISTS {self.table_name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT NOT NULL,
+            platform_name TEXT,
+            username TEXT,
+            cursor INTEGER DEFAULT 0,
+            seen_ids BLOB,
+            seen_filter BLOB,
+            seen_count INTEGER DEFAULT 0,
+            counters TEXT,
+            status TEXT DEFAULT 'running',
+            created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+            updated_at DATETIME DEFAULT (datetime('now', 'localtime')),
+            UNIQUE (keyword, platform_name, username)
+        )
+        """
+        self.execute(query)
+        # 旧版本建的表没有 seen_filter 字段
+        columns = [row['name'] for row in self.fetch_all(f"PRAGMA table_info({self.table_name})")]
+        if 'seen_filter' not in columns:
+            self.execute(f"ALTER TABLE {self.table_name} ADD COLUMN seen_filter BLOB")
+
+    @staticmethod
+    def encode_ids(ids):
+        """视频ID压缩存储：排序后转 64 位整数数组再 zlib 压缩，非数字ID忽略"""
+        values = array('q', sorted(i for i in ids if isinstance(i, int)))
+        return zlib.compress(values.tobytes())
+
+    @staticmethod
+    def decode_ids(blob):
+        if not blob:
+            return []
+        values = array('q')
+        values.frombytes(zlib.decompress(blob))
+        return values.tolist()
+
+    def save_checkpoint(self, keyword, platform_name, username, cursor=0, seen_ids=None, counters=None, status='running',
+                        seen_filter=None, seen_count=None):
+        """
+        保存断点，同一关键词和账号只保留一条
+        :param seen_filter: 布隆过滤器的位数组（无法列出ID时代替 seen_ids）
+        :param seen_count: 已见视频数，默认为 seen_ids 的数量
+        """
+        seen_ids = seen_ids or []
+        if seen_count is None:
+            seen_count = len(seen_ids)
+        query = f"""
+            INSERT INTO {self.table_name} (keyword, platform_name, username, cursor, seen_ids, seen_filter, seen_count, counters, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (keyword, platform_name, username) DO UPDATE SET
+                cursor = excluded.cursor,
+                seen_ids = excluded.seen_ids,
+                seen_filter = excluded.seen_filter,
+                seen_count = excluded.seen_count,
+                counters = excluded.counters,
+                status = excluded.status,
+                updated_at = excluded.updated_at
+        """
+        self.execute(query, (
+            keyword, platform_name, username, int(cursor or 0),
+            self.encode_ids(seen_ids), seen_filter, seen_count,
+            json.dumps(counters or {}, ensure_ascii=False), status, self.get_current_time()
+        ))
+
+    def get_checkpoint(self, keyword, platform_name, username):
+        """读取断点，seen_ids 解压为ID列表，seen_filter 为布隆过滤器位数组（可能为空）；没有断点返回 None"""
+        rows = self.fetch_all(
+            f"SELECT * FROM {self.table_name} WHERE keyword = ? AND platform_name = ? AND username = ?",
+            (keyword, platform_name, username)
+        )
+        if not rows:
+            return None
+        checkpoint = rows[0]
+        checkpoint['seen_ids'] = self.decode_ids(checkpoint['seen_ids'])
+        checkpoint['counters'] = json.loads(checkpoint['counters'] or '{}')
+        return checkpoint
+
+    def get_checkpoints(self, status=None):
+        """断点列表（不含ID数据）"""
+        query = f"""
+            SELECT id, keyword, platform_name, username, cursor, seen_count, counters, status, created_at, updated_at
+            FROM {self.table_name}
+        """
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY updated_at DESC"
+        return self.fetch_all(query, params)
+
+    def get_current_time(self):
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -2,6 +2,8 @@ import os
 import sqlite3
 from pathlib import Path
 from datetime import datetime
+from models.changelog_model import ChangeLogModel
+from models.archive_model import ArchiveModel
 
 
 class CommentModel:
@@ -62,6 +64,9 @@ class CommentModel:
         """
         self.execute(base_query)
 
+        # 增删改记录到变更日志，供前端增量同步
+        ChangeLogModel(self.plugin_name, self.data_directory).ensure_triggers(self.table_name)
+
     def get_current_time(self):
         return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -69,6 +74,24 @@ class CommentModel:
         query = f"INSERT INTO {self.table_name} (link, content, comment_time, author, ip) VALUES (?, ?, ?, ?, ?)"
         return self.execute(query, (link, content, comment_time, author, ip))
 
+    def add_comments(self, items):
+        """批量添加评论，一个事务内 executemany 写入"""
+        if not items:
+            return 0
+        query = f"INSERT INTO {self.table_name} (link, content, comment_time, author, ip) VALUES (?, ?, ?, ?, ?)"
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(query, [
+                    (item.get('link'), item.get('content'), item.get('comment_time'), item.get('author'), item.get('ip'))
+                    for item in items
+                ])
+                conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                conn.rollback()
+                raise e
+
     def update_comment(self, id: int, link: str, content: str, comment_time: str = None, author: str = None, ip: str = None):
         now = self.get_current_time()
         query = f"""
@@ -94,16 +117,29 @@ class CommentModel:
         query = f"DELETE FROM {self.table_name} WHERE id IN ({placeholders})"
         self.execute(query, ids)
 
-    def get_comments(self, page: int = 1, page_size: int = 10, keyword: str = None):
-        base_query = f"FROM {self.table_name} WHERE 1=1"
+    def get_comments(self, page: int = 1, page_size: int = 10, keyword: str = None, include_history: bool = False):
+        where = "1=1"
         params = []
         if keyword:
-            base_query += " AND (link LIKE ? OR content LIKE ? OR author LIKE ? OR ip LIKE ?)"
+            where += " AND (link LIKE ? OR content LIKE ? OR author LIKE ? OR ip LIKE ?)"
             like = f"%{keyword}%"
             params.extend([like, like, like, like])
 
+        if include_history:
+            total, items = ArchiveModel(self.plugin_name, self.data_directory).page_with_history(
+                self.table_name, where, params, 'created_at', page, page_size
+            )
+            return {
+                'total': total,
+                'items': items,
+                'page': page,
+                'page_size': page_size
+            }
+
+        base_query = f"FROM {self.table_name} WHERE {where}"
         count_query = f"SELECT COUNT(*) as total {base_query}"
-        total = self.fetch_all(count_query, params)[0]['total'] if self.fetch_all(count_query, params) else 0
+        count_result = self.fetch_all(count_query, params)
+        total = count_result[0]['total'] if count_result else 0
 
         offset = (page - 1) * page_size
         data_query = f"""
@@ -120,5 +156,3 @@ class CommentModel:
             'page': page,
             'page_size': page_size
         }
-
-
@@ -2,6 +2,8 @@ import os
 import sqlite3
 from pathlib import Path
 from datetime import datetime
+from models.changelog_model import ChangeLogModel
+from models.archive_model import ArchiveModel
 
 class ExampleModel:
     def __init__(self, plugin_name: str,data_directory: str):
@@ -102,6 +104,9 @@ class ExampleModel:
                 if current_type != required_type:
                     print(f"字段 {column_name} 类型需要从 {current_type} 更新为 {required_type}")
                     self.modify_column_type(column_name, required_type)
+
+        # 增删改记录到变更日志，供前端增量同步
+        ChangeLogModel(self.plugin_name, self.data_directory).ensure_triggers(self.table_name)
             
             
     def get_existing_columns(self):
@@ -193,17 +198,45 @@ class ExampleModel:
         query = "INSERT INTO example_table (title, link,author) VALUES (?, ?,?)"
         return self.execute(query, (title, link,author))
 
-    def get_items(self, page=1, page_size=10, keyword=None):
-        """获取分页数据"""
-        # 构建基础查询
-        base_query = "FROM example_table WHERE 1=1"
+    def add_items(self, items):
+        """批量添加数据，一个事务内 executemany 写入"""
+        if not items:
+            return 0
+        query = "INSERT INTO example_table (title, link, author) VALUES (?, ?, ?)"
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(query, [(item.get('title'), item.get('link'), item.get('author')) for item in items])
+                conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+    def get_items(self, page=1, page_size=10, keyword=None, include_history=False):
+        """获取分页数据，include_history 为真时同时检索归档库"""
+        # 构建查询条件
+        where = "1=1"
         params = []
         
         # 添加搜索条件
         if keyword:
-            base_query += " AND (title LIKE ? OR link LIKE ?)"
+            where += " AND (title LIKE ? OR link LIKE ?)"
             params.extend([f'%{keyword}%', f'%{keyword}%'])
         
+        if include_history:
+            total, items = ArchiveModel(self.plugin_name, self.data_directory).page_with_history(
+                self.table_name, where, params, 'created_at', page, page_size
+            )
+            return {
+                'total': total,
+                'items': items,
+                'page': page,
+                'page_size': page_size
+            }
+        
+        base_query = f"FROM {self.table_name} WHERE {where}"
+        
         # 获取总数
         count_query = f"SELECT COUNT(*) as total {base_query}"
         total = self.fetch_all(count_query, params)[0]['total']
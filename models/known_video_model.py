@@ -0,0 +1,82 @@
+import os
+import sqlite3
+from pathlib import Path
+from datetime import datetime
+
+
+class KnownVideoModel:
+    """
+    增量采集的高水位记录：每个关键词已经入库过的视频ID
+    同一关键词再次采集时，连续若干批全是已知视频就提前结束滚动
+    """
+
+    def __init__(self, plugin_name: str, data_directory: str):
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.table_name = 'keyword_known_video'
+        self.db_path = self.get_db_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.create_tables()
+
+    def get_db_path(self) -> Path:
+        db_dir = Path(self.data_directory) / 'Tables'
+        if not db_dir.exists():
+            db_dir.mkdir(parents=True, exist_ok=True)
+        return db_dir / f'{self.plugin_name}.db'
+
+    def get_connection(self):
+        return sqlite3.connect(str(self.db_path))
+
+    def execute(self, query: str, params=None):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                conn.commit()
+                return cursor.lastrowid
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+    def create_tables(self):
+        query = f"""
+        CREATE TABLE IF NOT EXISTS {self.table_name} (
+            keyword TEXT NOT NULL,
+            aweme_id INTEGER NOT NULL,
+            first_seen_at DATETIME DEFAULT (datetime('now', 'localtime')),
+            PRIMARY KEY (keyword, aweme_id)
+        ) WITHOUT ROWID
+        """
+        self.execute(query)
+
+    def get_known_ids(self, keyword):
+        """关键词下已知的视频ID集合"""
+        with self.get_connection() as conn:
+            rows = conn.execute(f"SELECT aweme_id FROM {self.table_name} WHERE keyword = ?", (keyword,)).fetchall()
+            return {row[0] for row in rows}
+
+    def add_known_ids(self, keyword, aweme_ids):
+        """记录已入库的视频ID，已存在的忽略"""
+        params = []
+        for aweme_id in aweme_ids:
+            try:
+                params.append((keyword, int(aweme_id)))
+            except (TypeError, ValueError):
+                continue
+        if not params:
+            return 0
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(f"INSERT OR IGNORE INTO {self.table_name} (keyword, aweme_id) VALUES (?, ?)", params)
+                conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+    def get_current_time(self):
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from datetime import datetime
+
+
+class MaintenanceModel:
+    """数据库维护：ANALYZE、PRAGMA optimize、增量 VACUUM、WAL 检查点"""
+
+    def __init__(self, plugin_name: str, data_directory: str):
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        # 被占用时最多等待的毫秒数，避免和采集子进程抢锁时直接失败
+        self.busy_timeout = 5000
+
+    def get_db_paths(self):
+        """获取需要维护的数据库文件（插件库 + 账号库）"""
+        db_dir = Path(self.data_directory) / 'Tables'
+        return [
+            db_dir / f'{self.plugin_name}.db',
+            db_dir / 'account-manage.db'
+        ]
+
+    def get_connection(self, db_path):
+        # isolation_level=None：VACUUM 等语句不能在事务中执行
+        conn = sqlite3.connect(str(db_path), isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        return conn
+
+    def get_file_size(self, db_path):
+        """数据库文件大小（包含 -wal 文件）"""
+        size = 0
+        for suffix in ('', '-wal'):
+            path = f"{db_path}{suffix}"
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+
+    def get_stats(self, conn, db_path):
+        """采集文件大小和页使用情况"""
+        return {
+            'file_size': self.get_file_size(db_path),
+            'page_size': conn.execute("PRAGMA page_size").fetchone()[0],
+            'page_count': conn.execute("PRAGMA page_count").fetchone()[0],
+            'freelist_count': conn.execute("PRAGMA freelist_count").fetchone()[0]
+        }
+
+    def maintain_db(self, db_path, full=False):
+        """
+        维护单个数据库
+        :param full: 尚未开启增量 auto_vacuum 的库切换为增量模式并执行一次完整 VACUUM；
+                     完整 VACUUM 会重写整个文件并长时间独占数据库，只在手工维护时开启
+        返回: 维护前后统计和执行的操作
+        """
+        result = {
+            'db': Path(db_path).name,
+            'success': True,
+            'operations': [],
+            'before': {},
+            'after': {},
+            'skipped': False,
+            'error': ''
+        }
+        if not os.path.exists(db_path):
+            # 还未创建的库（如未使用账号管理）直接跳过
+            result['skipped'] = True
+            return result
+
+        start = time.time()
+        conn = None
+        try:
+            conn = self.get_connection(db_path)
+            result['before'] = self.get_stats(conn, db_path)
+
+            conn.execute("ANALYZE")
+            result['operations'].append('ANALYZE')
+
+            conn.execute("PRAGMA optimize")
+            result['operations'].append('PRAGMA optimize')
+
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if auto_vacuum == 2:
+                # 已是增量模式，只回收空闲页
+                conn.execute("PRAGMA incremental_vacuum")
+                result['operations'].append('PRAGMA incremental_vacuum')
+            elif full:
+                # 切换 auto_vacuum 需要一次完整 VACUUM 才能生效，之后每次只做增量回收
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                result['operations'].append('PRAGMA auto_vacuum = INCREMENTAL + VACUUM')
+            else:
+                result['operations'].append('未开启增量 auto_vacuum，跳过空间回收（手工执行完整维护后开启）')
+
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if str(journal_mode).lower() == 'wal':
+                busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+                result['operations'].append(f'PRAGMA wal_checkpoint(TRUNCATE) busy={busy} log={log_frames} checkpointed={checkpointed}')
+
+            result['after'] = self.get_stats(conn, db_path)
+        except Exception as e:
+            result['success'] = False
+            result['error'] = str(e)
+            print(f"维护数据库 {db_path} 失败: {str(e)}")
+        finally:
+            if conn:
+                conn.close()
+
+        result['duration'] = round(time.time() - start, 3)
+        return result
+
+    def run_maintenance(self, full=False):
+        """维护所有数据库，返回每个库的结果列表；full 见 maintain_db"""
+        results = []
+        for db_path in self.get_db_paths():
+            print(f"开始维护数据库: {db_path}")
+            results.append(self.maintain_db(db_path, full))
+        return results
+
+    def format_results(self, results):
+        """将维护结果格式化为运行日志文本"""
+        lines = [f"数据库维护: {self.get_current_time()}"]
+        for item in results:
+            if item['skipped']:
+                lines.append(f"[{item['db']}] 文件不存在，跳过")
+                continue
+            if not item['success']:
+                lines.append(f"[{item['db']}] 失败: {item['error']}")
+                continue
+            before = item['before']
+            after = item['after']
+            lines.append(
+                f"[{item['db']}] 文件大小 {before['file_size']} -> {after['file_size']} 字节，"
+                f"空闲页 {before['freelist_count']} -> {after['freelist_count']}，"
+                f"总页数 {before['page_count']} -> {after['page_count']}，"
+                f"耗时 {item['duration']} 秒"
+            )
+            for operation in item['operations']:
+                lines.append(f"    {operation}")
+        return "\n".join(lines) + "\n"
+
+    def get_current_time(self):
+        """获取当前北京时间"""
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
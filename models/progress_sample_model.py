@@ -0,0 +1,98 @@
+import os
+import sqlite3
+from pathlib import Path
+
+
+class ProgressSampleModel:
+    """
+    任务进度采样：每次运行按固定间隔记录一条（已处理数、总数、速率、阶段），
+    运行结束后可以画出吞吐曲线，分析哪一段变慢
+    """
+
+    def __init__(self, plugin_name: str, data_directory: str):
+        self.plugin_name = plugin_name
+        self.data_directory = data_directory
+        self.table_name = 'task_progress_sample'
+        self.db_path = self.get_db_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.create_tables()
+
+    def get_db_path(self) -> Path:
+        db_dir = Path(self.data_directory) / 'Tables'
+        if not db_dir.exists():
+            db_dir.mkdir(parents=True, exist_ok=True)
+        return db_dir / f'{self.plugin_name}.db'
+
+    def get_connection(self):
+        return sqlite3.connect(str(self.db_path))
+
+    def execute(self, query: str, params=None):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                conn.commit()
+                return cursor.lastrowid
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+    def fetch_all(self, query: str, params=None):
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            rows = cursor.fetchall()
+            return [dict(r) for r in rows]
+
+    def create_tables(self):
+        query = f"""
+        CREATE TABLE IF NOT EXISTS {self.table_name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            task_type TEXT,
+            ts REAL NOT NULL,
+            elapsed REAL,
+            processed INTEGER,
+            total INTEGER,
+            rate REAL,
+            stage TEXT
+        )
+        """
+        self.execute(query)
+        self.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_run ON {self.table_name} (run_id, ts)")
+
+    def add_samples(self, samples):
+        """批量写入采样：(run_id, task_type, ts, elapsed, processed, total, rate, stage)"""
+        if not samples:
+            return
+        with self.get_connection() as conn:
+            conn.executemany(f"""
+                INSERT INTO {self.table_name} (run_id, task_type, ts, elapsed, processed, total, rate, stage)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, samples)
+            conn.commit()
+
+    def get_samples(self, run_id):
+        return self.fetch_all(
+            f"SELECT ts, elapsed, processed, total, rate, stage FROM {self.table_name} WHERE run_id = ? ORDER BY ts",
+            (run_id,)
+        )
+
+    def get_runs(self, limit=50):
+        """最近的运行：每次运行的开始时间、时长、最终处理数和平均速率"""
+        return self.fetch_all(f"""
+            SELECT run_id, task_type, MIN(ts) AS started_at, MAX(elapsed) AS elapsed,
+                   MAX(processed) AS processed, MAX(total) AS total, COUNT(*) AS samples,
+                   ROUND(MAX(processed) / NULLIF(MAX(elapsed), 0), 2) AS avg_rate
+            FROM {self.table_name}
+            GROUP BY run_id
+            ORDER BY started_at DESC
+            LIMIT ?
+        """, (int(limit),))
@@ -2,6 +2,7 @@ import os
 import sqlite3
 from pathlib import Path
 from datetime import datetime
+from models.changelog_model import ChangeLogModel
 
 class RunlogModel:
     def __init__(self, plugin_name: str,data_directory:str):
@@ -102,6 +103,9 @@ class RunlogModel:
                 if current_type != required_type:
                     print(f"字段 {column_name} 类型需要从 {current_type} 更新为 {required_type}")
                     self.modify_column_type(column_name, required_type)
+
+        # 增删改记录到变更日志，供前端增量同步
+        ChangeLogModel(self.plugin_name, self.data_directory).ensure_triggers(self.table_name)
         
         
             
@@ -186,7 +190,7 @@ class RunlogModel:
             query = """
             SELECT 
                 l.*,
-                t.name as task_name
+                COALESCE(t.name, CASE WHEN l.task_id = 0 THEN '内置任务' END) as task_name
             FROM task_runlog l
             LEFT JOIN tasks t ON l.task_id = t.id
             ORDER BY l.created_at DESC
@@ -2,6 +2,7 @@ import os
 import sqlite3
 from pathlib import Path
 from datetime import datetime
+from models.changelog_model import ChangeLogModel
 
 class TaskModel:
     def __init__(self, plugin_name: str,data_directory:str):
@@ -32,6 +33,10 @@ class TaskModel:
     def get_connection(self):
         print("self.db_path:=============", self.db_path)
         return sqlite3.connect(str(self.db_path))
+    
+    def get_account_db_path(self) -> Path:
+        """账号库路径，与 AccountmanageModel 保持一致"""
+        return Path(self.data_directory) / 'Tables' / 'account-manage.db'
 
     def execute(self, query: str, params=None):
         with self.get_connection() as conn:
@@ -113,6 +118,9 @@ class TaskModel:
                 if current_type != required_type:
                     print(f"字段 {column_name} 类型需要从 {current_type} 更新为 {required_type}")
                     self.modify_column_type(column_name, required_type)
+
+        # 增删改记录到变更日志，供前端增量同步
+        ChangeLogModel(self.plugin_name, self.data_directory).ensure_triggers(self.table_name)
         
         
          
@@ -279,6 +287,36 @@ class TaskModel:
         return result[0] if result else None
         
     
+    def get_task_with_account(self, task_id: int):
+        """
+        根据ID获取任务详情及其账号信息
+        通过 ATTACH 账号库，在一次查询中关联 params 里的 account_id
+        """
+        account_db_path = self.get_account_db_path()
+        if not account_db_path.exists():
+            return self.get_task_by_id(task_id)
+        
+        query = """
+        SELECT t.*,
+            a.username AS account_username,
+            a.platform_name AS account_platform_name,
+            a.status AS account_status,
+            a.login_status AS account_login_status
+        FROM tasks t
+        LEFT JOIN account_db.accountmanage a
+            ON a.id = CAST(json_extract(t.params, '$.account_id') AS INTEGER)
+        WHERE t.id = ?
+        """
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            conn.execute("ATTACH DATABASE ? AS account_db", (str(account_db_path),))
+            try:
+                rows = conn.execute(query, (task_id,)).fetchall()
+            finally:
+                conn.execute("DETACH DATABASE account_db")
+            return dict(rows[0]) if rows else None
+        
+    
     
     def get_current_time(self):
         """获取当前北京时间"""
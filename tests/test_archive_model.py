@@ -0,0 +1,40 @@
+import sqlite3
+
+from models.archive_model import ArchiveModel
+from models.example_model import ExampleModel
+
+
+def write_archive(archive_model, month, rows):
+    conn = sqlite3.connect(str(archive_model.get_archive_path(month)))
+    conn.execute("CREATE TABLE example_table (id INTEGER PRIMARY KEY, title TEXT, link TEXT, created_at TEXT)")
+    conn.executemany("INSERT INTO example_table (title, link, created_at) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def test_history_covers_more_archives_than_attach_limit(tmp_path):
+    example_model = ExampleModel("test_plugin", str(tmp_path))
+    example_model.add_items([{'title': 'main', 'link': 'https://example.com/main', 'author': 'a'}])
+    archive_model = ArchiveModel("test_plugin", str(tmp_path))
+
+    months = [f"2024{m:02d}" for m in range(1, 13)] + ["202501", "202502", "202503"]
+    assert len(months) > ArchiveModel.MAX_ATTACHED
+    for month in months:
+        created_at = f"{month[:4]}-{month[4:]}-15 12:00:00"
+        write_archive(archive_model, month, [(f"t{month}", f"https://example.com/{month}", created_at)])
+
+    result = example_model.get_items(page=1, page_size=100, include_history=True)
+    assert result['total'] == len(months) + 1
+    assert result['items'][0]['title'] == 'main'
+    # 最早的月份也能查到，并且整体按 created_at 倒序
+    assert result['items'][-1]['title'] == 't202401'
+    created = [item['created_at'] for item in result['items']]
+    assert created == sorted(created, reverse=True)
+
+    # 跨批次翻页：第 2 页从第 6 条开始
+    page = example_model.get_items(page=2, page_size=5, include_history=True)
+    assert [item['title'] for item in page['items']] == [item['title'] for item in result['items'][5:10]]
+
+    result = example_model.get_items(page=1, page_size=10, keyword='202402', include_history=True)
+    assert result['total'] == 1
+    assert result['items'][0]['archived'] == 1
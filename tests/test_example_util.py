@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("win32gui")
+
+from utils.example_util import ExampleUtil, SEARCH_API
+from models.checkpoint_model import CheckpointModel
+
+
+class FakeRoute:
+    def __init__(self, url):
+        self.request = SimpleNamespace(url=url)
+        self.url = None
+
+    def continue_(self, url=None):
+        self.url = url
+
+    def fallback(self):
+        self.url = self.request.url
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.url = f"https://www.douyin.com/{SEARCH_API}?offset=0"
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def search_offset(util, page_offset):
+    route = FakeRoute(f"https://www.douyin.com/{SEARCH_API}?keyword=test&offset={page_offset}&count=10")
+    util._route_resume(route)
+    return int(parse_qs(urlparse(route.url).query)['offset'][0])
+
+
+@pytest.mark.parametrize("seen_filter", ["set", "bloom"])
+def test_resume_from_mid_run_checkpoint(tmp_path, seen_filter):
+    checkpoint_model = CheckpointModel("test_plugin", str(tmp_path))
+
+    util = ExampleUtil(str(tmp_path), seen_filter=seen_filter)
+    util._emit_batch([{'aweme_id': str(i)} for i in range(100, 120)])
+    util.cursor = 120
+    state = util.get_checkpoint_state()
+    checkpoint_model.save_checkpoint(
+        "test", "抖音", "user", state['cursor'], state.get('seen_ids'), state['counters'], 'stopped',
+        seen_filter=state.get('seen_filter'), seen_count=state['seen_count']
+    )
+
+    resumed = ExampleUtil(str(tmp_path), seen_filter=seen_filter)
+    checkpoint = checkpoint_model.get_checkpoint("test", "抖音", "user")
+    assert checkpoint['seen_count'] == 20
+    resumed.resume_from(checkpoint)
+
+    # 断点之前采过的视频不再回调
+    assert resumed._dedupe([{'aweme_id': '105'}, {'aweme_id': '200'}]) == [{'aweme_id': '200'}]
+
+    # 新页面从 offset=0 开始翻页，每个请求都从断点游标往后
+    assert search_offset(resumed, 0) == 120
+    resumed.handle_response(FakeResponse({'cursor': 130, 'has_more': 1, 'data': []}))
+    assert search_offset(resumed, 10) == 130
+    resumed.handle_response(FakeResponse({'cursor': 140, 'has_more': 1, 'data': []}))
+    assert search_offset(resumed, 20) == 140
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("apscheduler")
+
+from utils import task_scheduler
+from utils.task_scheduler import TaskScheduler, start_main_scheduler, BUILTIN_JOB_IDS
+from controllers.task_controller import TaskController
+
+
+@pytest.fixture
+def main_scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_scheduler, "_main_scheduler", None)
+    scheduler = start_main_scheduler("test_plugin", str(tmp_path))
+    yield scheduler
+    scheduler.scheduler.shutdown(wait=False)
+
+
+def test_main_scheduler_registers_builtin_jobs(main_scheduler, tmp_path):
+    job_ids = {job.id for job in main_scheduler.scheduler.get_jobs()}
+    assert set(BUILTIN_JOB_IDS) <= job_ids
+    # 同一进程内只创建一次
+    assert start_main_scheduler("test_plugin", str(tmp_path)) is main_scheduler
+
+
+def test_main_scheduler_keeps_builtin_jobs_after_reload(main_scheduler):
+    main_scheduler.reload_tasks()
+    job_ids = {job.id for job in main_scheduler.scheduler.get_jobs()}
+    assert set(BUILTIN_JOB_IDS) <= job_ids
+
+
+def test_runner_scheduler_has_no_builtin_jobs(tmp_path):
+    controller = TaskController("test_plugin", str(tmp_path))
+    try:
+        assert controller.task_scheduler.scheduler.get_jobs() == []
+    finally:
+        controller.task_scheduler.scheduler.shutdown(wait=False)
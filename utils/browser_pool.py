@@ -0,0 +1,407 @@
+"""
+浏览器常驻池
+
+每个账号（浏览器用户目录）保留一个常驻的 Chrome：以远程调试方式启动并脱离采集进程，
+采集时通过 CDP 连上去新开一个标签页，结束只关闭自己打开的标签页，下一次采集直接复用，省去冷启动。
+常驻浏览器一直占用账号的用户目录，不经过池直接打开该目录之前要先调用 evict 关闭它。
+
+池的登记信息保存在 Tables/browser-pool.db，界面和定时任务启动的各个 plugin_runner 进程共用。
+借用前做健康检查（进程存活、调试端口可访问），空闲超时、服务标签页数或内存超过上限的浏览器
+在没有人借用时关闭，下次借用时重新启动。
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import subprocess
+import urllib.request
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime
+
+import psutil
+
+try:
+    from utils.cancellation import current_token
+except ImportError:
+    from cancellation import current_token
+
+
+# 常驻浏览器的命令行标记，进程控制据此跳过池中的浏览器，任务结束时不会被一并关闭
+POOL_MARKER_ARG = '--browser-pool-member'
+# 空闲多少秒后关闭
+DEFAULT_IDLE_TIMEOUT = 900
+# 累计服务多少个标签页后重启，避免长时间运行的浏览器越来越慢
+DEFAULT_MAX_PAGES = 200
+# 浏览器所有进程的内存合计超过多少 MB 后重启
+DEFAULT_MAX_MEMORY_MB = 2048
+# 等待浏览器调试端口就绪的时间（秒）
+STARTUP_TIMEOUT = 20
+# Windows 下让常驻浏览器脱离 runner 所在的 Job，任务结束关闭 Job 时不受影响
+CREATE_BREAKAWAY_FROM_JOB = 0x01000000
+
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-infobars',
+    '--no-default-browser-check',
+    '--no-first-run',
+    # 常驻浏览器可能同时开多个标签页，关闭后台降频
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding'
+]
+
+
+def find_chrome_executable():
+    """本机 Chrome 路径，可用环境变量 CHROME_PATH 指定"""
+    candidates = [os.environ.get('CHROME_PATH')]
+    if sys.platform == 'win32':
+        for base in (os.environ.get('PROGRAMFILES'), os.environ.get('PROGRAMFILES(X86)'), os.environ.get('LOCALAPPDATA')):
+            if base:
+                candidates.append(os.path.join(base, 'Google', 'Chrome', 'Application', 'chrome.exe'))
+    elif sys.platform == 'darwin':
+        candidates.append('/Applications/Google Chrome.app/Contents/MacOS/Google Chrome')
+    else:
+        candidates.extend(['/usr/bin/google-chrome', '/usr/bin/google-chrome-stable', '/opt/google/chrome/chrome'])
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def is_pool_process(proc):
+    """进程是否属于浏览器池；渲染等子进程的命令行里没有标记，沿父进程向上查找"""
+    try:
+        while proc is not None:
+            if POOL_MARKER_ARG in (proc.cmdline() or []):
+                return True
+            proc = proc.parent()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    return False
+
+
+class BrowserPool:
+    def __init__(self, data_directory, idle_timeout=DEFAULT_IDLE_TIMEOUT, max_pages=DEFAULT_MAX_PAGES,
+                 max_memory_mb=DEFAULT_MAX_MEMORY_MB):
+        """
+        :param idle_timeout: 空闲超时（秒），reap_idle 时关闭
+        :param max_pages: 累计服务的标签页数上限，达到后归还时关闭
+        :param max_memory_mb: 浏览器内存上限（MB），超过后归还时关闭
+        """
+        self.data_directory = data_directory
+        self.idle_timeout = idle_timeout
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.db_path = self.get_db_path()
+        self.create_tables()
+
+    def get_db_path(self) -> Path:
+        db_dir = Path(self.data_directory) / 'Tables'
+        if not db_dir.exists():
+            db_dir.mkdir(parents=True, exist_ok=True)
+        return db_dir / 'browser-pool.db'
+
+    def get_connection(self):
+        # 启动浏览器期间一直持有写锁，等待时间要比启动超时长
+        conn = sqlite3.connect(str(self.db_path), timeout=STARTUP_TIMEOUT * 3, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_tables(self):
+        conn = self.get_connection()
+        try:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS browser_pool (
+                profile_dir TEXT PRIMARY KEY,
+                pid INTEGER NOT NULL,
+                port INTEGER NOT NULL,
+                headless INTEGER DEFAULT 0,
+                borrowers TEXT DEFAULT '[]',
+                pages_served INTEGER DEFAULT 0,
+                started_at REAL,
+                last_used_at REAL
+            )
+            """)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：同一用户目录的启动、借用、回收在所有进程间串行"""
+        conn = self.get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def profile_key(user_data_dir):
+        return os.path.normcase(os.path.abspath(user_data_dir))
+
+    @staticmethod
+    def endpoint(port):
+        return f"http://127.0.0.1:{port}"
+
+    def _is_healthy(self, row):
+        """进程存活且调试端口能响应"""
+        if not psutil.pid_exists(row['pid']):
+            return False
+        try:
+            with urllib.request.urlopen(f"{self.endpoint(row['port'])}/json/version", timeout=3) as response:
+                return response.status == 200
+        except Exception:
+            return False
+
+    def _memory_mb(self, pid):
+        """浏览器主进程及所有子进程的内存合计"""
+        total = 0
+        try:
+            root = psutil.Process(pid)
+            for proc in [root] + root.children(recursive=True):
+                try:
+                    total += proc.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+        except psutil.NoSuchProcess:
+            return 0
+        return total / 1024 / 1024
+
+    @staticmethod
+    def _live_borrowers(row):
+        """借用中的进程，借用进程崩溃后不再计入"""
+        return [pid for pid in json.loads(row['borrowers'] or '[]') if psutil.pid_exists(pid)]
+
+    def _recycle_reason(self, row):
+        if row['pages_served'] >= self.max_pages:
+            return f"已服务 {row['pages_served']} 个标签页"
+        memory_mb = self._memory_mb(row['pid'])
+        if memory_mb > self.max_memory_mb:
+            return f"内存 {memory_mb:.0f}MB 超过上限"
+        return None
+
+    def _terminate(self, pid, browser=None):
+        """
+        关闭浏览器
+        有 CDP 连接时先发 Browser.close 让浏览器正常退出（Cookie 等写回磁盘），超时再结束进程
+        """
+        if browser is not None:
+            try:
+                browser.new_browser_cdp_session().send("Browser.close")
+            except Exception as e:
+                print(f"【浏览器池】正常关闭浏览器失败: {str(e)}")
+        try:
+            root = psutil.Process(pid)
+            children = root.children(recursive=True)
+            if browser is None:
+                root.terminate()
+            try:
+                root.wait(timeout=5)
+            except psutil.TimeoutExpired:
+                root.kill()
+            for child in children:
+                try:
+                    child.kill()
+                except psutil.NoSuchProcess:
+                    pass
+        except psutil.NoSuchProcess:
+            pass
+
+    def _launch(self, conn, key, user_data_dir, executable_path, headless):
+        """启动脱离当前进程的常驻浏览器，调试端口由浏览器自选并写入 DevToolsActivePort"""
+        os.makedirs(user_data_dir, exist_ok=True)
+        port_file = Path(user_data_dir) / 'DevToolsActivePort'
+        if port_file.exists():
+            port_file.unlink()
+
+        args = [executable_path, f'--user-data-dir={user_data_dir}', '--remote-debugging-port=0', POOL_MARKER_ARG] + BROWSER_ARGS
+        args += ['--headless=new'] if headless else ['--start-maximized']
+        args.append('about:blank')  # 保留一个空白页，关闭采集标签页后浏览器不会退出
+
+        options = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+        if sys.platform == 'win32':
+            options['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP | CREATE_BREAKAWAY_FROM_JOB
+        else:
+            options['start_new_session'] = True
+        print(f"【浏览器池】启动常驻浏览器: {user_data_dir}")
+        try:
+            process = subprocess.Popen(args, **options)
+        except PermissionError:
+            # 所在的 Job 不允许脱离（不是由 ProcessGroup 启动的进程），按普通方式启动
+            options['creationflags'] &= ~CREATE_BREAKAWAY_FROM_JOB
+            process = subprocess.Popen(args, **options)
+
+        try:
+            deadline = time.time() + STARTUP_TIMEOUT
+            while time.time() < deadline:
+                if process.poll() is not None:
+                    raise RuntimeError("浏览器启动后立即退出，该用户目录可能已被其他浏览器占用")
+                if port_file.exists():
+                    try:
+                        port = int(port_file.read_text().splitlines()[0])
+                    except (IndexError, ValueError):
+                        port = 0
+                    row = {'pid': process.pid, 'port': port}
+                    if port and self._is_healthy(row):
+                        break
+                current_token().sleep(0.2)
+            else:
+                raise RuntimeError(f"常驻浏览器 {STARTUP_TIMEOUT} 秒内未就绪")
+        except BaseException:
+            # 启动失败或等待时任务被停止，不留下没有登记的浏览器
+            self._terminate(process.pid)
+            raise
+
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO browser_pool (profile_dir, pid, port, headless, borrowers, pages_served, started_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, '[]', 0, ?, ?)",
+            (key, process.pid, port, 1 if headless else 0, now, now)
+        )
+        print(f"【浏览器池】常驻浏览器已就绪: PID {process.pid}，端口 {port}")
+        return row
+
+    def acquire(self, user_data_dir, executable_path=None, headless=False):
+        """
+        借用账号的常驻浏览器，没有或不可用时启动
+        :return: (CDP 地址, 浏览器进程ID)
+        """
+        key = self.profile_key(user_data_dir)
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM browser_pool WHERE profile_dir = ?", (key,)).fetchone()
+            borrowers = []
+            if row is not None:
+                borrowers = self._live_borrowers(row)
+                if not self._is_healthy(row):
+                    reason = "健康检查失败"
+                elif borrowers:
+                    reason = None
+                elif bool(row['headless']) != bool(headless):
+                    reason = "有界面/无头模式不一致"
+                else:
+                    reason = self._recycle_reason(row)
+                if reason:
+                    print(f"【浏览器池】重启常驻浏览器 {key}: {reason}")
+                    self._terminate(row['pid'])
+                    conn.execute("DELETE FROM browser_pool WHERE profile_dir = ?", (key,))
+                    row = None
+                    borrowers = []
+
+            if row is None:
+                if not executable_path:
+                    raise RuntimeError("未找到 Chrome，可用环境变量 CHROME_PATH 指定")
+                row = self._launch(conn, key, user_data_dir, executable_path, headless)
+
+            borrowers.append(os.getpid())
+            conn.execute(
+                "UPDATE browser_pool SET borrowers = ?, last_used_at = ? WHERE profile_dir = ?",
+                (json.dumps(borrowers), time.time(), key)
+            )
+        return self.endpoint(row['port']), row['pid']
+
+    def release(self, user_data_dir, pages=1, browser=None):
+        """
+        归还浏览器，累计服务的标签页数
+        没有其他借用者且达到回收条件时关闭
+        :param browser: 当前的 CDP 连接，回收时用来正常关闭浏览器
+        """
+        key = self.profile_key(user_data_dir)
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM browser_pool WHERE profile_dir = ?", (key,)).fetchone()
+            if row is None:
+                return
+            borrowers = self._live_borrowers(row)
+            if os.getpid() in borrowers:
+                borrowers.remove(os.getpid())
+            pages_served = row['pages_served'] + pages
+            conn.execute(
+                "UPDATE browser_pool SET borrowers = ?, pages_served = ?, last_used_at = ? WHERE profile_dir = ?",
+                (json.dumps(borrowers), pages_served, time.time(), key)
+            )
+            if borrowers:
+                return
+            reason = self._recycle_reason({'pid': row['pid'], 'pages_served': pages_served})
+            if reason:
+                print(f"【浏览器池】回收常驻浏览器 {key}: {reason}")
+                self._terminate(row['pid'], browser)
+                conn.execute("DELETE FROM browser_pool WHERE profile_dir = ?", (key,))
+
+    def evict(self, user_data_dir):
+        """
+        关闭该用户目录的常驻浏览器，不经过池启动持久化上下文前调用，否则用户目录仍被占用
+        有其他进程正在借用时抛出 RuntimeError
+        :return: 是否关闭了浏览器
+        """
+        key = self.profile_key(user_data_dir)
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM browser_pool WHERE profile_dir = ?", (key,)).fetchone()
+            if row is None:
+                return False
+            if self._live_borrowers(row) and psutil.pid_exists(row['pid']):
+                raise RuntimeError("该账号的常驻浏览器正在被其他任务使用")
+            print(f"【浏览器池】关闭常驻浏览器 {key}: 需要直接打开该用户目录")
+            self._terminate(row['pid'])
+            conn.execute("DELETE FROM browser_pool WHERE profile_dir = ?", (key,))
+            return True
+
+    def reap_idle(self):
+        """关闭空闲超时、已失效或达到回收条件的常驻浏览器，返回关闭的数量"""
+        closed = 0
+        now = time.time()
+        with self._transaction() as conn:
+            for row in conn.execute("SELECT * FROM browser_pool").fetchall():
+                if not self._is_healthy(row):
+                    reason = "健康检查失败"
+                elif self._live_borrowers(row):
+                    continue
+                elif now - (row['last_used_at'] or 0) > self.idle_timeout:
+                    reason = f"空闲 {int(now - row['last_used_at'])} 秒"
+                else:
+                    reason = self._recycle_reason(row)
+                if not reason:
+                    continue
+                print(f"【浏览器池】关闭常驻浏览器 {row['profile_dir']}: {reason}")
+                self._terminate(row['pid'])
+                conn.execute("DELETE FROM browser_pool WHERE profile_dir = ?", (row['profile_dir'],))
+                closed += 1
+        return closed
+
+    def shutdown_all(self):
+        """关闭所有没有借用者的常驻浏览器"""
+        closed = 0
+        with self._transaction() as conn:
+            for row in conn.execute("SELECT * FROM browser_pool").fetchall():
+                if self._live_borrowers(row) and psutil.pid_exists(row['pid']):
+                    continue
+                self._terminate(row['pid'])
+                conn.execute("DELETE FROM browser_pool WHERE profile_dir = ?", (row['profile_dir'],))
+                closed += 1
+        return closed
+
+    def get_status(self):
+        """池中浏览器的状态"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute("SELECT * FROM browser_pool ORDER BY profile_dir").fetchall()
+        finally:
+            conn.close()
+        now = time.time()
+        return [{
+            'profile_dir': row['profile_dir'],
+            'pid': row['pid'],
+            'port': row['port'],
+            'headless': bool(row['headless']),
+            'alive': psutil.pid_exists(row['pid']),
+            'borrowers': self._live_borrowers(row),
+            'pages_served': row['pages_served'],
+            'memory_mb': round(self._memory_mb(row['pid']), 1),
+            'idle_seconds': int(now - (row['last_used_at'] or now)),
+            'started_at': datetime.fromtimestamp(row['started_at']).strftime('%Y-%m-%d %H:%M:%S') if row['started_at'] else None
+        } for row in rows]
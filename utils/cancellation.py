@@ -0,0 +1,149 @@
+"""
+协作式取消/暂停令牌
+
+任务代码在循环里调用 check() 或用 sleep() 代替 time.sleep：
+收到停止时抛出 InterruptedError，暂停时原地等待继续；状态变化通过条件变量立即唤醒等待者，
+不需要替换全局 time.sleep，也不需要每次睡眠都去读控制文件。
+
+令牌按线程绑定（bind_token），任务里另开的线程要把父线程的令牌显式绑定过去；
+没有绑定令牌的线程拿到的是永不取消的空令牌，sleep() 等同于 time.sleep。
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+
+class CancellationToken:
+    def __init__(self, parent=None):
+        """
+        :param parent: 父令牌，父令牌停止/暂停时本令牌同样生效（定时任务 → 其中启动的采集任务）
+        """
+        self._cond = threading.Condition()
+        self._cancelled = False
+        self._paused = False
+        self._children = []
+        self.parent = parent
+        if parent is not None:
+            parent._add_child(self)
+
+    def _add_child(self, child):
+        with self._cond:
+            self._children.append(child)
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+            children = list(self._children)
+        for child in children:
+            child._notify()
+
+    @property
+    def cancelled(self):
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def paused(self):
+        return self._paused or (self.parent is not None and self.parent.paused)
+
+    def cancel(self):
+        """停止，所有等待者立即被唤醒"""
+        with self._cond:
+            self._cancelled = True
+        self._notify()
+
+    def pause(self):
+        with self._cond:
+            self._paused = True
+        self._notify()
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+        self._notify()
+
+    def check(self):
+        """停止时抛出 InterruptedError；暂停时阻塞到继续或停止"""
+        if self.cancelled:
+            raise InterruptedError("任务已被停止")
+        if self.paused:
+            self._wait_while_paused()
+
+    def _wait_while_paused(self):
+        pause_start = time.time()
+        print("检测到暂停信号，暂停执行")
+        with self._cond:
+            while self.paused and not self.cancelled:
+                # 父令牌的状态变化也会通知到这里，超时只是兜底
+                self._cond.wait(1.0)
+        if self.cancelled:
+            raise InterruptedError("任务已被停止")
+        pause_duration = time.time() - pause_start
+        print(f"恢复执行，暂停了 {pause_duration:.2f} 秒")
+        return pause_duration
+
+    def sleep(self, seconds):
+        """
+        可中断的睡眠：停止时立即抛出 InterruptedError，暂停的时间不计入睡眠时长
+        """
+        self.check()
+        end_time = time.time() + seconds
+        with self._cond:
+            while True:
+                if self.cancelled:
+                    raise InterruptedError("任务已被停止")
+                if self.paused:
+                    break
+                remaining = end_time - time.time()
+                if remaining <= 0:
+                    return
+                self._cond.wait(remaining)
+        # 睡眠中被暂停：等到继续后把剩余时间睡完
+        remaining = end_time - time.time()
+        self._wait_while_paused()
+        self.sleep(max(remaining, 0))
+
+
+class _NullToken(CancellationToken):
+    """没有绑定令牌时使用，永不取消也不暂停"""
+
+    def _add_child(self, child):
+        # 空令牌不会变化，不需要记录子令牌
+        pass
+
+    def cancel(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+NULL_TOKEN = _NullToken()
+_local = threading.local()
+
+
+def current_token():
+    """当前线程绑定的令牌"""
+    return getattr(_local, 'token', None) or NULL_TOKEN
+
+
+@contextmanager
+def bind_token(token):
+    """在当前线程绑定令牌，退出时恢复原来的令牌"""
+    previous = getattr(_local, 'token', None)
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def check():
+    current_token().check()
+
+
+def sleep(seconds):
+    current_token().sleep(seconds)
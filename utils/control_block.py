@@ -0,0 +1,248 @@
+"""
+主进程与 runner 子进程之间的共享内存控制块
+
+原来双方反复重写、重新解析同一个 JSON 控制文件：写入不是原子的，读方可能读到半截 JSON，
+而且每个进程都要不停轮询。这里换成一个固定布局的 mmap 文件：
+
+    头部    magic | 控制门铃端口 | 状态门铃端口
+    控制区  序号 | 指令 | 时间戳                  主进程写，runner 读（run/pause/resume/stop）
+    状态区  序号 | 长度 | JSON（任务进度）         runner 写，主进程读
+
+每个区用序号做顺序锁：写之前序号变为奇数，写完变为偶数，读方看到奇数或前后序号不一致就重读，
+不会读到写了一半的数据。写完后向对方监听的本机 UDP 端口发一个字节作为门铃，
+等待方被立即唤醒，不需要按固定间隔轮询；门铃丢失时等待方每秒重读一次序号兜底。
+"""
+import os
+import json
+import mmap
+import time
+import struct
+import socket
+import threading
+from pathlib import Path
+
+
+MAGIC = b'PCB1'
+# 头部：magic、控制区门铃端口（runner 监听）、状态区门铃端口（主进程监听）
+HEADER = struct.Struct('<4sHH')
+# 控制区：序号、指令、时间戳
+CONTROL = struct.Struct('<QB7xd')
+# 状态区头：序号、JSON 长度
+STATUS = struct.Struct('<QI4x')
+
+CONTROL_OFFSET = 8
+STATUS_OFFSET = 32
+STATUS_CAPACITY = 64 * 1024
+BLOCK_SIZE = STATUS_OFFSET + STATUS.size + STATUS_CAPACITY
+
+ACTIONS = ('run', 'pause', 'resume', 'stop')
+
+# 读方看到写入中（奇数序号）最多等待的秒数，超过说明写方在写入中途退出了，按没有更新处理
+STALE_WRITE_TIMEOUT = 0.1
+
+# 门铃端口在头部中的偏移
+CONTROL_PORT_OFFSET = 4
+STATUS_PORT_OFFSET = 6
+
+
+class ControlBlock:
+    def __init__(self, path, create=False):
+        """
+        :param path: 控制块文件路径（通过 PROCESS_CONTROL_FILE 传给 runner）
+        :param create: 主进程创建并初始化控制块，runner 只打开已有的
+        """
+        self.path = str(path)
+        if create:
+            with open(self.path, 'wb') as f:
+                f.write(b'\0' * BLOCK_SIZE)
+        self._file = open(self.path, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), BLOCK_SIZE)
+        if create:
+            HEADER.pack_into(self._mm, 0, MAGIC, 0, 0)
+        elif HEADER.unpack_from(self._mm, 0)[0] != MAGIC:
+            raise ValueError(f"不是控制块文件: {self.path}")
+
+        self._write_lock = threading.Lock()
+        # 每个区最近一次读到的一致快照，写方中途退出留下奇数序号时返回它
+        self._last_read = {}
+        self._cond = threading.Condition()
+        self._listeners = {}
+        self._sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    # ---------- 顺序锁 ----------
+
+    def _write_section(self, offset, pack):
+        """序号先变奇数再写数据，写完变偶数；同一进程内多个线程写同一区时串行"""
+        with self._write_lock:
+            seq = struct.unpack_from('<Q', self._mm, offset)[0]
+            # 上一个写方中途退出留下的奇数序号，从下一个偶数开始
+            seq += seq % 2
+            struct.pack_into('<Q', self._mm, offset, seq + 1)
+            pack()
+            struct.pack_into('<Q', self._mm, offset, seq + 2)
+        return seq + 2
+
+    def _read_section(self, offset, unpack):
+        """
+        读到一致的快照为止：写入中（奇数）或读的过程中序号变化都重读
+        序号停在奇数超过 STALE_WRITE_TIMEOUT 秒视为没有更新，返回上一次读到的快照（从未读到过时数据为 None）
+        """
+        stale_deadline = None
+        while True:
+            before = struct.unpack_from('<Q', self._mm, offset)[0]
+            if before % 2:
+                if stale_deadline is None:
+                    stale_deadline = time.time() + STALE_WRITE_TIMEOUT
+                elif time.time() >= stale_deadline:
+                    return self._last_read.get(offset, (before - 1, None))
+                time.sleep(0)
+                continue
+            value = unpack()
+            if struct.unpack_from('<Q', self._mm, offset)[0] == before:
+                self._last_read[offset] = (before, value)
+                return before, value
+
+    # ---------- 门铃 ----------
+
+    def _ring(self, port_offset):
+        port = struct.unpack_from('<H', self._mm, port_offset)[0]
+        if not port:
+            return
+        try:
+            self._sender.sendto(b'\1', ('127.0.0.1', port))
+        except OSError:
+            pass
+
+    def _listen(self, port_offset):
+        """在本进程启动门铃监听线程（每个方向一个），收到门铃唤醒所有等待者"""
+        with self._cond:
+            if port_offset in self._listeners:
+                return
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(('127.0.0.1', 0))
+            self._listeners[port_offset] = sock
+            struct.pack_into('<H', self._mm, port_offset, sock.getsockname()[1])
+
+        def run():
+            while True:
+                try:
+                    sock.recv(64)
+                except OSError:
+                    return
+                with self._cond:
+                    self._cond.notify_all()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _wait(self, port_offset, read, last_seq, timeout):
+        self._listen(port_offset)
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                seq, value = read()
+                if seq != last_seq:
+                    return seq, value
+                remaining = 1.0 if deadline is None else min(deadline - time.time(), 1.0)
+                if remaining <= 0:
+                    return seq, value
+                self._cond.wait(remaining)
+
+    # ---------- 控制区：主进程 → runner ----------
+
+    def write_control(self, action):
+        """写入控制指令并敲门铃"""
+        code = ACTIONS.index(action)
+        seq = self._write_section(
+            CONTROL_OFFSET,
+            lambda: CONTROL.pack_into(self._mm, CONTROL_OFFSET, 0, code, time.time())
+        )
+        self._ring(CONTROL_PORT_OFFSET)
+        return seq
+
+    def read_control(self):
+        """:return: (序号, 指令, 时间戳)"""
+        seq, value = self._read_section(
+            CONTROL_OFFSET, lambda: CONTROL.unpack_from(self._mm, CONTROL_OFFSET)
+        )
+        if value is None:
+            return seq, 'run', 0
+        _, code, timestamp = value
+        return seq, ACTIONS[code] if code < len(ACTIONS) else 'run', timestamp
+
+    def wait_control(self, last_seq, timeout=None):
+        """
+        阻塞到控制指令变化或超时
+        :return: (序号, 指令)
+        """
+        def read():
+            seq, action, _ = self.read_control()
+            return seq, action
+
+        return self._wait(CONTROL_PORT_OFFSET, read, last_seq, timeout)
+
+    # ---------- 状态区：runner → 主进程 ----------
+
+    def write_status(self, state):
+        """写入任务状态（action/status/task_info 等）并敲门铃"""
+        data = json.dumps(state, ensure_ascii=False).encode('utf-8')
+        if len(data) > STATUS_CAPACITY:
+            raise ValueError(f"任务状态过大: {len(data)} 字节")
+
+        def pack():
+            STATUS.pack_into(self._mm, STATUS_OFFSET, 0, len(data))
+            start = STATUS_OFFSET + STATUS.size
+            self._mm[start:start + len(data)] = data
+
+        seq = self._write_section(STATUS_OFFSET, pack)
+        self._ring(STATUS_PORT_OFFSET)
+        return seq
+
+    def read_status(self):
+        """:return: (序号, 状态字典)，还没有写入过时状态为 None"""
+        def unpack():
+            length = STATUS.unpack_from(self._mm, STATUS_OFFSET)[1]
+            start = STATUS_OFFSET + STATUS.size
+            return bytes(self._mm[start:start + length])
+
+        seq, data = self._read_section(STATUS_OFFSET, unpack)
+        return seq, json.loads(data.decode('utf-8')) if data else None
+
+    def wait_status(self, last_seq, timeout=None):
+        """阻塞到任务状态变化或超时，:return: (序号, 状态字典)"""
+        return self._wait(STATUS_PORT_OFFSET, self.read_status, last_seq, timeout)
+
+    def close(self):
+        for sock in self._listeners.values():
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._listeners = {}
+        self._sender.close()
+        try:
+            self._mm.close()
+            self._file.close()
+        except (BufferError, ValueError):
+            pass
+
+
+_opened = {}
+_opened_lock = threading.Lock()
+
+
+def open_control_block(path=None):
+    """
+    打开 runner 的控制块（默认取 PROCESS_CONTROL_FILE），同一进程内共用一个实例和一条门铃监听线程
+    没有控制块或打不开时返回 None
+    """
+    path = path or os.environ.get('PROCESS_CONTROL_FILE')
+    if not path or not Path(path).exists():
+        return None
+    with _opened_lock:
+        if path not in _opened:
+            try:
+                _opened[path] = ControlBlock(path)
+            except (OSError, ValueError) as e:
+                print(f"打开控制块失败: {e}")
+                return None
+        return _opened[path]
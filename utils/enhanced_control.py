@@ -1,87 +1,141 @@
 # utils/enhanced_control.py
 import functools
 import threading
-import time
 import traceback
-import signal
-import os
 import psutil
 import uuid
-import json
+
+try:
+    from utils.cancellation import CancellationToken, bind_token, current_token
+    from utils.control_block import open_control_block
+except ImportError:
+    from cancellation import CancellationToken, bind_token, current_token
+    from control_block import open_control_block
+
+
+# 令牌 → 进程控制实例：任务代码启动浏览器后按当前线程绑定的令牌找到所属任务
+_controls = {}
+_controls_lock = threading.Lock()
+
+
+def register_task_browsers(pids):
+    """
+    把任务代码刚启动的浏览器登记到当前任务，停止时只关闭这些浏览器
+    按当前线程绑定的令牌查找，采集线程绑定的子令牌会沿父令牌找到所属任务
+    :return: 是否找到所属任务
+    """
+    token = current_token()
+    while token is not None:
+        with _controls_lock:
+            control = _controls.get(token)
+        if control is not None:
+            for pid in pids:
+                control.register_browser_pid(pid)
+            return True
+        token = token.parent
+    return False
+
 
 class EnhancedProcessControl:
-    """增强的进程控制类，支持文件控制"""
-    def __init__(self):
-        self._paused = threading.Event()
-        self._stopped = threading.Event()
+    """增强的进程控制类，支持控制块指令；暂停/停止状态保存在取消令牌中，任务代码通过令牌响应"""
+    def __init__(self, parent_token=None):
+        # 定时任务中启动时挂到定时任务的令牌下，取消定时任务会一并停止
+        self.token = CancellationToken(parent=parent_token)
         self._browser_pids = []
         self._session_id = str(uuid.uuid4())[:8]
-        self._paused.set()  # 初始状态：未暂停
+        self._watcher = None
+        self._watching = threading.Event()
+        with _controls_lock:
+            _controls[self.token] = self
         
-        # 添加文件控制支持
-        self._control_file = os.environ.get('PROCESS_CONTROL_FILE')
+        # 主进程的控制块（从控制窗口启动时才有），控制指令通过门铃立即送达
+        self._control_block = open_control_block()
+        self._control_seq = None
         print(f"创建新的进程控制实例 ID: {self._session_id}")
-        if self._control_file:
-            print(f"启用文件控制: {self._control_file}")
+        if self._control_block:
+            print(f"启用控制块: {self._control_block.path}")
+    
+    def _apply_control(self, action):
+        """把控制指令同步到令牌上"""
+        if action == 'stop':
+            if not self.token.cancelled:
+                print(f"[{self._session_id}] 控制块：收到停止指令")
+                # 只设置停止标志，浏览器由监控线程在工作线程退出后或超时后关闭
+                self.token.cancel()
+        elif action == 'pause':
+            if not self.token.paused:
+                print(f"[{self._session_id}] 控制块：收到暂停指令")
+                self.token.pause()
+        elif action == 'resume' or action == 'run':
+            if self.token.paused:
+                print(f"[{self._session_id}] 控制块：收到继续指令")
+                self.token.resume()
     
-    def _check_file_control(self):
-        """检查文件控制指令"""
-        if not self._control_file or not os.path.exists(self._control_file):
+    def _check_control(self):
+        """读一次控制区"""
+        if not self._control_block:
             return
-        
         try:
-            with open(self._control_file, 'r', encoding='utf-8') as f:
-                control_state = json.load(f)
-                action = control_state.get('action', 'run')
-                
-                if action == 'stop':
-                    if not self._stopped.is_set():
-                        print(f"[{self._session_id}] 文件控制：收到停止指令")
-                        self.stop()
-                elif action == 'pause':
-                    if self._paused.is_set():  # 当前未暂停
-                        print(f"[{self._session_id}] 文件控制：收到暂停指令")
-                        self._paused.clear()
-                elif action == 'resume' or action == 'run':
-                    if not self._paused.is_set():  # 当前暂停中
-                        print(f"[{self._session_id}] 文件控制：收到继续指令")
-                        self._paused.set()
-                        
+            self._control_seq, action, _ = self._control_block.read_control()
+            self._apply_control(action)
         except Exception as e:
-            print(f"[{self._session_id}] 检查文件控制失败: {e}")
+            print(f"[{self._session_id}] 读取控制块失败: {e}")
+
+    def start_watcher(self):
+        """
+        启动控制指令监视线程：阻塞在控制块的门铃上，指令变化时立即同步到令牌，任务代码只看令牌
+        """
+        if not self._control_block or self._watcher is not None:
+            return
+        self._check_control()
+        self._watching.set()
+        
+        def watch():
+            seq = self._control_seq
+            while self._watching.is_set() and not self.token.cancelled:
+                try:
+                    new_seq, action = self._control_block.wait_control(seq, timeout=1.0)
+                except Exception as e:
+                    print(f"[{self._session_id}] 读取控制块失败: {e}")
+                    return
+                if new_seq != seq:
+                    seq = new_seq
+                    self._apply_control(action)
+        
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+    
+    def stop_watcher(self):
+        self._watching.clear()
+        self._watcher = None
 
     def pause(self):
         """暂停进程"""
-        if self._paused.is_set():
+        if not self.token.paused:
             print(f"[{self._session_id}] 暂停进程")
-            self._paused.clear()
+            self.token.pause()
         else:
             print(f"[{self._session_id}] 进程已处于暂停状态")
     
     def resume(self):
         """继续进程"""
-        if not self._paused.is_set():
+        if self.token.paused:
             print(f"[{self._session_id}] 继续进程")
-            self._paused.set()
+            self.token.resume()
         else:
             print(f"[{self._session_id}] 进程已处于运行状态")
     
     def stop(self):
         """停止进程"""
         print(f"[{self._session_id}] 停止进程")
-        self._stopped.set()
-        self.resume()  # 确保暂停的进程也能退出
+        self.token.cancel()  # 暂停中的等待者也会被唤醒并退出
         self.terminate_browser()
     
-    def is_paused(self):
-        """检查是否暂停"""
-        self._check_file_control()  # 每次检查时都读取文件状态
-        return not self._paused.is_set()
-    
     def is_stopped(self):
         """检查是否停止"""
-        self._check_file_control()  # 每次检查时都读取文件状态
-        return self._stopped.is_set()
+        if self._watcher is None:
+            self._check_control()
+        return self.token.cancelled
     
     def register_browser_pid(self, pid):
         """注册浏览器进程ID"""
@@ -89,9 +143,19 @@ class EnhancedProcessControl:
             self._browser_pids.append(pid)
             print(f"[{self._session_id}] 注册浏览器进程 PID: {pid}")
     
+    def find_task_browsers(self):
+        """本任务登记过且仍在运行的浏览器（启动时通过 register_task_browsers 登记），同一进程中其他任务的浏览器不在其中"""
+        self._browser_pids = [pid for pid in self._browser_pids if psutil.pid_exists(pid)]
+        return self._browser_pids
+    
+    def close(self):
+        """任务结束，不再接收浏览器登记"""
+        with _controls_lock:
+            _controls.pop(self.token, None)
+    
     def terminate_browser(self):
         """优雅地终止浏览器进程"""
-        if not self._browser_pids:
+        if not self.find_task_browsers():
             return
         
         print(f"[{self._session_id}] 开始优雅终止已注册的浏览器进程 {self._browser_pids}")
@@ -100,6 +164,8 @@ class EnhancedProcessControl:
             try:
                 if psutil.pid_exists(pid):
                     process = psutil.Process(pid)
+                    # 渲染等子进程在主进程退出后一并清理，避免遗留孤儿进程
+                    children = process.children(recursive=True)
                     
                     # 先尝试优雅关闭
                     print(f"[{self._session_id}] 尝试优雅关闭浏览器进程 {pid}")
@@ -114,6 +180,11 @@ class EnhancedProcessControl:
                         print(f"[{self._session_id}] 强制杀死浏览器进程 {pid}")
                         process.kill()
                         process.wait(timeout=2)
+                    for child in children:
+                        try:
+                            child.kill()
+                        except psutil.NoSuchProcess:
+                            pass
                     
             except psutil.NoSuchProcess:
                 print(f"[{self._session_id}] 进程 {pid} 已经不存在")
@@ -123,49 +194,17 @@ class EnhancedProcessControl:
         # 清空已终止的进程列表
         self._browser_pids = []
         print(f"[{self._session_id}] 浏览器进程终止完成")
-    
-    def sleep(self, seconds):
-        """可中断的睡眠，支持文件控制"""
-        print(f"[{self._session_id}] 开始sleep {seconds}秒")
-        end_time = time.time() + seconds
-        while time.time() < end_time:
-            # 检查文件控制状态
-            self._check_file_control()
-            
-            if self.is_stopped():
-                print(f"[{self._session_id}] 检测到停止信号，中断sleep")
-                return False
-                
-            if self.is_paused():
-                print(f"[{self._session_id}] 检测到暂停信号，暂停sleep计时")
-                pause_start = time.time()
-                
-                while self.is_paused() and not self.is_stopped():
-                    time.sleep(0.1)
-                
-                if not self.is_stopped():
-                    pause_duration = time.time() - pause_start
-                    end_time += pause_duration
-                    print(f"[{self._session_id}] 恢复执行，sleep时间延长了{pause_duration:.2f}秒")
-                
-            if self.is_stopped():
-                return False
-                
-            remaining = end_time - time.time()
-            if remaining > 0:
-                time.sleep(min(0.1, remaining))
-        
-        return True
 
 def with_enhanced_control(func):
     """增强版装饰器 - 异步版本"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # 创建控制实例
-        process_control = EnhancedProcessControl()
+        process_control = EnhancedProcessControl(parent_token=current_token())
         
         if process_control.is_stopped():
             print(f"进程控制已处于停止状态，无法执行任务")
+            process_control.close()
             return {'success': False, 'error': '任务控制器已停止'}
             
         session_id = getattr(process_control, '_session_id', 'unknown')
@@ -173,68 +212,15 @@ def with_enhanced_control(func):
         # 创建结果容器
         result_container = {'result': None, 'exception': None, 'completed': False}
         
-        # 保存原始的sleep函数
-        original_sleep = time.sleep
-        
-        # 定义新的sleep函数，在每次sleep时检查控制状态
-        def controlled_sleep(seconds):
-            # 将长时间的sleep拆分成短时间的sleep，以便更频繁地检查暂停/停止状态
-            end_time = time.time() + seconds
-            while time.time() < end_time:
-                # 检查文件控制状态
-                process_control._check_file_control()
-                
-                # 检查是否应该停止
-                if process_control.is_stopped():
-                    print(f"[{session_id}] 控制检查：检测到停止信号，中断sleep")
-                    raise InterruptedError("任务已被停止")
-                
-                # 检查是否应该暂停
-                if process_control.is_paused():
-                    print(f"[{session_id}] 控制检查：检测到暂停信号，暂停执行")
-                    pause_start = time.time()
-                    
-                    # 等待恢复或停止
-                    while process_control.is_paused() and not process_control.is_stopped():
-                        original_sleep(0.1)  # 这里使用original_sleep
-                    
-                    # 如果被停止，则终止
-                    if process_control.is_stopped():
-                        print(f"[{session_id}] 控制检查：在暂停状态下收到停止信号")
-                        raise InterruptedError("任务已被停止")
-                    
-                    # 只有当实际上恢复了才计算暂停时间
-                    if not process_control.is_paused():
-                        # 计算暂停持续时间，并相应延长结束时间
-                        pause_duration = time.time() - pause_start
-                        end_time += pause_duration
-                        print(f"[{session_id}] 控制检查：恢复执行，延长了{pause_duration:.2f}秒")
-                
-                # 短暂sleep
-                remaining = min(0.2, end_time - time.time())  # 最多sleep 0.2秒
-                if remaining > 0:
-                    original_sleep(remaining)  # 这里使用original_sleep
-        
-        # 记录Chrome进程
-        chrome_before = set()
-        try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if 'chrome' in proc.info['name'].lower():
-                        chrome_before.add(proc.info['pid'])
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-        except Exception as e:
-            print(f"[{session_id}] 获取现有Chrome进程失败: {str(e)}")
+        # 控制指令由监视线程统一接收，任务代码通过绑定到工作线程的令牌响应暂停/停止
+        process_control.start_watcher()
         
         # 定义工作线程函数
         def worker():
             try:
-                # 替换time.sleep函数
-                time.sleep = controlled_sleep
-                
-                # 执行原始函数
-                result_container['result'] = func(*args, **kwargs)
+                # 执行原始函数，任务代码用 utils.cancellation 的 sleep()/check() 响应控制
+                with bind_token(process_control.token):
+                    result_container['result'] = func(*args, **kwargs)
                 result_container['completed'] = True
             except InterruptedError as e:
                 # 捕获中断异常
@@ -255,37 +241,19 @@ def with_enhanced_control(func):
                     print(f"[{session_id}] 函数执行出错: {str(e)}")
                     traceback.print_exc()
             finally:
-                # 恢复原始sleep函数
-                time.sleep = original_sleep
                 # 确保设置完成标志
                 result_container['completed'] = True
         
         # 🚀 改动开始：后台监控线程
         def background_monitor():
-            # 等待1秒，让Playwright有时间启动浏览器
-            original_sleep(1)
-            
-            # 检测新的Chrome进程
-            try:
-                for proc in psutil.process_iter(['pid', 'name']):
-                    try:
-                        if 'chrome' in proc.info['name'].lower() and proc.info['pid'] not in chrome_before:
-                            # 注册新的浏览器进程
-                            process_control.register_browser_pid(proc.info['pid'])
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-            except Exception as e:
-                print(f"[{session_id}] 注册Chrome进程失败: {str(e)}")
-            
+            # 只关闭任务启动时登记的浏览器，浏览器池的常驻浏览器和同一进程中其他任务的浏览器不会被关闭
             # 主线程循环，监控工作线程状态
             while work_thread.is_alive():
                 # 检查是否应该停止
                 if process_control.is_stopped():
                     print(f"[{session_id}] 收到停止信号，开始优雅终止...")
                     
-                    # 先设置停止标志，让工作线程自然结束
-                    process_control._stopped.set()
-                    
+                    # 令牌已取消，工作线程中的 sleep()/check() 会立即抛出 InterruptedError
                     # 等待工作线程自然结束
                     print(f"[{session_id}] 等待工作线程自然结束...")
                     work_thread.join(timeout=5)  # 等待5秒
@@ -308,16 +276,19 @@ def with_enhanced_control(func):
                 if result_container['completed']:
                     break
                     
-                # 简短休眠以减少循环频率
-                original_sleep(0.1)
+                # 等待工作线程结束或下一次检查
+                work_thread.join(timeout=0.1)
             
+            process_control.stop_watcher()
+
             # 线程已结束，清理资源
             try:
-                if process_control._browser_pids:
+                if process_control.find_task_browsers():
                     print(f"[{session_id}] 任务完成，清理剩余浏览器进程...")
                     process_control.terminate_browser()
             except Exception as e:
                 print(f"[{session_id}] 清理浏览器进程时出错: {e}")
+            process_control.close()
                 
             print(f"[{session_id}] 后台监控结束")
         
@@ -339,125 +310,3 @@ def with_enhanced_control(func):
         }
     
     return wrapper
-
-def with_enhanced_control_async(func):
-    """异步版本的增强控制装饰器，立即返回，后台执行"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        print(f"启动异步任务: {func.__name__}")
-        
-        # 创建控制实例
-        process_control = EnhancedProcessControl()
-        
-        if process_control.is_stopped():
-            print(f"进程控制已处于停止状态，无法执行任务")
-            return {'success': False, 'error': '任务控制器已停止'}
-            
-        session_id = getattr(process_control, '_session_id', 'unknown')
-        
-        # 保存原始的sleep函数
-        original_sleep = time.sleep
-        
-        # 定义新的sleep函数
-        def controlled_sleep(seconds):
-            end_time = time.time() + seconds
-            while time.time() < end_time:
-                process_control._check_file_control()
-                
-                if process_control.is_stopped():
-                    print(f"[{session_id}] 控制检查：检测到停止信号，中断sleep")
-                    raise InterruptedError("任务已被停止")
-                
-                if process_control.is_paused():
-                    print(f"[{session_id}] 控制检查：检测到暂停信号，暂停执行")
-                    pause_start = time.time()
-                    
-                    while process_control.is_paused() and not process_control.is_stopped():
-                        original_sleep(0.1)
-                    
-                    if process_control.is_stopped():
-                        print(f"[{session_id}] 控制检查：在暂停状态下收到停止信号")
-                        raise InterruptedError("任务已被停止")
-                    
-                    if not process_control.is_paused():
-                        pause_duration = time.time() - pause_start
-                        end_time += pause_duration
-                        print(f"[{session_id}] 控制检查：恢复执行，延长了{pause_duration:.2f}秒")
-                
-                remaining = min(0.2, end_time - time.time())
-                if remaining > 0:
-                    original_sleep(remaining)
-        
-        # 记录Chrome进程
-        chrome_before = set()
-        try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if 'chrome' in proc.info['name'].lower():
-                        chrome_before.add(proc.info['pid'])
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-        except Exception as e:
-            print(f"[{session_id}] 获取现有Chrome进程失败: {str(e)}")
-        
-        # 后台工作函数
-        def background_worker():
-            try:
-                print(f"[{session_id}] 后台任务开始执行")
-                
-                # 替换time.sleep函数
-                time.sleep = controlled_sleep
-                
-                # 等待1秒，让Playwright有时间启动浏览器
-                original_sleep(1)
-                
-                # 检测新的Chrome进程
-                try:
-                    for proc in psutil.process_iter(['pid', 'name']):
-                        try:
-                            if 'chrome' in proc.info['name'].lower() and proc.info['pid'] not in chrome_before:
-                                process_control.register_browser_pid(proc.info['pid'])
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                            pass
-                except Exception as e:
-                    print(f"[{session_id}] 注册Chrome进程失败: {str(e)}")
-                
-                # 执行原始函数
-                result = func(*args, **kwargs)
-                print(f"[{session_id}] 后台任务执行完成")
-                
-            except InterruptedError as e:
-                print(f"[{session_id}] 后台任务被中断: {str(e)}")
-            except Exception as e:
-                if "Target page, context or browser has been closed" in str(e) or "TargetClosedError" in str(e):
-                    print(f"[{session_id}] 浏览器已关闭，任务已终止")
-                else:
-                    print(f"[{session_id}] 后台任务执行出错: {str(e)}")
-                    traceback.print_exc()
-            finally:
-                # 恢复原始sleep函数
-                time.sleep = original_sleep
-                
-                # 清理浏览器进程
-                try:
-                    if process_control._browser_pids:
-                        print(f"[{session_id}] 清理浏览器进程...")
-                        process_control.terminate_browser()
-                except Exception as e:
-                    print(f"[{session_id}] 清理浏览器进程时出错: {e}")
-                
-                print(f"[{session_id}] 后台任务完全结束")
-        
-        # 启动后台线程
-        bg_thread = threading.Thread(target=background_worker, daemon=False)
-        bg_thread.start()
-        
-        # 立即返回任务状态
-        return {
-            'success': True,
-            'message': f'任务已启动 (Session: {session_id})',
-            'task_status': 'started',
-            'session_id': session_id
-        }
-    
-    return wrapper
\ No newline at end of file
@@ -9,23 +9,131 @@ import numpy as np
 from PIL import Image
 
 import os
+import psutil
+from contextlib import contextmanager, ExitStack
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
 
 try:
     from utils.playwright_util import PlaywrightUtil
+    from utils.seen_ids import create_seen_ids
+    from utils.search_extract import extract_videos
+    from utils.browser_pool import BrowserPool, find_chrome_executable
+    from utils.cancellation import current_token
+    from utils.process_group import track_browser_launch
+    from utils.enhanced_control import register_task_browsers
+    from utils.http_collector import (HttpSearchCollector, SessionRejected, DEFAULT_SESSION_TTL,
+                                      get_session_path, load_session, save_session)
 except ImportError:
     from playwright_util import PlaywrightUtil
+    from seen_ids import create_seen_ids
+    from search_extract import extract_videos
+    from browser_pool import BrowserPool, find_chrome_executable
+    from cancellation import current_token
+    from process_group import track_browser_launch
+    from enhanced_control import register_task_browsers
+    from http_collector import (HttpSearchCollector, SessionRejected, DEFAULT_SESSION_TTL,
+                                get_session_path, load_session, save_session)
+
+
+# 站点地址，回放基准测试时指向本地替身服务
+DEFAULT_BASE_URL = "https://www.douyin.com"
+# 搜索接口，精简模式下也必须放行
+SEARCH_API = "aweme/v1/web/search/item"
+# 精简模式下拦截的资源类型（图片、视频预览、字体）
+BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font'}
+# 精简模式下拦截的统计/埋点请求
+BLOCKED_URL_KEYWORDS = (
+    'mcs.zijieapi.com',
+    'mon.zijieapi.com',
+    'google-analytics.com',
+    'googletagmanager.com'
+)
+# 长时间滚动时的页面维护阈值
+DEFAULT_MAX_DOM_NODES = 20000
+DEFAULT_MAX_HEAP_MB = 400
+DEFAULT_TRIM_KEEP = 50
+DEFAULT_PAGE_CHECK_INTERVAL = 15
+# 裁剪视口上方的搜索结果卡片：子元素最多的容器视为卡片列表，只删完全在视口上方的卡片
+TRIM_CARDS_SCRIPT = """(keep) => {
+    let list = null, max = 0;
+    for (const el of document.querySelectorAll('ul, ol, div')) {
+        if (el.childElementCount > max) {
+            max = el.childElementCount;
+            list = el;
+        }
+    }
+    if (!list || max <= keep) return 0;
+    const cards = Array.from(list.children).slice(0, max - keep);
+    let removed = 0;
+    for (const card of cards) {
+        if (card.getBoundingClientRect().bottom >= 0) break;
+        card.remove();
+        removed++;
+    }
+    return removed;
+}"""
 
 
 class ExampleUtil:
-    def __init__(self,data_directory:str):
+    def __init__(self,data_directory:str, lean_mode=False, min_scroll_interval=0.8, response_timeout=5, max_response_timeout=20, max_empty_rounds=3,
+                 streaming=False, seen_filter='set', base_url=DEFAULT_BASE_URL, channel="chrome",
+                 max_dom_nodes=DEFAULT_MAX_DOM_NODES, max_heap_mb=DEFAULT_MAX_HEAP_MB, trim_keep=DEFAULT_TRIM_KEEP,
+                 page_check_interval=DEFAULT_PAGE_CHECK_INTERVAL):
+        """
+        :param lean_mode: 精简采集模式，无头运行并拦截图片/视频/字体/埋点，只保留搜索接口
+        :param min_scroll_interval: 两次滚动之间的最小间隔（秒），控制请求节奏
+        :param response_timeout: 滚动后等待下一批搜索结果的初始超时（秒）
+        :param max_response_timeout: 连续等不到数据时超时逐次翻倍的上限（秒）
+        :param max_empty_rounds: 连续多少次等不到新数据后结束采集
+        :param streaming: 流式模式，视频只通过回调交出，不在 self.videos 中保留，内存只占已见ID
+        :param seen_filter: 已见ID的去重方式，set 精确去重，bloom 布隆过滤器（超长采集内存固定）
+        :param base_url: 搜索页所在站点，离线基准测试时为本地回放服务地址
+        :param channel: 浏览器渠道，chrome 为本机 Chrome，None 为 Playwright 自带的 Chromium
+        :param max_dom_nodes: 页面 DOM 节点数上限，超过后裁剪视口上方的卡片，0 为不检查
+        :param max_heap_mb: 页面 JS 堆上限（MB），裁剪后仍超过上限（或节点数仍超限）时换新页面从当前游标继续
+        :param trim_keep: 裁剪时列表中至少保留的卡片数
+        :param page_check_interval: 每滚动多少次检查一次页面内存
+        """
         #self.user_data_dir = os.path.join(os.getenv('LOCALAPPDATA'), 'Google', 'Chromes', 'User Data')
         self.data_directory=data_directory
         #self.user_data_dir ="D:\\Data\\MyAgent\\Chrome\\18925203701"
+        self.lean_mode = lean_mode
+        self.base_url = base_url.rstrip('/')
+        self.channel = channel
+        self.response_sinks = []    # 原始搜索响应的旁路输出（录制、归档）
         self.videos = []
         self.callback = None
         self.total_videos = 0  # 添加总视频计数
+        self.stats = {}
+        self.min_scroll_interval = min_scroll_interval
+        self.response_timeout = response_timeout
+        self.max_response_timeout = max_response_timeout
+        self.max_empty_rounds = max_empty_rounds
+        self.response_count = 0  # 已收到的搜索接口响应数
+        self.has_more = True     # 最近一次搜索响应的 has_more
+        self.keyword_counts = {}  # 批量采集时每个关键词采到的视频数
+        self.streaming = streaming
+        self.seen_ids = create_seen_ids(seen_filter)
+        self.counters = {'received': 0, 'unique': 0, 'duplicates': 0, 'known': 0}
+        self.cursor = 0            # 搜索接口返回的最新游标
+        self.resume_cursor = None  # 断点续采的游标，设置后新页面的搜索请求都改写为从当前游标翻页
+        self.finished = False      # 是否正常采完（has_more=0、没有更多了、连续已知视频），被停止、出错或连续等不到数据时为 False
+        self.checkpoint_callback = None
+        self.checkpoint_interval = 30
+        self.last_checkpoint = 0
+        self.known_ids = None       # 增量模式：该关键词以前已入库的视频ID
+        self.known_stop_after = 0   # 连续多少批全是已知视频就结束
+        self.known_streak = 0
+        self.rate_limiter = None    # 跨进程的账号限流器，每次滚动前取令牌
+        self.browser_pool = None    # 浏览器常驻池，设置后借用账号的常驻浏览器而不是每次启动
+        self.browser_pid = None     # 借用的常驻浏览器进程ID，用于统计CPU
+        self.max_dom_nodes = max_dom_nodes
+        self.max_heap_mb = max_heap_mb
+        self.trim_keep = trim_keep
+        self.page_check_interval = page_check_interval
+        self.page_sessions = {}     # 页面对应的 CDP 会话，用于读取内存指标
 
 
     def set_callback(self, callback):
@@ -34,137 +142,616 @@ class ExampleUtil:
         print("回调函数已设置")
 
 
+    def set_checkpoint_callback(self, callback, interval=30):
+        """
+        设置断点回调，采集过程中每 interval 秒及结束时调用 callback(state)
+        state 见 get_checkpoint_state，结束时那一次 state['final'] 为 True
+        """
+        self.checkpoint_callback = callback
+        self.checkpoint_interval = interval
+
+
+    def add_response_sink(self, sink):
+        """
+        添加原始响应旁路输出，每个搜索响应解析前调用 sink(keyword, data, url)
+        出错只打印，不影响采集
+        """
+        self.response_sinks.append(sink)
+
+
+    def _feed_sinks(self, url, data):
+        if not self.response_sinks:
+            return
+        keyword = parse_qs(urlparse(url).query).get('keyword', [None])[0]
+        for sink in self.response_sinks:
+            try:
+                sink(keyword, data, url)
+            except Exception as e:
+                print(f"响应旁路输出出错: {str(e)}")
+
+
+    def set_rate_limiter(self, rate_limiter):
+        """设置限流器，同一账号在所有进程中的滚动速率不超过限流器配置"""
+        self.rate_limiter = rate_limiter
+
+
+    def set_browser_pool(self, browser_pool):
+        """使用浏览器常驻池，采集时连接账号的常驻浏览器并新开标签页，结束只关闭标签页"""
+        self.browser_pool = browser_pool
+
+
+    def set_known_ids(self, known_ids, stop_after=3):
+        """
+        开启增量模式
+        :param known_ids: 以前已入库的视频ID（整数）集合，这些视频不再回调
+        :param stop_after: 连续 stop_after 批全是已知视频时停止滚动
+        """
+        self.known_ids = set(known_ids)
+        self.known_stop_after = stop_after
+        self.known_streak = 0
+        print(f"增量采集: 已知视频 {len(self.known_ids)} 个，连续 {stop_after} 批无新视频即停止")
+
+
+    def _filter_known(self, batch_videos):
+        """增量模式下去掉已知视频，并记录连续全是已知视频的批数"""
+        if self.known_ids is None or not batch_videos:
+            return batch_videos
+        new_videos = []
+        for video in batch_videos:
+            try:
+                known = int(video.get('aweme_id')) in self.known_ids
+            except (TypeError, ValueError):
+                known = False
+            if not known:
+                new_videos.append(video)
+        self.counters['known'] += len(batch_videos) - len(new_videos)
+        self.known_streak = 0 if new_videos else self.known_streak + 1
+        return new_videos
+
+
+    def resume_from(self, checkpoint):
+        """从断点恢复：已见ID（或布隆过滤器位数组）、计数和游标"""
+        for video_id in checkpoint.get('seen_ids') or []:
+            self.seen_ids.add(video_id)
+        if checkpoint.get('seen_filter'):
+            if hasattr(self.seen_ids, 'load_bytes'):
+                try:
+                    self.seen_ids.load_bytes(checkpoint['seen_filter'], checkpoint.get('seen_count') or 0)
+                except ValueError as e:
+                    print(f"恢复已见ID失败: {str(e)}")
+            else:
+                print("断点由布隆过滤器模式保存，精确去重模式下无法恢复已见ID，之前采过的视频可能重复回调")
+        self.counters.update(checkpoint.get('counters') or {})
+        self.cursor = int(checkpoint.get('cursor') or 0)
+        self.resume_cursor = self.cursor or None
+        print(f"从断点继续: 游标 {self.cursor}，已见 {len(self.seen_ids)} 个视频")
+
+
+    def get_checkpoint_state(self):
+        """当前断点数据，布隆过滤器无法列出ID，保存 seen_filter 位数组代替 seen_ids"""
+        state = {
+            'cursor': self.cursor,
+            'seen_count': len(self.seen_ids),
+            'counters': dict(self.counters),
+            'completed': self.finished
+        }
+        if hasattr(self.seen_ids, 'to_list'):
+            state['seen_ids'] = self.seen_ids.to_list()
+        else:
+            state['seen_filter'] = self.seen_ids.to_bytes()
+        return state
+
+
+    def _save_checkpoint(self, force=False):
+        """到了保存间隔（或 force）时调用断点回调"""
+        if not self.checkpoint_callback:
+            return
+        if not force and time.time() - self.last_checkpoint < self.checkpoint_interval:
+            return
+        self.last_checkpoint = time.time()
+        state = self.get_checkpoint_state()
+        state['final'] = force
+        try:
+            self.checkpoint_callback(state)
+        except Exception as e:
+            print(f"保存断点出错: {str(e)}")
+
+
+    def _route_resume(self, route):
+        """
+        断点续采：新页面自己从 offset=0 开始按页累加，每个搜索请求都改写为不小于当前游标
+        当前游标起初是断点游标，之后随搜索响应的 cursor 前进
+        """
+        url = urlparse(route.request.url)
+        query = parse_qs(url.query)
+        try:
+            page_offset = int(query.get('offset', ['0'])[0])
+        except ValueError:
+            page_offset = 0
+        offset = max(page_offset, int(self.cursor or 0))
+        if offset == page_offset:
+            route.fallback()
+            return
+        query['offset'] = [str(offset)]
+        print(f"断点续采: 搜索请求 offset={page_offset} 改为 {offset}")
+        route.continue_(url=urlunparse(url._replace(query=urlencode(query, doseq=True))))
+
+
+
+    def _route_request(self, route):
+        """精简模式的请求拦截：放行搜索接口，拦截媒体资源和埋点"""
+        request = route.request
+        try:
+            if SEARCH_API not in request.url and (
+                request.resource_type in BLOCKED_RESOURCE_TYPES
+                or any(keyword in request.url for keyword in BLOCKED_URL_KEYWORDS)
+            ):
+                self.stats['blocked_requests'] += 1
+                route.abort()
+                return
+            route.continue_()
+        except Exception as e:
+            print(f"请求拦截出错: {str(e)}")
+
+
+    def _start_stats(self, context, page):
+        """开始统计带宽、请求数、浏览器CPU和耗时，两种模式都统计以便对比"""
+        self._init_stats('lean' if self.lean_mode else 'normal')
+        self._watch_page(context, page)
+
+
+    def _init_stats(self, mode):
+        self.stats = {
+            'mode': mode,
+            'start_time': time.time(),
+            'elapsed': 0,
+            'videos': 0,
+            'requests': 0,
+            'blocked_requests': 0,
+            'bytes_received': 0,
+            'browser_cpu_seconds': 0,
+            'dom_nodes_peak': 0,
+            'heap_mb_peak': 0,
+            'trimmed_cards': 0,
+            'page_recycles': 0,
+            'cpu_start': self._browser_cpu_time()
+        }
+
+
+    def _watch_page(self, context, page):
+        """给页面挂上请求数和带宽统计，批量采集时每个标签页都要调用"""
+        def on_request(request):
+            self.stats['requests'] += 1
+        page.on("request", on_request)
+
+        # 通过 CDP 统计实际网络传输字节数（含压缩后的响应体和响应头）
+        try:
+            cdp = context.new_cdp_session(page)
+            cdp.send("Network.enable")
+            cdp.send("Performance.enable")
+            self.page_sessions[page] = cdp
+            def on_loading_finished(event):
+                self.stats['bytes_received'] += event.get('encodedDataLength', 0)
+            cdp.on("Network.loadingFinished", on_loading_finished)
+        except Exception as e:
+            print(f"开启带宽统计失败: {str(e)}")
+
+
+    def _browser_cpu_time(self):
+        """
+        当前进程所有子进程（Playwright 驱动与浏览器）累计 CPU 秒数
+        使用常驻浏览器时统计该浏览器的所有进程，同时借用它的其他采集也会计入
+        """
+        total = 0
+        try:
+            if self.browser_pid:
+                root = psutil.Process(self.browser_pid)
+                processes = [root] + root.children(recursive=True)
+            else:
+                processes = psutil.Process(os.getpid()).children(recursive=True)
+            for child in processes:
+                try:
+                    cpu = child.cpu_times()
+                    total += cpu.user + cpu.system
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+        except Exception as e:
+            print(f"获取浏览器CPU时间失败: {str(e)}")
+        return total
+
+
+    def _finish_stats(self):
+        """结束统计，换算成每100个视频的消耗"""
+        if not self.stats:
+            return self.stats
+        self.stats['elapsed'] = round(time.time() - self.stats['start_time'], 2)
+        self.stats['videos'] = self.counters['unique']
+        self.stats['received_videos'] = self.counters['received']
+        self.stats['duplicates'] = self.counters['duplicates']
+        self.stats['known'] = self.counters['known']
+        if self.rate_limiter:
+            self.stats['rate_limiter'] = self.rate_limiter.get_stats()
+        self.stats['browser_cpu_seconds'] = round(self._browser_cpu_time() - self.stats.pop('cpu_start', 0), 2)
+        per_100 = 100 / self.stats['videos'] if self.stats['videos'] else 0
+        self.stats['per_100_videos'] = {
+            'seconds': round(self.stats['elapsed'] * per_100, 2),
+            'bytes': int(self.stats['bytes_received'] * per_100),
+            'cpu_seconds': round(self.stats['browser_cpu_seconds'] * per_100, 2)
+        }
+        print(f"采集统计: {self.stats}")
+        return self.stats
+
+
+    def get_stats(self):
+        """获取最近一次采集的统计数据"""
+        return self.stats
+
+
+    def get_counters(self):
+        """本次采集的视频计数：收到、去重后、重复"""
+        return dict(self.counters)
+
+
+    def _parse_videos(self, data):
+        """从搜索接口响应中解析视频列表"""
+        return extract_videos(data)
+
+
+    def _dedupe(self, batch_videos):
+        """按 aweme_id 去掉本次采集已经见过的视频"""
+        unique = []
+        for video in batch_videos:
+            if video.get('aweme_id') and not self.seen_ids.add(video['aweme_id']):
+                continue
+            unique.append(video)
+        self.counters['received'] += len(batch_videos)
+        self.counters['unique'] += len(unique)
+        self.counters['duplicates'] += len(batch_videos) - len(unique)
+        return unique
+
+
+    def _emit_batch(self, batch_videos, keyword=None):
+        """
+        新的一批视频去重后触发回调，返回去重后的视频
+        流式模式下不保留视频列表，总数以 counters 为准
+        """
+        batch_videos = self._dedupe(batch_videos)
+        if not self.streaming:
+            self.videos.extend(batch_videos)
+        self.total_videos = self.counters['unique']
+        if self.callback and batch_videos:
+            self.callback({
+                'videos': batch_videos,  # 只传递这一批新的视频
+                'keyword': keyword,
+                'current': self.total_videos,
+                'total': max(self.total_videos, 100),  # 设置一个最小目标
+                'need_save': True  # 添加标记，表示需要保存到数据库
+            })
+            print(f"回调触发: 当前批次 {len(batch_videos)} 个视频，总计 {self.total_videos} 个视频")
+        return batch_videos
+
 
     def handle_response(self, response):
             """处理接口响应"""
-            if "aweme/v1/web/search/item" in response.url:
+            if SEARCH_API in response.url:
                 try:
                     data = response.json()
-                    if data.get('data'):
-                        batch_videos = []
-                        for item in data['data']:
-                            # print("item=============",item)
-                            if item.get('type') == 1:  # 视频类型
-                                video_info = {
-                                    'title': item.get('aweme_info', {}).get('desc', ''),
-                                    'link': f"https://www.douyin.com/video/{item.get('aweme_info', {}).get('aweme_id', '')}",
-                                    'author': item.get('aweme_info', {}).get('author', {}).get('nickname', '')  # 添加作者昵称
-                                }
-                                self.videos.append(video_info)
-                                batch_videos.append(video_info)
-                        
-                        # 如果有新的视频数据，触发回调
-                        if self.callback and batch_videos:
-                            self.total_videos = len(self.videos)
-                            self.callback({
-                                'videos': batch_videos,  # 只传递这一批新的视频
-                                'current': self.total_videos,
-                                'total': max(self.total_videos, 100),  # 设置一个最小目标
-                                'need_save': True  # 添加标记，表示需要保存到数据库
-                            })
-                            print(f"回调触发: 当前批次 {len(batch_videos)} 个视频，总计 {self.total_videos} 个视频")
+                    self._feed_sinks(response.url, data)
+                    self.response_count += 1
+                    if 'has_more' in data:
+                        self.has_more = bool(data.get('has_more'))
+                    if data.get('cursor') is not None:
+                        self.cursor = data.get('cursor')
+                    # 如果有新的视频数据，触发回调
+                    self._emit_batch(self._filter_known(self._parse_videos(data)))
                             
                 except Exception as e:
                     print(f"解析响应数据出错: {str(e)}")
+
+
+    def _handle_tab_response(self, tab, response):
+        """批量采集时单个标签页的接口响应处理，视频按关键词打标"""
+        if SEARCH_API not in response.url:
+            return
+        try:
+            data = response.json()
+            self._feed_sinks(response.url, data)
+            # 标签页切换关键词后可能还会收到上一个关键词的响应，以请求参数里的关键词为准
+            keyword = parse_qs(urlparse(response.url).query).get('keyword', [tab['keyword']])[0]
+            batch_videos = self._parse_videos(data)
+            for video in batch_videos:
+                video['keyword'] = keyword
+            if keyword == tab['keyword']:
+                tab['response_count'] += 1
+                if 'has_more' in data:
+                    tab['has_more'] = bool(data.get('has_more'))
+            batch_videos = self._emit_batch(batch_videos, keyword)
+            self.keyword_counts[keyword] = self.keyword_counts.get(keyword, 0) + len(batch_videos)
+        except Exception as e:
+            print(f"[{tab['keyword']}] 解析响应数据出错: {str(e)}")
     
     
+    def _scroll_to_bottom(self, page):
+        """滚动到页面底部"""
+        page.evaluate("""() => {
+            window.scrollTo({
+                top: document.documentElement.scrollHeight,
+                behavior: 'smooth'
+            });
+        }""")
+
+
+    def _wait_for_batch(self, page, responses_before, timeout):
+        """
+        等待新的搜索接口响应
+        用 page.wait_for_timeout 小步等待，期间事件照常分发；收到响应立即返回 True
+        每一步检查取消令牌，停止/暂停不必等到本批超时
+        """
+        token = current_token()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.response_count > responses_before:
+                return True
+            token.check()
+            page.wait_for_timeout(100)
+        return self.response_count > responses_before
+
+
+    def _is_no_more(self, page):
+        """页面是否显示“暂时没有更多了”"""
+        no_more = page.query_selector("div.ECAcoo0p div.shrAJJLa")
+        if no_more:
+            no_more_text = page.evaluate("el => el.textContent", no_more)
+            return "暂时没有更多了" in no_more_text
+        return False
+
+
+    def _open_search_page(self, context, keyword, start_stats=False):
+        """新建页面并打开关键词搜索页，断点游标不为空时首个搜索请求从该游标开始"""
+        page = context.new_page()
+        
+        if start_stats:
+            self._start_stats(context, page)
+        else:
+            self._watch_page(context, page)
+        
+        # 精简模式：拦截图片、视频、字体和埋点请求
+        if self.lean_mode:
+            page.route("**/*", self._route_request)
+        
+        # 断点续采：后注册的路由先执行，改写每个搜索请求的游标
+        if self.resume_cursor is not None:
+            page.route(f"**/{SEARCH_API}*", self._route_resume)
+        
+        # 监听网络请求
+        page.on("response", self.handle_response)
+        
+        # 访问搜索页面
+        search_url = f"{self.base_url}/discover/search/{keyword}?type=video"
+        print(f"正在访问: {search_url}")
+        page.goto(search_url, wait_until="domcontentloaded")  # 改为只等待DOM加载完成
+        return page
+
+
+    def _page_metrics(self, page, collect_garbage=False):
+        """通过 CDP 读取页面的 DOM 节点数和 JS 堆大小，并记录峰值"""
+        cdp = self.page_sessions.get(page)
+        if cdp is None:
+            return None
+        try:
+            if collect_garbage:
+                cdp.send("HeapProfiler.collectGarbage")
+            values = {item['name']: item['value'] for item in cdp.send("Performance.getMetrics")['metrics']}
+        except Exception as e:
+            print(f"读取页面内存指标失败: {str(e)}")
+            return None
+        metrics = {
+            'nodes': int(values.get('Nodes', 0)),
+            'heap_mb': round(values.get('JSHeapUsedSize', 0) / 1024 / 1024, 1)
+        }
+        if self.stats:
+            self.stats['dom_nodes_peak'] = max(self.stats.get('dom_nodes_peak', 0), metrics['nodes'])
+            self.stats['heap_mb_peak'] = max(self.stats.get('heap_mb_peak', 0), metrics['heap_mb'])
+        return metrics
+
+
+    def _over_limit(self, metrics):
+        return metrics['nodes'] > self.max_dom_nodes or metrics['heap_mb'] > self.max_heap_mb
+
+
+    def _trim_if_needed(self, page):
+        """
+        DOM 节点数或 JS 堆超过阈值时裁剪视口上方的卡片
+        :return: 裁剪后的指标，未超阈值时返回 None
+        """
+        metrics = self._page_metrics(page)
+        if not metrics or not self._over_limit(metrics):
+            return None
+        try:
+            removed = page.evaluate(TRIM_CARDS_SCRIPT, self.trim_keep)
+        except Exception as e:
+            print(f"裁剪页面卡片失败: {str(e)}")
+            removed = 0
+        if self.stats:
+            self.stats['trimmed_cards'] += removed
+        after = self._page_metrics(page, collect_garbage=True) or metrics
+        print(f"页面 DOM 节点 {metrics['nodes']}、JS 堆 {metrics['heap_mb']}MB 超过阈值，裁剪 {removed} 个卡片后: {after}")
+        return after
+
+
+    def _maintain_page(self, context, page, keyword):
+        """
+        长时间滚动的页面维护：先裁剪卡片，仍超过阈值时换新页面，从当前游标继续滚动
+        已采到的视频靠已见ID去重，新页面重复返回的视频不会重复回调
+        :return: 之后使用的页面
+        """
+        metrics = self._trim_if_needed(page)
+        if not metrics or not self._over_limit(metrics):
+            return page
+        print(f"裁剪后仍超过阈值，换新页面从游标 {self.cursor} 继续")
+        self.resume_cursor = self.cursor or None
+        new_page = self._open_search_page(context, keyword)
+        self.page_sessions.pop(page, None)
+        try:
+            page.close()
+        except Exception as e:
+            print(f"关闭旧页面失败: {str(e)}")
+        if self.stats:
+            self.stats['page_recycles'] += 1
+        return new_page
+
+
+    def _launch_context(self, p, extra_args=None):
+        """启动账号的持久化浏览器上下文，精简模式无头运行"""
+        return p.chromium.launch_persistent_context(
+            user_data_dir=self.user_data_dir,
+            channel=self.channel,
+            headless=self.lean_mode,
+            no_viewport=True,  # 禁用视窗大小限制
+            args=[
+                '--disable-blink-features=AutomationControlled',
+                '--disable-infobars',
+                '--no-default-browser-check',
+                '--no-first-run'
+            ] + (extra_args or [])
+        )
+
+
+    @contextmanager
+    def _open_context(self, p, extra_args=None):
+        """
+        打开账号的浏览器上下文
+        使用浏览器池时连接常驻浏览器，退出时只关闭本次打开的标签页；否则启动新的持久化上下文，退出时关闭
+        """
+        if not self.browser_pool:
+            # 之前借用过浏览器池时，该账号的常驻浏览器还占用着用户目录，先关闭
+            BrowserPool(self.data_directory).evict(self.user_data_dir)
+            # 登记这次启动的浏览器，停止任务时只关闭它，不影响同一进程中其他任务的浏览器
+            with track_browser_launch() as launched:
+                context = self._launch_context(p, extra_args)
+            register_task_browsers(launched)
+            try:
+                yield context
+            finally:
+                context.close()
+            return
+
+        executable_path = find_chrome_executable() if self.channel else p.chromium.executable_path
+        endpoint, self.browser_pid = self.browser_pool.acquire(self.user_data_dir, executable_path, headless=self.lean_mode)
+        browser = None
+        opened = 0
+        try:
+            browser = p.chromium.connect_over_cdp(endpoint)
+            context = browser.contexts[0] if browser.contexts else browser.new_context()
+            existing = list(context.pages)
+            try:
+                yield context
+            finally:
+                for page in context.pages:
+                    if page not in existing:
+                        opened += 1
+                        try:
+                            page.close()
+                        except Exception as e:
+                            print(f"关闭标签页失败: {str(e)}")
+        finally:
+            # 中途换掉的页面也计入服务页数
+            opened += self.stats.get('page_recycles', 0) if self.stats else 0
+            self.browser_pool.release(self.user_data_dir, opened, browser)
+            self.browser_pid = None
+
+
     def get_douyinlink_list(self, keyword=None,platform_name=None,username=None):
         """获取抖音链接列表"""
         self.user_data_dir=os.path.join(self.data_directory,'Chromes',platform_name,username)
         print("采集的时候用的用户目录，self.user_data_dir",self.user_data_dir)
+        self.response_count = 0
+        self.has_more = True
+        self.finished = False
+        self.known_streak = 0
+        self.last_checkpoint = time.time()
+        self.page_sessions = {}
             
-        with sync_playwright() as p:
+        with sync_playwright() as p, ExitStack() as stack:
             print("开始获取抖音链接列表",self.user_data_dir)
             
            
             
-            # 配置浏览器启动参数
-            browser = p.chromium.launch_persistent_context(
-                user_data_dir=self.user_data_dir,
-                channel="chrome",
-                headless=False,
-                no_viewport=True,  # 禁用视窗大小限制
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-infobars',
-                    '--no-default-browser-check',
-                    '--no-first-run'
-                ]
-            )
+            browser = stack.enter_context(self._open_context(p))
 
             try:
-                # 创建新页面
-                page = browser.new_page()
-                
-                
-                # 监听网络请求
-                page.on("response", self.handle_response)
-
-               
-                # 访问搜索页面
-                search_url = f"https://www.douyin.com/discover/search/{keyword}?type=video"
-                print(f"正在访问: {search_url}")
-                page.goto(search_url, wait_until="domcontentloaded")  # 改为只等待DOM加载完成
+                # 创建搜索页面，同时开始统计带宽/CPU/耗时
+                page = self._open_search_page(browser, keyword, start_stats=True)
           
           
-                # 使用工具类最大化窗口
+                # 使用工具类最大化窗口（无头模式没有窗口）
                 # 窗口最大化也能响应停止请求
-                PlaywrightUtil.maximize_browser_window()
+                if not self.lean_mode:
+                    PlaywrightUtil.maximize_browser_window()
                  
      
                 
-                # 滚动页面以触发更多请求
+                # 滚动页面以触发更多请求：每批搜索结果到达后立即继续滚动
                 print("开始滚动页面加载更多内容...")
-                last_height = 0
-                retry_count = 0
-                max_retries = 3  # 最大重试次数
                 scroll_count = 0  # 记录滚动次数
+                empty_rounds = 0  # 连续等不到新数据的次数
+                wait_timeout = self.response_timeout
 
-                
                 while True:  # 移除了thread_control.is_stopped()检查
                     try:
-                        # 获取滚动前的页面高度
-                        current_height = page.evaluate("document.documentElement.scrollHeight")
-                        
-                        # 滚动到页面底部
-                        page.evaluate("""() => {
-                            window.scrollTo({
-                                top: document.documentElement.scrollHeight,
-                                behavior: 'smooth'
-                            });
-                        }""")
+                        scroll_start = time.time()
+                        responses_before = self.response_count
                         
-                        # 等待加载
-                        time.sleep(2)
+                        # 取到令牌才滚动，多个进程共用同一账号时不会超速
+                        if self.rate_limiter:
+                            self.rate_limiter.acquire()
                         
-                        # 检查是否出现"暂时没有更多了"的元素
-                        no_more = page.query_selector("div.ECAcoo0p div.shrAJJLa")
-                        if no_more:
-                            no_more_text = page.evaluate("el => el.textContent", no_more)
-                            if "暂时没有更多了" in no_more_text:
-                                print("检测到'暂时没有更多了'，停止滚动")
-                                break
-                        
-                        # 获取滚动后的新页面高度
-                        new_height = page.evaluate("document.documentElement.scrollHeight")
+                        # 滚动到页面底部
+                        self._scroll_to_bottom(page)
                         scroll_count += 1
                         
-                        print(f"第 {scroll_count} 次滚动，页面高度: {new_height}（之前：{current_height}）")
-                        
-                        # 检查页面高度是否有变化
-                        if new_height <= current_height:
-                            retry_count += 1
-                            print(f"页面高度未增加，重试次数：{retry_count}/{max_retries}")
-                            if retry_count >= max_retries:
-                                print("达到最大重试次数，确认已加载全部内容")
+                        # 等待下一批搜索结果，等待期间 Playwright 会分发 response 事件
+                        if self._wait_for_batch(page, responses_before, wait_timeout):
+                            empty_rounds = 0
+                            wait_timeout = self.response_timeout
+                            print(f"第 {scroll_count} 次滚动，收到新数据，当前视频数: {self.counters['unique']}")
+                            
+                            # 增量模式：连续多批都是以前采过的视频，后面只会更旧
+                            if self.known_stop_after and self.known_streak >= self.known_stop_after:
+                                print(f"连续 {self.known_streak} 批都是已知视频，增量采集结束")
+                                self.finished = True
+                                break
+                            
+                            # 接口明确返回没有更多数据
+                            if not self.has_more:
+                                print("搜索接口返回 has_more=0，停止滚动")
+                                self.finished = True
                                 break
                         else:
-                            retry_count = 0  # 如果页面高度有变化，重置重试计数
-                            print(f"页面已加载更多内容，当前视频数: {len(self.videos)}")
+                            # 检查是否出现"暂时没有更多了"的元素
+                            if self._is_no_more(page):
+                                print("检测到'暂时没有更多了'，停止滚动")
+                                self.finished = True
+                                break
+                            
+                            empty_rounds += 1
+                            print(f"第 {scroll_count} 次滚动，{wait_timeout} 秒内未收到新数据，重试次数：{empty_rounds}/{self.max_empty_rounds}")
+                            if empty_rounds >= self.max_empty_rounds:
+                                # 可能是网络或风控导致的，断点保存为中断，之后可以续采
+                                print("达到最大重试次数，停止滚动")
+                                break
+                            # 自适应退避：等不到数据时逐次延长等待时间
+                            wait_timeout = min(wait_timeout * 2, self.max_response_timeout)
+                        
+                        # 页面越滚越大：定期检查内存，超过阈值时裁剪卡片或换新页面
+                        if self.max_dom_nodes and scroll_count % self.page_check_interval == 0:
+                            page = self._maintain_page(browser, page, keyword)
                         
-                        last_height = new_height
+                        # 定期保存断点
+                        self._save_checkpoint()
                         
-                        time.sleep(3)
+                        # 保持最小滚动间隔；停止时立即抛出 InterruptedError，暂停时在这里等待
+                        current_token().sleep(max(self.min_scroll_interval - (time.time() - scroll_start), 0.01))
                         
                     except Exception as e:
                         print(f"滚动过程出错: {str(e)}")
@@ -173,7 +760,7 @@ class ExampleUtil:
                         break
                     
 
-                print(f"滚动完成，共执行 {scroll_count} 次滚动，找到 {len(self.videos)} 个视频")
+                print(f"滚动完成，共执行 {scroll_count} 次滚动，找到 {self.counters['unique']} 个视频，重复 {self.counters['duplicates']} 个")
                 return self.videos
 
             except Exception as e:
@@ -181,4 +768,295 @@ class ExampleUtil:
                 return []
 
             finally:
-                browser.close()
\ No newline at end of file
+                # 被停止或出错时也保存一次断点，下次可以继续
+                self._save_checkpoint(force=True)
+                # 浏览器关闭前统计，子进程退出后拿不到CPU时间
+                self._finish_stats()
+
+    def export_session(self, keyword):
+        """
+        用账号的用户目录打开搜索页，导出 Cookie、请求头和页面发出的首个搜索请求，供 HTTP 采集引擎使用
+        """
+        captured = {}
+        def on_request(request):
+            if SEARCH_API in request.url and 'request' not in captured:
+                captured['request'] = request
+
+        with sync_playwright() as p, self._open_context(p) as context:
+            page = context.new_page()
+            if self.lean_mode:
+                page.route("**/*", self._route_request)
+            page.on("request", on_request)
+            search_url = f"{self.base_url}/discover/search/{keyword}?type=video"
+            print(f"导出会话，正在访问: {search_url}")
+            page.goto(search_url, wait_until="domcontentloaded")
+
+            deadline = time.time() + self.max_response_timeout
+            while 'request' not in captured and time.time() < deadline:
+                page.wait_for_timeout(100)
+            if 'request' not in captured:
+                raise SessionRejected("搜索页没有发出搜索请求，可能未登录或需要验证")
+
+            request = captured['request']
+            return {
+                'url': request.url,
+                'headers': request.all_headers(),
+                'cookies': context.cookies(),
+                'exported_at': time.time()
+            }
+
+
+    def get_douyinlink_list_http(self, keyword=None, platform_name=None, username=None, fallback=True, session_ttl=DEFAULT_SESSION_TTL):
+        """
+        HTTP 引擎采集：用导出的浏览器会话直接翻页请求搜索接口，不启动渲染进程
+        缓存的会话被拒绝时重新导出一次；新导出的会话也被拒绝时，fallback 为 True 则从当前游标改用浏览器继续采集
+        """
+        self.user_data_dir=os.path.join(self.data_directory,'Chromes',platform_name,username)
+        self.response_count = 0
+        self.has_more = True
+        self.finished = False
+        self.known_streak = 0
+        self.last_checkpoint = time.time()
+        self._init_stats('http')
+        process_cpu_start = time.process_time()
+
+        session_path = get_session_path(self.data_directory, platform_name, username)
+        session = load_session(session_path, session_ttl)
+        session_fresh = False
+        collector = None
+        offset = self.resume_cursor or 0
+        self.resume_cursor = None
+        empty_rounds = 0
+        rejected = None
+        http_stats = {'requests': 0, 'bytes_received': 0}
+        print(f"HTTP 引擎采集关键词: {keyword}，从 offset={offset} 开始")
+
+        try:
+            while True:
+                page_start = time.time()
+                try:
+                    if collector is None:
+                        if session is None:
+                            session_fresh = True
+                            session = self.export_session(keyword)
+                            save_session(session_path, session)
+                        collector = HttpSearchCollector(session, timeout=self.max_response_timeout)
+                    if self.rate_limiter:
+                        self.rate_limiter.acquire()
+                    data, url = collector.fetch_page(keyword, offset)
+                except SessionRejected as e:
+                    print(f"HTTP 采集被拒绝: {str(e)}")
+                    if collector is not None:
+                        for key, value in collector.get_stats().items():
+                            http_stats[key] += value
+                        collector.close()
+                        collector = None
+                    if not session_fresh:
+                        # 缓存的会话可能已失效，重新导出一次
+                        session = None
+                        continue
+                    rejected = str(e)
+                    break
+
+                self._feed_sinks(url, data)
+                self.response_count += 1
+                self.has_more = bool(data.get('has_more'))
+                items = data.get('data') or []
+                offset = data['cursor'] if data.get('cursor') is not None else offset + len(items)
+                self.cursor = offset
+                self._emit_batch(self._filter_known(self._parse_videos(data)), keyword)
+                print(f"第 {self.response_count} 页，当前视频数: {self.counters['unique']}")
+
+                if self.known_stop_after and self.known_streak >= self.known_stop_after:
+                    print(f"连续 {self.known_streak} 批都是已知视频，增量采集结束")
+                    self.finished = True
+                    break
+                if not self.has_more:
+                    print("搜索接口返回 has_more=0，采集结束")
+                    self.finished = True
+                    break
+                empty_rounds = 0 if items else empty_rounds + 1
+                if empty_rounds >= self.max_empty_rounds:
+                    # 接口没有说明已经到底，断点保存为中断，之后可以续采
+                    print("连续多页没有数据，停止采集")
+                    break
+
+                self._save_checkpoint()
+                # 保持最小请求间隔；停止时立即抛出 InterruptedError，暂停时在这里等待
+                current_token().sleep(max(self.min_scroll_interval - (time.time() - page_start), 0.01))
+        finally:
+            if collector is not None:
+                for key, value in collector.get_stats().items():
+                    http_stats[key] += value
+                collector.close()
+            self.stats['requests'] = http_stats['requests']
+            self.stats['bytes_received'] = http_stats['bytes_received']
+            self.stats['process_cpu_seconds'] = round(time.process_time() - process_cpu_start, 2)
+            if rejected is None or not fallback:
+                self._save_checkpoint(force=True)
+                self._finish_stats()
+
+        if rejected is None:
+            print(f"HTTP 采集完成，共 {self.response_count} 页，找到 {self.counters['unique']} 个视频")
+            return self.videos
+        if not fallback:
+            raise SessionRejected(rejected)
+
+        # 已采到的视频保留在已见ID中，浏览器从当前游标继续
+        print(f"HTTP 引擎不可用（{rejected}），改用浏览器从 offset={self.cursor} 继续采集")
+        http_stats['elapsed'] = round(time.time() - self.stats['start_time'], 2)
+        self.resume_cursor = self.cursor or None
+        videos = self.get_douyinlink_list(keyword, platform_name, username)
+        self.stats['http'] = http_stats
+        self.stats['fallback'] = rejected
+        return videos
+
+
+    def _open_keyword(self, tab, keyword):
+        """标签页切换到新的关键词"""
+        tab.update({
+            'keyword': keyword,
+            'state': 'scroll',
+            'response_count': 0,
+            'responses_before': 0,
+            'has_more': True,
+            'scroll_count': 0,
+            'empty_rounds': 0,
+            'wait_timeout': self.response_timeout,
+            'scroll_at': 0,
+            'next_scroll_at': 0,
+            'deadline': 0
+        })
+        self.keyword_counts.setdefault(keyword, 0)
+        search_url = f"{self.base_url}/discover/search/{keyword}?type=video"
+        print(f"[标签页 {tab['index']}] 正在访问: {search_url}")
+        tab['page'].goto(search_url, wait_until="domcontentloaded")
+
+
+    def _check_tab(self, tab, now):
+        """
+        检查等待中的标签页
+        :return: 该关键词是否已采集结束
+        """
+        keyword = tab['keyword']
+        if tab['response_count'] > tab['responses_before']:
+            tab['empty_rounds'] = 0
+            tab['wait_timeout'] = self.response_timeout
+            if not tab['has_more']:
+                print(f"[{keyword}] 搜索接口返回 has_more=0，停止滚动")
+                return True
+        elif now >= tab['deadline']:
+            if self._is_no_more(tab['page']):
+                print(f"[{keyword}] 检测到'暂时没有更多了'，停止滚动")
+                return True
+            tab['empty_rounds'] += 1
+            print(f"[{keyword}] {tab['wait_timeout']} 秒内未收到新数据，重试次数：{tab['empty_rounds']}/{self.max_empty_rounds}")
+            if tab['empty_rounds'] >= self.max_empty_rounds:
+                print(f"[{keyword}] 达到最大重试次数，确认已加载全部内容")
+                return True
+            tab['wait_timeout'] = min(tab['wait_timeout'] * 2, self.max_response_timeout)
+        else:
+            return False
+
+        tab['state'] = 'scroll'
+        tab['next_scroll_at'] = tab['scroll_at'] + self.min_scroll_interval
+        return False
+
+
+    def get_douyinlink_list_batch(self, keywords, platform_name=None, username=None, concurrency=3):
+        """
+        多关键词批量采集
+        同一个浏览器上下文中打开 concurrency 个标签页，每个标签页负责一个关键词，轮流滚动；
+        某个关键词采完后该标签页接着采下一个关键词，所有结果通过同一个回调写入
+        :return: 采集到的视频列表，每个视频带 keyword 字段
+        """
+        pending = [keyword for keyword in dict.fromkeys(keywords or []) if keyword]
+        if not pending:
+            return []
+        self.user_data_dir=os.path.join(self.data_directory,'Chromes',platform_name,username)
+        self.keyword_counts = {}
+        self.page_sessions = {}
+        concurrency = max(1, min(int(concurrency or 1), len(pending)))
+        print(f"批量采集 {len(pending)} 个关键词，并发标签页 {concurrency} 个")
+
+        with sync_playwright() as p, ExitStack() as stack:
+            # 后台标签页默认会被降频，关闭后各标签页才能同时加载
+            browser = stack.enter_context(self._open_context(p, [
+                '--disable-background-timer-throttling',
+                '--disable-backgrounding-occluded-windows',
+                '--disable-renderer-backgrounding'
+            ]))
+
+            try:
+                tabs = []
+                for index in range(concurrency):
+                    page = browser.new_page()
+                    if index == 0:
+                        self._start_stats(browser, page)
+                    else:
+                        self._watch_page(browser, page)
+                    if self.lean_mode:
+                        page.route("**/*", self._route_request)
+                    tab = {'index': index + 1, 'page': page, 'keyword': None}
+                    page.on("response", lambda response, tab=tab: self._handle_tab_response(tab, response))
+                    tabs.append(tab)
+                    self._open_keyword(tab, pending.pop(0))
+
+                if not self.lean_mode:
+                    PlaywrightUtil.maximize_browser_window()
+
+                while any(tab['keyword'] for tab in tabs):
+                    now = time.time()
+                    for tab in tabs:
+                        if not tab['keyword']:
+                            continue
+                        try:
+                            if tab['state'] == 'scroll':
+                                if now < tab['next_scroll_at']:
+                                    continue
+                                # 没有令牌时不阻塞，该标签页推迟到令牌补充后再滚动
+                                if self.rate_limiter:
+                                    acquired, wait = self.rate_limiter.try_acquire()
+                                    if not acquired:
+                                        tab['next_scroll_at'] = now + wait
+                                        continue
+                                tab['responses_before'] = tab['response_count']
+                                tab['scroll_at'] = now
+                                tab['deadline'] = now + tab['wait_timeout']
+                                tab['state'] = 'wait'
+                                self._scroll_to_bottom(tab['page'])
+                                tab['scroll_count'] += 1
+                                if self.max_dom_nodes and tab['scroll_count'] % self.page_check_interval == 0:
+                                    self._trim_if_needed(tab['page'])
+                                continue
+                            finished = self._check_tab(tab, now)
+                        except Exception as e:
+                            print(f"[{tab['keyword']}] 滚动过程出错: {str(e)}")
+                            finished = True
+
+                        if finished:
+                            print(f"[{tab['keyword']}] 采集结束，共滚动 {tab['scroll_count']} 次，找到 {self.keyword_counts.get(tab['keyword'], 0)} 个视频")
+                            tab['keyword'] = None
+                            while pending and not tab['keyword']:
+                                keyword = pending.pop(0)
+                                try:
+                                    self._open_keyword(tab, keyword)
+                                except Exception as e:
+                                    print(f"[{keyword}] 打开搜索页失败: {str(e)}")
+                                    tab['keyword'] = None
+
+                    # 等待期间 Playwright 分发各标签页的 response 事件；检查取消令牌响应暂停/停止
+                    tabs[0]['page'].wait_for_timeout(100)
+                    current_token().check()
+
+                print(f"批量采集完成，共找到 {self.counters['unique']} 个视频，重复 {self.counters['duplicates']} 个: {self.keyword_counts}")
+                return self.videos
+
+            except Exception as e:
+                print(f"批量抓取过程出错: {str(e)}")
+                return self.videos
+
+            finally:
+                self._finish_stats()
+                if self.stats:
+                    self.stats['keywords'] = dict(self.keyword_counts)
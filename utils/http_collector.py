@@ -0,0 +1,122 @@
+"""
+HTTP 采集引擎
+
+登录后浏览器只用来产生带签名的搜索请求，其余都是 JSON 解析。
+用账号的持久化用户目录导出一次会话（Cookie、请求头、页面发出的首个搜索请求），
+之后用连接池化的 requests.Session 按 offset 翻页直接请求搜索接口，不需要渲染进程。
+
+接口拒绝（非 200、空响应、非 JSON、status_code 非 0）时抛出 SessionRejected，
+由 ExampleUtil 重新导出会话或退回 Playwright 采集。站点对翻页参数做签名校验时每页都会被拒绝，
+这种情况下每次都会退回浏览器，只在本地回放服务或签名宽松的接口上才能省下渲染开销。
+"""
+import os
+import json
+import time
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# 导出的会话多久内可以直接复用（秒）
+DEFAULT_SESSION_TTL = 1800
+# 不随请求重放的请求头：由 requests 自行生成或由 Cookie 容器管理
+SKIPPED_HEADERS = {'host', 'cookie', 'content-length', 'connection', 'accept-encoding'}
+
+
+class SessionRejected(Exception):
+    """搜索接口拒绝了导出的会话"""
+
+
+def get_session_path(data_directory, platform_name, username):
+    return Path(data_directory) / 'Sessions' / platform_name / f'{username}.json'
+
+
+def load_session(path, max_age=DEFAULT_SESSION_TTL):
+    """读取导出的会话，过期或不存在时返回 None"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - session.get('exported_at', 0) > max_age:
+        return None
+    return session
+
+
+def save_session(path, session):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(session, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class HttpSearchCollector:
+    def __init__(self, session, timeout=10, pool_size=4):
+        """
+        :param session: 导出的会话，包含 url（页面发出的搜索请求）、headers、cookies
+        :param timeout: 单次请求超时（秒）
+        :param pool_size: 连接池大小
+        """
+        self.template = urlparse(session['url'])
+        self.query = parse_qs(self.template.query, keep_blank_values=True)
+        self.timeout = timeout
+        self.requests = 0
+        self.bytes_received = 0
+
+        self.client = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.client.mount('http://', adapter)
+        self.client.mount('https://', adapter)
+        self.client.headers.update({
+            name: value for name, value in (session.get('headers') or {}).items()
+            if not name.startswith(':') and name.lower() not in SKIPPED_HEADERS
+        })
+        for cookie in session.get('cookies') or []:
+            self.client.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain', ''), path=cookie.get('path', '/')
+            )
+
+    def build_url(self, keyword, offset):
+        """在页面搜索请求的基础上替换关键词和 offset，其余参数原样保留"""
+        query = dict(self.query)
+        query['keyword'] = [keyword]
+        query['offset'] = [str(offset)]
+        return urlunparse(self.template._replace(query=urlencode(query, doseq=True)))
+
+    def fetch_page(self, keyword, offset):
+        """
+        请求一页搜索结果
+        :return: (响应数据, 请求地址)
+        """
+        url = self.build_url(keyword, offset)
+        try:
+            response = self.client.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise SessionRejected(f"请求失败: {str(e)}")
+        self.requests += 1
+        self.bytes_received += len(response.content)
+        if response.status_code != 200:
+            raise SessionRejected(f"HTTP {response.status_code}")
+        if not response.content:
+            raise SessionRejected("空响应，可能是签名校验失败")
+        try:
+            data = response.json()
+        except ValueError:
+            raise SessionRejected("响应不是 JSON，可能需要验证")
+        if data.get('status_code', 0) != 0:
+            raise SessionRejected(f"status_code={data.get('status_code')}")
+        return data, url
+
+    def close(self):
+        self.client.close()
+
+    def get_stats(self):
+        return {'requests': self.requests, 'bytes_received': self.bytes_received}
@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+
+
+class IngestPipeline:
+    """
+    采集入库流水线：响应解析（生产者）与数据库写入（消费者）解耦
+    - 生产者在 Playwright 事件回调中调用 put，只做入队，不碰磁盘
+    - 独立写线程从有界队列中攒批，调用 writer 一次性写入
+    - 队列满时每次 put 最多阻塞 block_timeout 秒（背压），到时仍然放不进去的数据丢弃并计数
+    """
+
+    def __init__(self, writer, batch_size=200, max_queue=5000, flush_interval=0.5, block_timeout=2.0, on_flush=None, name='ingest'):
+        """
+        :param writer: 批量写入函数 writer(items)，在写线程中调用
+        :param batch_size: 单批最多写入条数
+        :param max_queue: 队列容量
+        :param flush_interval: 攒批最长等待秒数，数据不多时也能及时落库
+        :param block_timeout: 队列满时单次 put 最多阻塞的秒数
+        :param on_flush: 每写完一批后的回调 on_flush(stats)，用于更新进度
+        """
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.on_flush = on_flush
+        self.name = name
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.counters = {
+            'received': 0,        # 生产者提交的条数
+            'written': 0,         # 已写入条数
+            'dropped': 0,         # 队列满被丢弃的条数
+            'failed': 0,          # 写入失败的条数
+            'batches': 0,         # 写入批次数
+            'blocked_seconds': 0, # 生产者因背压累计阻塞的秒数
+            'write_seconds': 0,   # 写线程累计写入耗时
+            'max_queue_depth': 0
+        }
+        self.start_time = time.time()
+        self._thread = threading.Thread(target=self._run, name=f'{name}-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, items):
+        """
+        提交一批数据，返回实际入队条数
+        整批共用一个 block_timeout 截止时间，超时后本批剩余数据全部丢弃并计数
+        """
+        items = list(items)
+        accepted = 0
+        deadline = None
+        blocked = 0
+        for index, item in enumerate(items):
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                wait_start = time.time()
+                if deadline is None:
+                    deadline = wait_start + self.block_timeout
+                try:
+                    self.queue.put(item, timeout=max(deadline - wait_start, 0))
+                except queue.Full:
+                    with self._lock:
+                        self.counters['dropped'] += len(items) - index
+                    break
+                finally:
+                    blocked += time.time() - wait_start
+            accepted += 1
+        with self._lock:
+            self.counters['received'] += len(items)
+            self.counters['blocked_seconds'] += blocked
+            self.counters['max_queue_depth'] = max(self.counters['max_queue_depth'], self.queue.qsize())
+        return accepted
+
+    def _take_batch(self):
+        """取一批数据：先阻塞等第一条，再在 flush_interval 内尽量攒满"""
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._take_batch()
+            if not batch:
+                continue
+            write_start = time.time()
+            try:
+                self.writer(batch)
+                with self._lock:
+                    self.counters['written'] += len(batch)
+            except Exception as e:
+                print(f"[{self.name}] 批量写入失败 {len(batch)} 条: {str(e)}")
+                with self._lock:
+                    self.counters['failed'] += len(batch)
+            with self._lock:
+                self.counters['batches'] += 1
+                self.counters['write_seconds'] += time.time() - write_start
+
+            if self.on_flush:
+                try:
+                    self.on_flush(self.get_stats())
+                except Exception as e:
+                    print(f"[{self.name}] 进度回调出错: {str(e)}")
+
+    def get_stats(self):
+        """各阶段吞吐统计"""
+        with self._lock:
+            stats = dict(self.counters)
+        elapsed = max(time.time() - self.start_time, 0.001)
+        stats.update({
+            'queue_size': self.queue.qsize(),
+            'elapsed': round(elapsed, 2),
+            'received_per_sec': round(stats['received'] / elapsed, 1),
+            'written_per_sec': round(stats['written'] / elapsed, 1),
+            'avg_batch_ms': round(stats['write_seconds'] * 1000 / stats['batches'], 1) if stats['batches'] else 0,
+            'blocked_seconds': round(stats['blocked_seconds'], 2),
+            'write_seconds': round(stats['write_seconds'], 2)
+        })
+        return stats
+
+    def close(self, timeout=30):
+        """停止接收，等待队列中的数据全部写完"""
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"[{self.name}] 写线程未在 {timeout} 秒内结束，剩余 {self.queue.qsize()} 条未写入")
+        stats = self.get_stats()
+        print(f"[{self.name}] 入库统计: {stats}")
+        return stats
@@ -0,0 +1,278 @@
+"""
+runner 子进程的进程组管理
+
+每个 plugin_runner 子进程及其启动的 Playwright 驱动、浏览器放在单独的进程组里：
+POSIX 下是新的会话/进程组，Windows 下是 Job Object（runner 挂起创建，放进 Job 后才开始运行）。停止时按进程组一次结束整棵进程树，
+不再扫描全系统按名字找 chrome，也不会误关用户自己打开的 Chrome。
+
+浏览器池的常驻浏览器不属于任务：POSIX 下它有自己的会话，Windows 下以 CREATE_BREAKAWAY_FROM_JOB 启动脱离 Job。
+"""
+import os
+import sys
+import signal
+import threading
+import subprocess
+from contextlib import contextmanager
+
+import psutil
+
+try:
+    from utils.browser_pool import POOL_MARKER_ARG
+except ImportError:
+    from browser_pool import POOL_MARKER_ARG
+
+
+# 浏览器进程名关键字（本机 Chrome、Playwright 自带的 Chromium 和无头版）
+BROWSER_NAMES = ('chrome', 'chromium', 'headless_shell')
+
+# 本进程通过 ProcessGroup 启动的进程组根进程，查找本任务浏览器时跳过这些子树
+_group_roots = set()
+# 同一进程内的浏览器启动串行执行，启动前后的差集才只包含这一次启动的浏览器
+_launch_lock = threading.Lock()
+
+
+if sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    ntdll = ctypes.WinDLL('ntdll')
+
+    JOB_OBJECT_BASIC_PROCESS_ID_LIST = 3
+    JOB_OBJECT_EXTENDED_LIMIT_INFORMATION = 9
+    # 允许进程以 CREATE_BREAKAWAY_FROM_JOB 脱离 Job（浏览器池的常驻浏览器）
+    JOB_OBJECT_LIMIT_BREAKAWAY_OK = 0x00000800
+    # runner 以挂起状态创建，放进 Job 之后再恢复运行
+    CREATE_SUSPENDED = 0x00000004
+
+    class IO_COUNTERS(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+            'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount'
+        )]
+
+    class JOBOBJECT_BASIC_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ('PerProcessUserTimeLimit', ctypes.c_int64),
+            ('PerJobUserTimeLimit', ctypes.c_int64),
+            ('LimitFlags', wintypes.DWORD),
+            ('MinimumWorkingSetSize', ctypes.c_size_t),
+            ('MaximumWorkingSetSize', ctypes.c_size_t),
+            ('ActiveProcessLimit', wintypes.DWORD),
+            ('Affinity', ctypes.c_size_t),
+            ('PriorityClass', wintypes.DWORD),
+            ('SchedulingClass', wintypes.DWORD)
+        ]
+
+    class JOBOBJECT_EXTENDED_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ('BasicLimitInformation', JOBOBJECT_BASIC_LIMIT_INFORMATION),
+            ('IoInfo', IO_COUNTERS),
+            ('ProcessMemoryLimit', ctypes.c_size_t),
+            ('JobMemoryLimit', ctypes.c_size_t),
+            ('PeakProcessMemoryUsed', ctypes.c_size_t),
+            ('PeakJobMemoryUsed', ctypes.c_size_t)
+        ]
+
+    class JOBOBJECT_BASIC_PROCESS_ID_LIST(ctypes.Structure):
+        _fields_ = [
+            ('NumberOfAssignedProcesses', wintypes.DWORD),
+            ('NumberOfProcessIdsInList', wintypes.DWORD),
+            ('ProcessIdList', ctypes.c_size_t * 1024)
+        ]
+
+    kernel32.CreateJobObjectW.argtypes = [wintypes.LPVOID, wintypes.LPCWSTR]
+    kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    kernel32.SetInformationJobObject.argtypes = [wintypes.HANDLE, ctypes.c_int, wintypes.LPVOID, wintypes.DWORD]
+    kernel32.QueryInformationJobObject.argtypes = [wintypes.HANDLE, ctypes.c_int, wintypes.LPVOID, wintypes.DWORD, wintypes.LPVOID]
+    kernel32.AssignProcessToJobObject.argtypes = [wintypes.HANDLE, wintypes.HANDLE]
+    kernel32.TerminateJobObject.argtypes = [wintypes.HANDLE, wintypes.UINT]
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    ntdll.NtResumeProcess.argtypes = [wintypes.HANDLE]
+    ntdll.NtResumeProcess.restype = ctypes.c_long
+
+    def _create_job(process_handle):
+        """创建 Job 并把进程放进去；之后该进程启动的子进程自动属于同一个 Job"""
+        job = kernel32.CreateJobObjectW(None, None)
+        if not job:
+            raise ctypes.WinError(ctypes.get_last_error())
+        info = JOBOBJECT_EXTENDED_LIMIT_INFORMATION()
+        info.BasicLimitInformation.LimitFlags = JOB_OBJECT_LIMIT_BREAKAWAY_OK
+        kernel32.SetInformationJobObject(job, JOB_OBJECT_EXTENDED_LIMIT_INFORMATION, ctypes.byref(info), ctypes.sizeof(info))
+        if not kernel32.AssignProcessToJobObject(job, process_handle):
+            error = ctypes.WinError(ctypes.get_last_error())
+            kernel32.CloseHandle(job)
+            raise error
+        return job
+
+    def _resume_process(process_handle):
+        """恢复以 CREATE_SUSPENDED 创建的进程（Popen 已关闭主线程句柄，按进程恢复）"""
+        status = ntdll.NtResumeProcess(process_handle)
+        if status != 0:
+            raise OSError(f"NtResumeProcess 失败: 0x{status & 0xFFFFFFFF:08X}")
+
+    def _job_pids(job):
+        info = JOBOBJECT_BASIC_PROCESS_ID_LIST()
+        if not kernel32.QueryInformationJobObject(job, JOB_OBJECT_BASIC_PROCESS_ID_LIST, ctypes.byref(info), ctypes.sizeof(info), None):
+            return []
+        return [int(info.ProcessIdList[i]) for i in range(info.NumberOfProcessIdsInList)]
+
+
+class ProcessGroup:
+    """一个 runner 子进程及其所有后代组成的进程组"""
+
+    def __init__(self, cmd, **popen_kwargs):
+        if sys.platform == 'win32':
+            popen_kwargs['creationflags'] = popen_kwargs.get('creationflags', 0) | subprocess.CREATE_NEW_PROCESS_GROUP | CREATE_SUSPENDED
+        else:
+            popen_kwargs['start_new_session'] = True
+        self.process = subprocess.Popen(cmd, **popen_kwargs)
+        self.pid = self.process.pid
+        self.stdout = self.process.stdout
+        self._job = None
+        if sys.platform == 'win32':
+            # runner 还没有运行任何代码，放进 Job 后再恢复，它启动的所有子进程都在 Job 里
+            handle = int(self.process._handle)
+            try:
+                self._job = _create_job(handle)
+            except OSError as e:
+                print(f"创建 Job 失败，停止时只能结束 runner 进程: {e}")
+            try:
+                _resume_process(handle)
+            except OSError:
+                self.process.kill()
+                self.close()
+                raise
+        _group_roots.add(self.pid)
+
+    def poll(self):
+        return self.process.poll()
+
+    def wait(self, timeout=None):
+        return self.process.wait(timeout=timeout)
+
+    def pids(self):
+        """进程组内的所有进程ID"""
+        if self._job is not None:
+            return _job_pids(self._job)
+        if sys.platform == 'win32':
+            return [self.pid] if self.poll() is None else []
+        pids = []
+        try:
+            candidates = [psutil.Process(self.pid)] + psutil.Process(self.pid).children(recursive=True)
+        except psutil.NoSuchProcess:
+            candidates = []
+        for proc in candidates:
+            try:
+                if os.getpgid(proc.pid) == self.pid:
+                    pids.append(proc.pid)
+            except OSError:
+                pass
+        return pids
+
+    def terminate(self, timeout=5, kill_timeout=3):
+        """
+        结束进程组：先等 runner 自己退出（收到停止指令后它会写完入库队列、保存断点、归还租约），
+        timeout 秒后仍在运行才发 SIGTERM，再过 kill_timeout 秒仍未退出则强制结束整个进程组
+        """
+        try:
+            self.process.wait(timeout=timeout)
+            self.close()
+            return
+        except subprocess.TimeoutExpired:
+            pass
+
+        print(f"runner 进程 {self.pid} 未在 {timeout} 秒内退出，结束进程组")
+        try:
+            if sys.platform == 'win32':
+                self.process.terminate()
+            else:
+                os.killpg(self.pid, signal.SIGTERM)
+        except (OSError, ProcessLookupError):
+            pass
+        try:
+            self.process.wait(timeout=kill_timeout)
+        except subprocess.TimeoutExpired:
+            pass
+        self.kill()
+
+    def close(self):
+        """runner 已自行退出：释放进程组句柄，不结束任何进程"""
+        if self._job is not None:
+            kernel32.CloseHandle(self._job)
+            self._job = None
+        _group_roots.discard(self.pid)
+
+    def kill(self):
+        """强制结束整个进程组（包括 runner 已退出后遗留的浏览器）"""
+        try:
+            if self._job is not None:
+                kernel32.TerminateJobObject(self._job, 1)
+                kernel32.CloseHandle(self._job)
+                self._job = None
+            elif sys.platform == 'win32':
+                self.process.kill()
+            else:
+                os.killpg(self.pid, signal.SIGKILL)
+        except (OSError, ProcessLookupError):
+            pass
+        _group_roots.discard(self.pid)
+
+
+def is_browser_process(proc):
+    return any(name in proc.name().lower() for name in BROWSER_NAMES)
+
+
+def task_browser_pids():
+    """
+    当前进程启动的浏览器进程：只看本进程的进程树，不扫描全系统
+    跳过浏览器池的常驻浏览器，以及本进程另外启动的进程组（定时任务在主进程中运行时不会关到界面任务的浏览器）
+    """
+    me = os.getpid()
+    try:
+        descendants = psutil.Process(me).children(recursive=True)
+    except psutil.Error:
+        return []
+    by_pid = {proc.pid: proc for proc in descendants}
+
+    pids = []
+    for proc in descendants:
+        try:
+            if not is_browser_process(proc):
+                continue
+            ancestor = proc
+            owned = True
+            while ancestor is not None and ancestor.pid != me:
+                if ancestor.pid in _group_roots or POOL_MARKER_ARG in (ancestor.cmdline() or []):
+                    owned = False
+                    break
+                ancestor = by_pid.get(ancestor.ppid())
+            if owned:
+                pids.append(proc.pid)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return pids
+
+
+@contextmanager
+def track_browser_launch():
+    """
+    记录一次浏览器启动的进程ID：
+        with track_browser_launch() as launched:
+            context = p.chromium.launch_persistent_context(...)
+    退出后 launched 中是这次启动的浏览器主进程（父进程不是浏览器的新进程），
+    同一进程中其他任务的浏览器在此期间新开的渲染进程不会算进来
+    """
+    launched = []
+    with _launch_lock:
+        before = set(task_browser_pids())
+        yield launched
+        for pid in task_browser_pids():
+            if pid in before:
+                continue
+            try:
+                parent = psutil.Process(pid).parent()
+                if parent is None or not is_browser_process(parent):
+                    launched.append(pid)
+            except psutil.Error:
+                continue
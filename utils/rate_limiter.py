@@ -0,0 +1,122 @@
+import sqlite3
+import time
+from pathlib import Path
+
+try:
+    from utils.cancellation import current_token
+except ImportError:
+    from cancellation import current_token
+
+
+# 每个账号默认的安全速率：每分钟滚动（触发搜索请求）次数和允许的突发次数
+DEFAULT_RATE_PER_MINUTE = 40
+DEFAULT_BURST = 5
+
+
+class RateLimiter:
+    """
+    跨进程令牌桶限流
+    桶状态保存在 Tables/rate-limit.db，界面和定时任务启动的多个 plugin_runner 进程共用同一个桶
+    按 平台:账号 区分，取令牌在 BEGIN IMMEDIATE 事务中完成
+    """
+
+    def __init__(self, data_directory, key, rate_per_minute=DEFAULT_RATE_PER_MINUTE, burst=DEFAULT_BURST):
+        """
+        :param key: 桶的标识，一般为 平台:账号
+        :param rate_per_minute: 每分钟补充的令牌数
+        :param burst: 桶容量，空闲后最多允许连续取走的令牌数
+        """
+        self.data_directory = data_directory
+        self.key = key
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.db_path = self.get_db_path()
+        self.waited_seconds = 0
+        self.acquired = 0
+        self.create_tables()
+
+    @classmethod
+    def for_account(cls, data_directory, platform_name, username, rate_per_minute=DEFAULT_RATE_PER_MINUTE, burst=DEFAULT_BURST):
+        """按平台和账号创建限流器"""
+        return cls(data_directory, f"{platform_name}:{username}", rate_per_minute, burst)
+
+    def get_db_path(self) -> Path:
+        db_dir = Path(self.data_directory) / 'Tables'
+        if not db_dir.exists():
+            db_dir.mkdir(parents=True, exist_ok=True)
+        return db_dir / 'rate-limit.db'
+
+    def get_connection(self):
+        return sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+
+    def create_tables(self):
+        conn = self.get_connection()
+        try:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS token_bucket (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """)
+        finally:
+            conn.close()
+
+    def try_acquire(self, tokens=1):
+        """
+        尝试取令牌，不等待
+        :return: (是否取到, 还需等待的秒数)
+        """
+        conn = self.get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT tokens, updated_at FROM token_bucket WHERE key = ?", (self.key,)).fetchone()
+                available = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+
+                acquired = available >= tokens
+                if acquired:
+                    available -= tokens
+                conn.execute(
+                    "INSERT OR REPLACE INTO token_bucket (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.key, available, now)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+        if acquired:
+            self.acquired += tokens
+            return True, 0
+        return False, (tokens - available) / self.rate if self.rate > 0 else 1
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        取令牌，不够时等待
+        等待用当前线程的取消令牌睡眠，任务被停止时立即抛出 InterruptedError
+        :return: 是否在 timeout 内取到
+        """
+        start = time.time()
+        while True:
+            acquired, wait = self.try_acquire(tokens)
+            if acquired:
+                self.waited_seconds += time.time() - start
+                return True
+            if timeout is not None and time.time() - start + wait > timeout:
+                self.waited_seconds += time.time() - start
+                return False
+            # 其他进程可能同时在等，醒来后重新竞争
+            current_token().sleep(min(wait, 1.0))
+
+    def get_stats(self):
+        return {
+            'key': self.key,
+            'rate_per_minute': round(self.rate * 60, 2),
+            'burst': self.burst,
+            'acquired': self.acquired,
+            'waited_seconds': round(self.waited_seconds, 2)
+        }
@@ -0,0 +1,246 @@
+"""
+搜索接口原始响应归档
+
+采集时把匹配到的原始响应追加写入压缩的 JSONL 分段文件（gzip，安装了 zstandard 时可选 zstd），
+分段按 关键词 + 时间 建索引。以后需要新字段（点赞数、发布时间等）时，
+直接对归档重新提取，不用打开浏览器重新采集。
+
+用法：
+    python -m utils.response_archive stats --dir <归档目录>
+    python -m utils.response_archive reprocess --dir <归档目录> --keyword 美食 --extra --out videos.jsonl
+"""
+import os
+import io
+import sys
+import json
+import gzip
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from utils.search_extract import extract_videos, BASE_FIELDS, EXTRA_FIELDS
+except ImportError:
+    from search_extract import extract_videos, BASE_FIELDS, EXTRA_FIELDS
+
+
+class ResponseArchive:
+    """追加写入的原始响应归档，可直接作为 ExampleUtil 的响应旁路输出"""
+
+    def __init__(self, archive_dir, compression='gzip', segment_max_bytes=64 * 1024 * 1024):
+        """
+        :param compression: gzip 或 zstd，未安装 zstandard 时退回 gzip
+        :param segment_max_bytes: 单个分段写入的原始字节数上限，超过后换新分段
+        """
+        if compression == 'zstd' and zstandard is None:
+            print("未安装 zstandard，响应归档改用 gzip")
+            compression = 'gzip'
+        self.compression = compression
+        self.segment_max_bytes = segment_max_bytes
+        self.archive_dir = Path(archive_dir)
+        self.segment_dir = self.archive_dir / 'segments'
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.archive_dir / 'index.db'
+        self._lock = threading.Lock()
+        self._file = None
+        self._raw = None
+        self._segment = None
+        self._segment_bytes = 0
+        self._segment_seq = 0
+        self._writer_id = uuid.uuid4().hex[:6]  # 同一进程内多个归档实例的分段互不冲突
+        self.records = 0
+        self.create_tables()
+
+    def get_connection(self):
+        return sqlite3.connect(str(self.index_path), timeout=30)
+
+    def create_tables(self):
+        with self.get_connection() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS archive_index (
+                segment TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                first_ts REAL,
+                last_ts REAL,
+                records INTEGER DEFAULT 0,
+                PRIMARY KEY (segment, keyword)
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_index_keyword_ts ON archive_index (keyword, first_ts)")
+
+    def _open_segment(self):
+        """新建分段文件；每个归档实例写自己的分段，多进程、多线程同时归档互不干扰"""
+        suffix = 'zst' if self.compression == 'zstd' else 'gz'
+        self._segment_seq += 1
+        name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{self._writer_id}_{self._segment_seq:03d}.jsonl.{suffix}"
+        path = self.segment_dir / name
+        if self.compression == 'zstd':
+            self._raw = open(path, 'ab')
+            self._file = zstandard.ZstdCompressor(level=3).stream_writer(self._raw)
+        else:
+            self._raw = None
+            self._file = gzip.open(path, 'ab')
+        self._segment = name
+        self._segment_bytes = 0
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        if self._raw is not None and not self._raw.closed:
+            self._raw.close()
+        self._file = None
+        self._raw = None
+
+    def _flush(self):
+        """把已写入的数据刷到磁盘，进程崩溃时归档可读到最后一条"""
+        if self.compression == 'zstd':
+            self._file.flush(zstandard.FLUSH_BLOCK)
+        else:
+            self._file.flush()
+
+    def __call__(self, keyword, data, url=None):
+        self.append(keyword, data, url)
+
+    def append(self, keyword, data, url=None):
+        """追加一条原始响应"""
+        ts = time.time()
+        line = json.dumps({'ts': ts, 'keyword': keyword, 'url': url, 'data': data}, ensure_ascii=False).encode('utf-8') + b'\n'
+        with self._lock:
+            if self._file is None or self._segment_bytes >= self.segment_max_bytes:
+                self._close_segment()
+                self._open_segment()
+            self._file.write(line)
+            self._flush()
+            self._segment_bytes += len(line)
+            self.records += 1
+            with self.get_connection() as conn:
+                conn.execute("""
+                    INSERT INTO archive_index (segment, keyword, first_ts, last_ts, records) VALUES (?, ?, ?, ?, 1)
+                    ON CONFLICT (segment, keyword) DO UPDATE SET last_ts = excluded.last_ts, records = records + 1
+                """, (self._segment, keyword or '', ts, ts))
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+    def find_segments(self, keyword=None, since=None, until=None):
+        """按关键词和时间范围查找分段"""
+        conditions, params = [], []
+        if keyword:
+            conditions.append("keyword = ?")
+            params.append(keyword)
+        if since:
+            conditions.append("last_ts >= ?")
+            params.append(since)
+        if until:
+            conditions.append("first_ts <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.get_connection() as conn:
+            rows = conn.execute(f"SELECT DISTINCT segment FROM archive_index {where} ORDER BY segment", params).fetchall()
+        return [row[0] for row in rows]
+
+    def open_segment_reader(self, segment):
+        path = self.segment_dir / segment
+        if segment.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError("读取 zstd 分段需要安装 zstandard")
+            return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True), encoding='utf-8')
+        return gzip.open(path, 'rt', encoding='utf-8')
+
+    def iter_records(self, keyword=None, since=None, until=None):
+        """按关键词和时间范围遍历归档记录"""
+        for segment in self.find_segments(keyword, since, until):
+            with self.open_segment_reader(segment) as f:
+                try:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # 进程崩溃时最后一行可能不完整
+                            continue
+                        if keyword and record.get('keyword') != keyword:
+                            continue
+                        if since and record['ts'] < since:
+                            continue
+                        if until and record['ts'] > until:
+                            continue
+                        yield record
+                except EOFError:
+                    print(f"分段 {segment} 末尾不完整，已读取到最后一条完整记录")
+
+    def reprocess(self, keyword=None, since=None, until=None, fields=BASE_FIELDS):
+        """对归档响应重新提取视频字段"""
+        for record in self.iter_records(keyword, since, until):
+            for video in extract_videos(record['data'], fields):
+                video['keyword'] = record.get('keyword')
+                video['archived_at'] = record['ts']
+                yield video
+
+    def get_stats(self):
+        with self.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT keyword, COUNT(DISTINCT segment) AS segments, SUM(records) AS records,
+                       MIN(first_ts) AS first_ts, MAX(last_ts) AS last_ts
+                FROM archive_index GROUP BY keyword ORDER BY keyword
+            """).fetchall()
+        return [{
+            'keyword': row[0],
+            'segments': row[1],
+            'records': row[2],
+            'first_time': datetime.fromtimestamp(row[3]).strftime('%Y-%m-%d %H:%M:%S'),
+            'last_time': datetime.fromtimestamp(row[4]).strftime('%Y-%m-%d %H:%M:%S')
+        } for row in rows]
+
+
+def parse_time(value, end_of_day=False):
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').timestamp() + (86399 if end_of_day else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索响应归档查看与离线重处理")
+    sub = parser.add_subparsers(dest='command', required=True)
+    stats_parser = sub.add_parser('stats')
+    stats_parser.add_argument("--dir", required=True, help="归档目录")
+    reprocess_parser = sub.add_parser('reprocess')
+    reprocess_parser.add_argument("--dir", required=True, help="归档目录")
+    reprocess_parser.add_argument("--keyword")
+    reprocess_parser.add_argument("--since", help="开始日期 YYYY-MM-DD")
+    reprocess_parser.add_argument("--until", help="结束日期 YYYY-MM-DD")
+    reprocess_parser.add_argument("--extra", action='store_true', help="同时提取点赞数、发布时间等字段")
+    reprocess_parser.add_argument("--out", help="输出 JSONL 文件，默认输出到标准输出")
+    args = parser.parse_args()
+
+    archive = ResponseArchive(args.dir)
+    if args.command == 'stats':
+        print(json.dumps(archive.get_stats(), ensure_ascii=False, indent=2))
+        return
+
+    fields = BASE_FIELDS + EXTRA_FIELDS if args.extra else BASE_FIELDS
+    out = open(args.out, 'w', encoding='utf-8') if args.out else sys.stdout
+    start = time.time()
+    count = 0
+    try:
+        for video in archive.reprocess(args.keyword, parse_time(args.since), parse_time(args.until, end_of_day=True), fields):
+            out.write(json.dumps(video, ensure_ascii=False) + '\n')
+            count += 1
+    finally:
+        if args.out:
+            out.close()
+    print(f"重处理完成: {count} 个视频，耗时 {time.time() - start:.2f} 秒", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
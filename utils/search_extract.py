@@ -0,0 +1,39 @@
+"""
+搜索接口响应的字段提取，不依赖浏览器
+采集时由 ExampleUtil 调用，离线重处理归档响应时也用同一套逻辑
+"""
+
+# 采集入库使用的基础字段
+BASE_FIELDS = ('aweme_id', 'title', 'link', 'author')
+# 重处理时可额外提取的字段
+EXTRA_FIELDS = ('create_time', 'digg_count', 'comment_count', 'share_count', 'collect_count', 'duration', 'author_id')
+
+
+def extract_video(aweme_info, fields=BASE_FIELDS):
+    """从单个 aweme_info 中提取指定字段"""
+    aweme_id = aweme_info.get('aweme_id', '')
+    author = aweme_info.get('author', {}) or {}
+    statistics = aweme_info.get('statistics', {}) or {}
+    values = {
+        'aweme_id': aweme_id,
+        'title': aweme_info.get('desc', ''),
+        'link': f"https://www.douyin.com/video/{aweme_id}",
+        'author': author.get('nickname', ''),  # 添加作者昵称
+        'author_id': author.get('uid', ''),
+        'create_time': aweme_info.get('create_time'),
+        'digg_count': statistics.get('digg_count'),
+        'comment_count': statistics.get('comment_count'),
+        'share_count': statistics.get('share_count'),
+        'collect_count': statistics.get('collect_count'),
+        'duration': aweme_info.get('duration')
+    }
+    return {field: values.get(field) for field in fields}
+
+
+def extract_videos(data, fields=BASE_FIELDS):
+    """从搜索接口响应中解析视频列表（type=1 为视频）"""
+    return [
+        extract_video(item.get('aweme_info', {}) or {}, fields)
+        for item in data.get('data') or []
+        if item.get('type') == 1
+    ]
@@ -0,0 +1,267 @@
+"""
+搜索接口录制与回放
+
+录制：采集时把 aweme/v1/web/search/item 的原始响应按关键词存成 JSON 文件
+回放：本地 HTTP 替身服务提供可滚动的搜索页和搜索接口，按 offset 回放录制的数据，
+      ExampleUtil 指向本地地址即可在无头 Chromium 中离线跑完整采集流程，作为可重复的基准测试
+
+用法：
+    python -m utils.search_replay serve --dir <录制目录> --port 8765
+    python -m utils.search_replay bench --dir <录制目录> --keyword 美食
+    python -m utils.search_replay bench --synthetic 2000 --latency 50
+    python -m utils.search_replay bench --synthetic 2000 --engine http
+"""
+import os
+import re
+import json
+import time
+import random
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class SearchRecorder:
+    """把搜索接口原始响应按关键词保存，可直接作为 ExampleUtil 的响应旁路输出"""
+
+    def __init__(self, record_dir):
+        self.record_dir = Path(record_dir)
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.count = 0
+        # 文件名前缀：录制开始时间和进程号，多次录制、多个进程写同一目录也不会覆盖，按文件名排序即录制顺序
+        self.session = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        self._indexes = {}
+
+    @staticmethod
+    def safe_name(keyword):
+        return re.sub(r'[\\/:*?"<>|\s]+', '_', keyword or 'unknown')
+
+    def __call__(self, keyword, data, url=None):
+        self.record(keyword, data)
+
+    def record(self, keyword, data):
+        keyword_dir = self.record_dir / self.safe_name(keyword)
+        with self._lock:
+            if keyword_dir not in self._indexes:
+                keyword_dir.mkdir(parents=True, exist_ok=True)
+            index = self._indexes.get(keyword_dir, 0) + 1
+            self._indexes[keyword_dir] = index
+            path = keyword_dir / f'{self.session}_{index:05d}.json'
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            self.count += 1
+        return path
+
+
+class ReplayStore:
+    """
+    回放数据：同一关键词的所有录制响应按顺序展开成条目列表，按 offset/count 切片返回
+    没有该关键词的录制时使用全部录制；synthetic 大于 0 时生成假数据
+    """
+
+    def __init__(self, record_dir=None, synthetic=0):
+        self.synthetic = synthetic
+        self.items_by_keyword = {}
+        self.all_items = []
+        if record_dir:
+            self.load(Path(record_dir))
+
+    def load(self, record_dir):
+        for keyword_dir in sorted(p for p in record_dir.iterdir() if p.is_dir()):
+            items = []
+            for path in sorted(keyword_dir.glob('*.json')):
+                with open(path, 'r', encoding='utf-8') as f:
+                    items.extend(json.load(f).get('data') or [])
+            self.items_by_keyword[keyword_dir.name] = items
+            self.all_items.extend(items)
+        print(f"回放数据: {len(self.items_by_keyword)} 个关键词，{len(self.all_items)} 条")
+
+    def synthetic_items(self, keyword):
+        rng = random.Random(keyword)
+        base = 7000000000000000000 + rng.randrange(10 ** 15)
+        return [{
+            'type': 1,
+            'aweme_info': {
+                'aweme_id': str(base + i),
+                'desc': f'{keyword} 测试视频 {i}',
+                'create_time': 1700000000 + i,
+                'author': {'nickname': f'作者{i % 97}'},
+                'statistics': {'digg_count': rng.randrange(100000)}
+            }
+        } for i in range(self.synthetic)]
+
+    def get_items(self, keyword):
+        if keyword not in self.items_by_keyword:
+            safe_keyword = SearchRecorder.safe_name(keyword)
+            if safe_keyword in self.items_by_keyword:
+                return self.items_by_keyword[safe_keyword]
+            if self.synthetic:
+                self.items_by_keyword[keyword] = self.synthetic_items(keyword)
+                return self.items_by_keyword[keyword]
+            return self.all_items
+        return self.items_by_keyword[keyword]
+
+    def get_page(self, keyword, offset, count):
+        items = self.get_items(keyword)
+        page = items[offset:offset + count]
+        cursor = offset + len(page)
+        return {
+            'status_code': 0,
+            'data': page,
+            'cursor': cursor,
+            'has_more': 1 if cursor < len(items) else 0
+        }
+
+
+SEARCH_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>搜索回放</title>
+<style>
+    body { margin: 0; font-family: sans-serif; }
+    .card { height: 180px; margin: 8px; padding: 8px; border: 1px solid #ddd; }
+</style>
+</head>
+<body>
+<div id="list"></div>
+<div class="ECAcoo0p"><div class="shrAJJLa" id="noMore" style="display:none">暂时没有更多了</div></div>
+<script>
+    const keyword = __KEYWORD__;
+    const count = 10;
+    let offset = 0, loading = false, hasMore = true;
+
+    async function loadMore() {
+        if (loading || !hasMore) return;
+        loading = true;
+        try {
+            const url = `/aweme/v1/web/search/item/?keyword=${encodeURIComponent(keyword)}&offset=${offset}&count=${count}`;
+            const data = await (await fetch(url)).json();
+            offset = data.cursor;
+            hasMore = !!data.has_more;
+            const list = document.getElementById('list');
+            for (const item of data.data || []) {
+                const card = document.createElement('div');
+                card.className = 'card';
+                card.textContent = (item.aweme_info || {}).desc || '';
+                list.appendChild(card);
+            }
+            if (!hasMore) document.getElementById('noMore').style.display = 'block';
+        } finally {
+            loading = false;
+        }
+    }
+
+    window.addEventListener('scroll', () => {
+        if (window.innerHeight + window.scrollY >= document.documentElement.scrollHeight - 300) loadMore();
+    });
+    loadMore();
+</script>
+</body>
+</html>
+"""
+
+
+def create_server(store, host='127.0.0.1', port=8765, latency=0):
+    """
+    创建替身服务
+    :param latency: 搜索接口模拟的网络延迟（毫秒）
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, body, content_type):
+            body = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path.startswith('/discover/search/'):
+                keyword = unquote(url.path[len('/discover/search/'):])
+                self.send_body(SEARCH_PAGE.replace('__KEYWORD__', json.dumps(keyword)), 'text/html; charset=utf-8')
+            elif url.path.strip('/') == 'aweme/v1/web/search/item':
+                if latency:
+                    time.sleep(latency / 1000)
+                page = store.get_page(
+                    query.get('keyword', [''])[0],
+                    int(query.get('offset', ['0'])[0]),
+                    int(query.get('count', ['10'])[0])
+                )
+                self.send_body(json.dumps(page, ensure_ascii=False), 'application/json')
+            else:
+                self.send_response(404)
+                self.end_headers()
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def run_benchmark(store, keyword, latency=0, lean_mode=True, min_scroll_interval=0.1, engine='browser'):
+    """
+    启动本地替身服务，用 ExampleUtil 跑一次完整采集并返回统计
+    :param engine: browser 浏览器滚动，http 导出会话后直接请求搜索接口
+    """
+    from utils.example_util import ExampleUtil
+
+    server = create_server(store, port=0, latency=latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    batches = []
+    try:
+        with tempfile.TemporaryDirectory() as data_directory:
+            util = ExampleUtil(
+                data_directory, lean_mode=lean_mode, min_scroll_interval=min_scroll_interval,
+                response_timeout=2, max_empty_rounds=2, streaming=True,
+                base_url=base_url, channel=None
+            )
+            util.set_callback(lambda data: batches.append(len(data['videos'])) or True)
+            if engine == 'http':
+                util.get_douyinlink_list_http(keyword, 'replay', 'bench', fallback=False)
+            else:
+                util.get_douyinlink_list(keyword, 'replay', 'bench')
+            stats = util.get_stats()
+            stats['batches'] = len(batches)
+            return stats
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索接口回放服务与基准测试")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('serve', 'bench'):
+        p = sub.add_parser(name)
+        p.add_argument("--dir", help="录制目录")
+        p.add_argument("--synthetic", type=int, default=0, help="没有录制时生成的假数据条数")
+        p.add_argument("--latency", type=int, default=0, help="搜索接口模拟延迟（毫秒）")
+    sub.choices['serve'].add_argument("--host", default="127.0.0.1")
+    sub.choices['serve'].add_argument("--port", type=int, default=8765)
+    sub.choices['bench'].add_argument("--keyword", default="benchmark")
+    sub.choices['bench'].add_argument("--headed", action='store_true', help="有界面运行（默认精简无头模式）")
+    sub.choices['bench'].add_argument("--engine", choices=['browser', 'http'], default='browser', help="采集引擎")
+    args = parser.parse_args()
+
+    store = ReplayStore(args.dir, args.synthetic)
+    if args.command == 'serve':
+        server = create_server(store, args.host, args.port, args.latency)
+        print(f"回放服务: http://{args.host}:{args.port}/discover/search/<关键词>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        stats = run_benchmark(store, args.keyword, args.latency, lean_mode=not args.headed, engine=args.engine)
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
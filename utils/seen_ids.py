@@ -0,0 +1,101 @@
+import math
+import zlib
+import hashlib
+
+
+class SeenIdSet:
+    """已见视频ID集合，aweme_id 按整数保存，比保存完整视频字典省得多"""
+
+    def __init__(self):
+        self._ids = set()
+
+    @staticmethod
+    def _key(video_id):
+        try:
+            return int(video_id)
+        except (TypeError, ValueError):
+            return str(video_id)
+
+    def add(self, video_id):
+        """加入集合，已存在时返回 False"""
+        key = self._key(video_id)
+        if key in self._ids:
+            return False
+        self._ids.add(key)
+        return True
+
+    def __contains__(self, video_id):
+        return self._key(video_id) in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def to_list(self):
+        return list(self._ids)
+
+
+class BloomFilter:
+    """
+    布隆过滤器，超长时间采集时内存固定
+    有 error_rate 的误判率：新视频可能被误判为已见而跳过，不会把重复视频放过
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        """
+        :param capacity: 预计最多加入的ID数量
+        :param error_rate: 达到 capacity 时的误判率
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, video_id):
+        digest = hashlib.blake2b(str(video_id).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, video_id):
+        """加入过滤器，判断为已存在时返回 False"""
+        added = False
+        for pos in self._positions(video_id):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, video_id):
+        for pos in self._positions(video_id):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def to_bytes(self):
+        """压缩后的位数组，用于保存断点"""
+        return zlib.compress(bytes(self.bits))
+
+    def load_bytes(self, data, count=0):
+        """合并断点中保存的位数组，容量或误判率不同导致长度不一致时抛出 ValueError"""
+        bits = zlib.decompress(data)
+        if len(bits) != len(self.bits):
+            raise ValueError(f"布隆过滤器大小不一致: {len(bits)} != {len(self.bits)}")
+        merged = int.from_bytes(self.bits, 'little') | int.from_bytes(bits, 'little')
+        self.bits = bytearray(merged.to_bytes(len(bits), 'little'))
+        self.count += count
+
+
+def create_seen_ids(kind='set', capacity=1000000, error_rate=0.001):
+    """按类型创建已见ID容器：set 精确去重，bloom 固定内存"""
+    if kind == 'bloom':
+        return BloomFilter(capacity, error_rate)
+    return SeenIdSet()
@@ -0,0 +1,449 @@
+"""
+统一的任务监控窗口
+
+原来每个需要控制窗口的任务都新建一个 webview 窗口，并靠 webview.windows[1] 定位，
+同时运行多个任务时窗口互相抢占。现在所有 runner 任务登记到同一个监控窗口：
+每个任务一行，可以单独暂停/继续/停止；一个汇总线程在任意任务状态变化时把整张列表推送给页面。
+"""
+import json
+import time
+import threading
+
+import webview
+
+
+# 推送合并间隔（秒）：间隔内的多次状态变化合并成一次 evaluate_js
+PUSH_BATCH_INTERVAL = 0.25
+# 已完成或已退出的任务在列表中保留的时间（秒）
+FINISHED_LINGER = 3
+# 发出停止指令后等待 runner 自行收尾退出的时间（秒），超过才结束进程组
+STOP_GRACE = 15
+
+
+class TaskDashboard:
+    """所有 runner 任务共用的监控窗口和状态汇总线程"""
+
+    def __init__(self):
+        self.tasks = {}
+        self.window = None
+        self._lock = threading.RLock()
+        self._dirty = threading.Event()
+        self._aggregator = None
+        self._finished_at = {}
+        self._stopping = {}
+        self._rows = []
+        self._reloaded = False
+
+    def add_task(self, task):
+        """登记任务（MainProcessControlWindow），必要时打开监控窗口"""
+        with self._lock:
+            self.tasks[task.task_id] = task
+            self._ensure_window()
+            if self._aggregator is None:
+                self._aggregator = threading.Thread(target=self._aggregate_loop, daemon=True)
+                self._aggregator.start()
+        threading.Thread(target=self._watch_task, args=(task,), daemon=True).start()
+        self._dirty.set()
+
+    def stop_task(self, task_id):
+        """发出停止指令：任务留在列表中，直到 runner 自行退出，或超过 STOP_GRACE 秒后结束进程组"""
+        task = self.get_task(task_id)
+        if task:
+            task.stop()
+            with self._lock:
+                self._stopping.setdefault(task_id, time.time())
+        self._dirty.set()
+        return task
+
+    def remove_task(self, task_id, stop_timeout=None):
+        """
+        移出列表并清理控制块
+        :param stop_timeout: 为 None 时不结束进程，等 runner 自行退出后清理；
+                             否则最多再等 stop_timeout 秒，仍未退出则结束整个进程组
+        """
+        with self._lock:
+            task = self.tasks.pop(task_id, None)
+            self._finished_at.pop(task_id, None)
+            self._stopping.pop(task_id, None)
+        if task:
+            if stop_timeout is None:
+                threading.Thread(target=task._release, daemon=True).start()
+            else:
+                threading.Thread(target=task._stop_process, kwargs={'timeout': stop_timeout}, daemon=True).start()
+        self._dirty.set()
+
+    def get_task(self, task_id):
+        with self._lock:
+            return self.tasks.get(task_id)
+
+    def _watch_task(self, task):
+        """阻塞在任务控制块的状态门铃上，状态变化时通知汇总线程"""
+        seq = None
+        while self.get_task(task.task_id) is task:
+            try:
+                seq, _ = task.control_block.wait_status(seq, timeout=1.0)
+            except Exception:
+                # 控制块已清理
+                break
+            self._dirty.set()
+
+    def snapshot(self):
+        """
+        所有任务的当前状态，只在汇总线程中调用，结果缓存在 self._rows 供页面查询
+        - 进程已退出或任务已完成：保留 FINISHED_LINGER 秒后移出列表，只清理控制块，不结束进程
+        - 已停止但进程仍在运行：保留到 STOP_GRACE 秒后结束进程组
+        """
+        with self._lock:
+            tasks = list(self.tasks.values())
+            stopping = dict(self._stopping)
+        now = time.time()
+        rows = []
+        for task in tasks:
+            status = task.check_task_status()
+            exited = task.process is not None and task.process.poll() is not None
+            stop_at = stopping.get(task.task_id)
+            if not exited and stop_at is not None and now - stop_at >= STOP_GRACE:
+                print(f"任务 {task.task_id} 停止后 {STOP_GRACE} 秒仍未退出，结束进程组")
+                self.remove_task(task.task_id, stop_timeout=0)
+                continue
+            if status.get('action') == 'completed' or exited:
+                with self._lock:
+                    finished_at = self._finished_at.setdefault(task.task_id, now)
+                if now - finished_at >= FINISHED_LINGER:
+                    self.remove_task(task.task_id)
+                    continue
+            rows.append(dict(status, id=task.task_id, title=task.title, start_time=task.start_time,
+                             exited=exited, stopping=stop_at is not None and not exited))
+        with self._lock:
+            self._rows = rows
+        return rows
+
+    def get_rows(self):
+        """汇总线程最近一次得到的任务列表"""
+        with self._lock:
+            return list(self._rows)
+
+    def _aggregate_loop(self, batch_interval=PUSH_BATCH_INTERVAL):
+        """
+        任意任务状态变化（或每秒一次，用于发现暂停/退出）时汇总一次，列表有变化才推送；
+        推送后等待 batch_interval，期间的变化合并到下一次推送。没有任务时关闭窗口并退出
+        """
+        last_payload = None
+        while True:
+            self._dirty.wait(1.0)
+            self._dirty.clear()
+            rows = self.snapshot()
+            with self._lock:
+                if not self.tasks:
+                    self._aggregator = None
+                    window, self.window = self.window, None
+                    break
+                window = self.window
+                if self._reloaded:
+                    # 页面（重新）加载后列表为空，需要完整推送一次
+                    self._reloaded = False
+                    last_payload = None
+            payload = json.dumps(rows, ensure_ascii=False)
+            if payload == last_payload or window is None:
+                continue
+            last_payload = payload
+            try:
+                window.evaluate_js(f"window.applyTasks && window.applyTasks({payload})")
+            except Exception as e:
+                print(f"推送任务列表失败: {e}")
+            time.sleep(batch_interval)
+        # 锁外关闭窗口：destroy 要等界面线程处理
+        self._close_window(window)
+
+    def _ensure_window(self):
+        if self.window is not None:
+            return
+        dashboard_ref = self
+
+        class Api:
+            def get_tasks(self):
+                """页面就绪时主动取一次任务列表，之后只接收推送"""
+                return dashboard_ref.get_rows()
+
+            def pause_task(self, task_id):
+                task = dashboard_ref.get_task(task_id)
+                if task:
+                    task.pause()
+                    dashboard_ref._dirty.set()
+                return {'success': bool(task)}
+
+            def resume_task(self, task_id):
+                task = dashboard_ref.get_task(task_id)
+                if task:
+                    task.resume()
+                    dashboard_ref._dirty.set()
+                return {'success': bool(task)}
+
+            def stop_task(self, task_id):
+                task = dashboard_ref.stop_task(task_id)
+                return {'success': bool(task)}
+
+        self.window = webview.create_window(
+            "任务监控",
+            html=self._get_html_content(),
+            width=520,
+            height=360,
+            on_top=True,
+            js_api=Api()
+        )
+        self.window.events.loaded += self._on_loaded
+        self.window.events.closed += self._on_closed
+
+        if len(webview.windows) > 1:
+            # 主界面已在运行：任务期间最小化主窗口
+            try:
+                webview.windows[0].minimize()
+            except Exception as e:
+                print(f"最小化主窗口失败: {e}")
+        else:
+            threading.Thread(target=webview.start, kwargs={'debug': False}, daemon=True).start()
+
+    def _on_loaded(self):
+        self._reloaded = True
+        self._dirty.set()
+
+    def _on_closed(self):
+        """用户关闭监控窗口：和原来关闭控制窗口一样，停止其中所有任务（窗口已关，宽限时间在后台等）"""
+        with self._lock:
+            self.window = None
+            task_ids = list(self.tasks)
+        for task_id in task_ids:
+            self.stop_task(task_id)
+            self.remove_task(task_id, stop_timeout=STOP_GRACE)
+        self._restore_main_window()
+
+    def _close_window(self, window):
+        """所有任务结束后关闭监控窗口（不触发“用户关闭”的处理）"""
+        if window is None:
+            return
+        try:
+            window.events.closed -= self._on_closed
+            window.destroy()
+        except Exception as e:
+            print(f"关闭监控窗口失败: {e}")
+        self._restore_main_window()
+
+    @staticmethod
+    def _restore_main_window():
+        try:
+            if len(webview.windows) > 0:
+                webview.windows[0].restore()
+                webview.windows[0].maximize()
+        except Exception as e:
+            print(f"恢复主窗口失败: {e}")
+
+    def _get_html_content(self):
+        """监控窗口HTML：任务列表由 applyTasks 渲染"""
+        return """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                * {
+                    margin: 0;
+                    padding: 0;
+                    box-sizing: border-box;
+                    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
+                    font-size: 12px;
+                }
+
+                body {
+                    padding: 8px;
+                    background: #f5f5f5;
+                    user-select: none;
+                }
+
+                .empty {
+                    color: #999;
+                    text-align: center;
+                    padding: 24px 0;
+                }
+
+                .task {
+                    background: #fff;
+                    border-radius: 6px;
+                    padding: 10px 12px;
+                    margin-bottom: 8px;
+                    box-shadow: 0 1px 4px rgba(0, 0, 0, 0.08);
+                }
+
+                .task-header {
+                    display: flex;
+                    justify-content: space-between;
+                    align-items: center;
+                }
+
+                .task-title {
+                    color: #333;
+                    font-weight: 500;
+                }
+
+                .timer {
+                    color: #666;
+                    font-family: monospace;
+                }
+
+                .status {
+                    color: #666;
+                    margin: 6px 0 4px;
+                    line-height: 1.5;
+                }
+
+                .task-info {
+                    font-size: 11px;
+                    color: #888;
+                }
+
+                .button-group {
+                    display: flex;
+                    gap: 4px;
+                    justify-content: flex-end;
+                    margin-top: 6px;
+                }
+
+                .control-btn {
+                    padding: 4px 14px;
+                    border: none;
+                    border-radius: 4px;
+                    cursor: pointer;
+                    color: white;
+                }
+
+                .control-btn:hover {
+                    opacity: 0.9;
+                }
+
+                .control-btn.running {
+                    background: #faad14;
+                }
+
+                .control-btn.paused {
+                    background: #1890ff;
+                }
+
+                .control-btn.stop {
+                    background: #ff4d4f;
+                }
+            </style>
+        </head>
+        <body>
+            <div id="task-list"><div class="empty">暂无运行中的任务</div></div>
+            <script>
+                let tasks = [];
+
+                function escapeHtml(text) {
+                    const div = document.createElement('div');
+                    div.textContent = text == null ? '' : String(text);
+                    return div.innerHTML;
+                }
+
+                // 结构化进度：阶段、已处理/总数、速率、预计剩余时间
+                function formatProgress(progress) {
+                    if (!progress) return '';
+                    const parts = [];
+                    if (progress.stage) parts.push(progress.stage);
+                    if (progress.total) parts.push(`${progress.processed || 0}/${progress.total}`);
+                    if (progress.rate) parts.push(`${progress.rate}/秒`);
+                    if (progress.eta) parts.push(`剩余 ${Math.floor(progress.eta / 60)}分${progress.eta % 60}秒`);
+                    return parts.length ? ` (${parts.join(' · ')})` : '';
+                }
+
+                // 入库流水线吞吐统计
+                function formatMetrics(metrics) {
+                    if (!metrics) return '';
+                    return `接收 ${metrics.received} (${metrics.received_per_sec}/秒) · ` +
+                        `入库 ${metrics.written} (${metrics.written_per_sec}/秒) · ` +
+                        `队列 ${metrics.queue_size} · 丢弃 ${metrics.dropped} · ` +
+                        `批次 ${metrics.batches} (${metrics.avg_batch_ms}ms)`;
+                }
+
+                function formatElapsed(startTime) {
+                    const diff = Math.max(0, Math.floor(Date.now() / 1000 - startTime));
+                    const pad = n => n.toString().padStart(2, '0');
+                    return `${pad(Math.floor(diff / 3600))}:${pad(Math.floor(diff % 3600 / 60))}:${pad(diff % 60)}`;
+                }
+
+                function statusText(task) {
+                    const info = task.task_info || {};
+                    if (task.action === 'completed') return '🎉 ' + (info.status || '任务已完成');
+                    if (task.exited) return '任务进程已退出';
+                    if (task.stopping) return '正在停止，等待任务收尾...';
+                    if (task.status === 'paused') return '任务已暂停';
+                    return (info.status || '准备开始处理任务...') + formatProgress(info.progress);
+                }
+
+                // 由 Python 端在任意任务状态变化时推送整张列表
+                function applyTasks(list) {
+                    tasks = list || [];
+                    const container = document.getElementById('task-list');
+                    if (!tasks.length) {
+                        container.innerHTML = '<div class="empty">暂无运行中的任务</div>';
+                        return;
+                    }
+                    container.innerHTML = tasks.map(function(task) {
+                        const info = task.task_info || {};
+                        const title = info.task_type ? `${info.task_type} - ${task.title}` : task.title;
+                        const finished = task.action === 'completed' || task.exited || task.stopping;
+                        const paused = task.status === 'paused';
+                        const buttons = finished ? '' :
+                            `<button class="control-btn ${paused ? 'paused' : 'running'}" data-action="${paused ? 'resume' : 'pause'}" data-id="${task.id}">${paused ? '继续' : '暂停'}</button>` +
+                            `<button class="control-btn stop" data-action="stop" data-id="${task.id}">停止</button>`;
+                        return `<div class="task">
+                            <div class="task-header">
+                                <span class="task-title">${escapeHtml(title)}</span>
+                                <span class="timer" data-start="${task.start_time}">${formatElapsed(task.start_time)}</span>
+                            </div>
+                            <div class="status">${escapeHtml(statusText(task))}</div>
+                            <div class="task-info">${escapeHtml(formatMetrics(info.metrics))}</div>
+                            <div class="button-group">${buttons}</div>
+                        </div>`;
+                    }).join('');
+                }
+                window.applyTasks = applyTasks;
+
+                // 计时在页面本地刷新，不经过 JS 桥
+                setInterval(function() {
+                    document.querySelectorAll('.timer').forEach(function(el) {
+                        el.textContent = formatElapsed(parseFloat(el.dataset.start));
+                    });
+                }, 1000);
+
+                document.getElementById('task-list').addEventListener('click', function(e) {
+                    const btn = e.target.closest('button[data-action]');
+                    if (!btn || !(window.pywebview && window.pywebview.api)) return;
+                    const id = btn.dataset.id;
+                    btn.disabled = true;
+                    if (btn.dataset.action === 'pause') {
+                        pywebview.api.pause_task(id);
+                    } else if (btn.dataset.action === 'resume') {
+                        pywebview.api.resume_task(id);
+                    } else if (btn.dataset.action === 'stop') {
+                        pywebview.api.stop_task(id);
+                    }
+                });
+
+                window.addEventListener('pywebviewready', function() {
+                    pywebview.api.get_tasks().then(applyTasks);
+                });
+            </script>
+        </body>
+        </html>
+        """
+
+
+_dashboard = None
+_dashboard_lock = threading.Lock()
+
+
+def get_dashboard():
+    """主进程中唯一的任务监控窗口"""
+    global _dashboard
+    with _dashboard_lock:
+        if _dashboard is None:
+            _dashboard = TaskDashboard()
+        return _dashboard
@@ -1,63 +1,193 @@
 import os
-import json
+import copy
 import time
-from pathlib import Path
+import threading
+from collections import deque
+
+try:
+    from utils.control_block import open_control_block
+except ImportError:
+    from control_block import open_control_block
+
+# 两次写入状态区的最小间隔（秒）：间隔内的更新合并，控制窗口总能看到最后一次
+DEFAULT_MIN_INTERVAL = 0.5
+# 进度采样写库的间隔（秒）
+DEFAULT_SAMPLE_INTERVAL = 5
+# 计算速率的滑动窗口（秒）
+RATE_WINDOW = 30
+
 
 class TaskProgressManager:
-    """任务进度管理器 - 简化版，只更新状态文本"""
-    
-    def __init__(self):
-        self.control_file = os.environ.get('PROCESS_CONTROL_FILE')
+    """任务进度管理器：状态文本、结构化进度（已处理/总数/速率/剩余时间/阶段）和吞吐统计"""
+
+    def __init__(self, plugin_name=None, data_directory=None,
+                 min_interval=DEFAULT_MIN_INTERVAL, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        """
+        :param plugin_name, data_directory: 传入时把进度采样写入 task_progress_sample 表
+        :param min_interval: 状态合并间隔，0 表示每次更新都写
+        :param sample_interval: 采样间隔，运行结束后可按 run_id 取出吞吐曲线
+        """
+        # 主进程创建的控制块，进度写入状态区；不是从控制窗口启动时为 None
+        self.control_block = open_control_block()
         self.task_info = {}
-        
+        self.min_interval = min_interval
+        self.sample_interval = sample_interval
+        self.sample_model = None
+        if plugin_name and data_directory:
+            from models.progress_sample_model import ProgressSampleModel
+            self.sample_model = ProgressSampleModel(plugin_name, data_directory)
+        self.run_id = None
+
+        # task_info 的修改和状态区写入都在锁内，写线程、定时器线程和任务线程可以同时更新进度
+        self._lock = threading.RLock()
+        self._last_publish = 0
+        self._pending = None
+        self._flush_timer = None
+        self._last_sample = 0
+        self._rate_points = deque()
+
     def init_task(self, task_type, description=""):
         """初始化任务 - 简化版"""
-        self.task_info = {
-            'task_type': task_type,
-            'status': f"准备开始 {task_type}...",
-            'start_time': time.time()
-        }
-        
-        self._update_control_file({
-            'action': 'running',
-            'status': 'running',
-            'task_info': self.task_info,
-            'timestamp': time.time()
-        })
-    
+        start_time = time.time()
+        with self._lock:
+            self.run_id = f"{int(start_time * 1000)}-{os.getpid()}"
+            self._rate_points.clear()
+            self._last_sample = 0
+            self.task_info = {
+                'task_type': task_type,
+                'status': f"准备开始 {task_type}...",
+                'start_time': start_time,
+                'run_id': self.run_id
+            }
+            self._update_status(self._status_data('running'), force=True)
+
     def update_status(self, status_text):
         """更新状态文本 - 简化版"""
-        self.task_info['status'] = status_text
-        
-        self._update_control_file({
-            'action': 'running',
-            'status': 'running',
-            'task_info': self.task_info,
-            'timestamp': time.time()
-        })
-    
+        with self._lock:
+            self.task_info['status'] = status_text
+            self._update_status(self._status_data('running'))
+
+    def update_progress(self, processed=None, total=None, stage=None, status_text=None, metrics=None):
+        """
+        更新结构化进度，速率按最近 RATE_WINDOW 秒计算，有总数时给出剩余时间
+        :param processed: 已处理数量（累计值）
+        :param total: 总数，未知时不传
+        :param stage: 当前阶段，例如 采集/入库/收尾
+        :param metrics: 吞吐统计（如入库流水线的 stats），控制窗口在状态下方显示
+        """
+        now = time.time()
+        sample = None
+        with self._lock:
+            progress = dict(self.task_info.get('progress') or {})
+            if processed is not None:
+                progress['processed'] = processed
+                self._rate_points.append((now, processed))
+                while len(self._rate_points) > 2 and now - self._rate_points[0][0] > RATE_WINDOW:
+                    self._rate_points.popleft()
+            if total is not None:
+                progress['total'] = total
+            if stage is not None:
+                progress['stage'] = stage
+
+            rate = 0
+            if len(self._rate_points) >= 2:
+                (t0, p0), (t1, p1) = self._rate_points[0], self._rate_points[-1]
+                if t1 > t0:
+                    rate = (p1 - p0) / (t1 - t0)
+            progress['rate'] = round(rate, 2)
+            remaining = (progress.get('total') or 0) - progress.get('processed', 0)
+            progress['eta'] = round(remaining / rate) if rate > 0 and remaining > 0 else None
+
+            self.task_info['progress'] = progress
+            if status_text is not None:
+                self.task_info['status'] = status_text
+            if metrics is not None:
+                self.task_info['metrics'] = metrics
+
+            if self.sample_model and now - self._last_sample >= self.sample_interval:
+                self._last_sample = now
+                sample = (progress, self.task_info.get('task_type'), self.task_info.get('start_time', now))
+
+            self._update_status(self._status_data('running'))
+
+        if sample:
+            self._save_sample(*sample, now)
+
     def complete_task(self, final_message):
         """完成任务 - 简化版"""
-        self.task_info.update({
-            'status': final_message,
-            'end_time': time.time()
-        })
-        
-        self._update_control_file({
-            'action': 'completed',
-            'status': 'completed',
-            'task_info': self.task_info,
-            'auto_close': True,
+        now = time.time()
+        with self._lock:
+            self.task_info.update({
+                'status': final_message,
+                'end_time': now
+            })
+            progress = self.task_info.get('progress')
+            sample = (progress, self.task_info.get('task_type'), self.task_info.get('start_time', now)) if progress else None
+            self._update_status(self._status_data('completed', auto_close=True), force=True)
+
+        if self.sample_model and sample:
+            self._save_sample(*sample, now)
+
+    def _status_data(self, action, **extra):
+        """
+        要写入状态区的数据，task_info 复制一份，需在持有锁时调用
+        合并中的状态由定时器线程写出，不能引用之后还会被修改的 task_info
+        """
+        if not self.control_block:
+            return None
+        data = {
+            'action': action,
+            'status': action,
+            'task_info': copy.deepcopy(self.task_info),
             'timestamp': time.time()
-        })
-    
-    def _update_control_file(self, data):
-        """更新控制文件"""
-        if not self.control_file:
+        }
+        data.update(extra)
+        return data
+
+    def _save_sample(self, progress, task_type, start_time, now):
+        try:
+            self.sample_model.add_samples([(
+                self.run_id, task_type, now,
+                round(now - start_time, 3),
+                progress.get('processed'), progress.get('total'), progress.get('rate'), progress.get('stage')
+            )])
+        except Exception as e:
+            print(f"保存进度采样失败: {e}")
+
+    def _update_status(self, data, force=False):
+        """
+        更新控制块的状态区，控制窗口读到的总是完整的一次写入
+        min_interval 内的多次更新合并为一次，最后一次由定时器补写，不会丢
+        """
+        if not self.control_block:
             return
-            
+
+        with self._lock:
+            now = time.time()
+            wait = self.min_interval - (now - self._last_publish)
+            if not force and wait > 0:
+                self._pending = data
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(wait, self._flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._pending = None
+            self._write(data, now)
+
+    def _flush(self):
+        with self._lock:
+            self._flush_timer = None
+            data, self._pending = self._pending, None
+            if data is not None:
+                self._write(data, time.time())
+
+    def _write(self, data, now):
+        self._last_publish = now
         try:
-            with open(self.control_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False)
+            self.control_block.write_status(data)
         except Exception as e:
-            print(f"更新控制文件失败: {e}")
\ No newline at end of file
+            print(f"更新任务状态失败: {e}")
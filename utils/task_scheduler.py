@@ -2,20 +2,53 @@
 from datetime import datetime
 import importlib
 import json
+import threading
 import traceback
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from models.task_model import TaskModel
 from models.runlog_model import RunlogModel
+from models.maintenance_model import MaintenanceModel
+from models.backup_model import BackupModel
+from models.changelog_model import ChangeLogModel
+from models.archive_model import ArchiveModel
+from utils.browser_pool import BrowserPool
+
+
+# 内置任务：不对应 tasks 表中的记录，运行日志 task_id 记为 0
+BUILTIN_TASK_ID = 0
+# 数据库维护在凌晨低峰期执行（分 时 日 月 周）
+MAINTENANCE_CRON = "30 3 * * *"
+MAINTENANCE_JOB_ID = "builtin_db_maintenance"
+# 数据库快照每6小时一次，分步复制不阻塞采集写入
+BACKUP_CRON = "0 */6 * * *"
+BACKUP_JOB_ID = "builtin_db_backup"
+# 每天凌晨把超过 ARCHIVE_DAYS 天的采集数据搬到按月归档库
+ARCHIVE_CRON = "0 3 * * *"
+ARCHIVE_JOB_ID = "builtin_db_archive"
+ARCHIVE_DAYS = 90
+# 每5分钟关闭空闲超时或需要回收的常驻浏览器
+BROWSER_POOL_CRON = "*/5 * * * *"
+BROWSER_POOL_JOB_ID = "builtin_browser_pool_reap"
+BUILTIN_JOB_IDS = (MAINTENANCE_JOB_ID, BACKUP_JOB_ID, ARCHIVE_JOB_ID, BROWSER_POOL_JOB_ID)
+
 
 class TaskScheduler:
-    def __init__(self, plugin_name, data_directory):
+    def __init__(self, plugin_name, data_directory, builtin_jobs=False):
+        """
+        :param builtin_jobs: 是否注册内置任务（维护/快照/归档/回收浏览器）
+                             只有主进程中常驻的调度器（start_main_scheduler）注册，
+                             runner 子进程每次调用都会新建 TaskController，其中的调度器不注册
+        """
         self.plugin_name = plugin_name
         self.data_directory = data_directory
         self.scheduler = BackgroundScheduler()
         self.scheduler.start()
         self.task_model = TaskModel(plugin_name, data_directory)
         self.runlog_model=RunlogModel(plugin_name, data_directory)
+        # 内置任务用到的模型在任务函数中按需创建，runner 中的 TaskController 不为它们建表、打开数据库
+        self.builtin_jobs = builtin_jobs
+        self.register_builtin_jobs()
 
     def load_tasks_from_db(self):
         tasks = self.task_model.get_enabled_tasks()
@@ -23,6 +56,135 @@ class TaskScheduler:
             self.add_task_to_scheduler(task)
 
 
+    def build_cron_trigger(self, freq_value):
+        """将5段cron表达式转换为CronTrigger"""
+        cron_parts = freq_value.split()
+        # 兼容性处理，防止少参数
+        while len(cron_parts) < 5:
+            cron_parts.append('*')
+        
+        return CronTrigger(
+                minute=cron_parts[0],
+                hour=cron_parts[1],
+                day=cron_parts[2],
+                month=cron_parts[3],
+                day_of_week=cron_parts[4]
+            )
+
+
+    def register_builtin_jobs(self):
+        """注册内置任务（数据库维护等）"""
+        if not self.builtin_jobs:
+            return
+        print(f"【定时任务】注册内置任务: 数据库维护 ({MAINTENANCE_CRON})")
+        self.scheduler.add_job(
+            func=self.run_maintenance_job,
+            trigger=self.build_cron_trigger(MAINTENANCE_CRON),
+            id=MAINTENANCE_JOB_ID,
+            replace_existing=True
+        )
+        
+        print(f"【定时任务】注册内置任务: 数据库快照 ({BACKUP_CRON})")
+        self.scheduler.add_job(
+            func=self.run_backup_job,
+            trigger=self.build_cron_trigger(BACKUP_CRON),
+            id=BACKUP_JOB_ID,
+            replace_existing=True
+        )
+        
+        print(f"【定时任务】注册内置任务: 历史数据归档 ({ARCHIVE_CRON})")
+        self.scheduler.add_job(
+            func=self.run_archive_job,
+            trigger=self.build_cron_trigger(ARCHIVE_CRON),
+            id=ARCHIVE_JOB_ID,
+            replace_existing=True
+        )
+        
+        print(f"【定时任务】注册内置任务: 回收空闲浏览器 ({BROWSER_POOL_CRON})")
+        self.scheduler.add_job(
+            func=self.run_browser_pool_job,
+            trigger=self.build_cron_trigger(BROWSER_POOL_CRON),
+            id=BROWSER_POOL_JOB_ID,
+            replace_existing=True
+        )
+
+
+    def run_maintenance_job(self, full=False):
+        """执行数据库维护，并把维护前后的统计记录到运行日志；full 时执行完整 VACUUM"""
+        print(f"【定时任务】执行数据库维护{'（完整）' if full else ''}")
+        start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        result = "成功"
+        log_text = ""
+        try:
+            # 先裁剪变更日志，再整理数据库回收空间
+            maintenance_model = MaintenanceModel(self.plugin_name, self.data_directory)
+            pruned = ChangeLogModel(self.plugin_name, self.data_directory).prune()
+            results = maintenance_model.run_maintenance(full)
+            log_text = maintenance_model.format_results(results)
+            log_text += f"裁剪变更日志 {pruned} 条\n"
+            if not all(item['success'] for item in results):
+                result = "失败"
+        except Exception as e:
+            result = "失败"
+            log_text += f"数据库维护失败: {str(e)}\n{traceback.format_exc()}"
+            print(f"【定时任务】数据库维护异常: {str(e)}")
+        finally:
+            self.save_run_log(BUILTIN_TASK_ID, result, log_text, start_time)
+        return {'result': result, 'log': log_text}
+
+
+    def run_archive_job(self, days=ARCHIVE_DAYS):
+        """归档超过 days 天的采集数据，结果记录到运行日志"""
+        print(f"【定时任务】执行历史数据归档: {days} 天前")
+        start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        result = "成功"
+        log_text = ""
+        try:
+            archive_model = ArchiveModel(self.plugin_name, self.data_directory)
+            results = archive_model.archive_older_than(days)
+            log_text = archive_model.format_results(results, days)
+            if any('error' in months for months in results.values()):
+                result = "失败"
+        except Exception as e:
+            result = "失败"
+            log_text += f"历史数据归档失败: {str(e)}\n{traceback.format_exc()}"
+            print(f"【定时任务】历史数据归档异常: {str(e)}")
+        finally:
+            self.save_run_log(BUILTIN_TASK_ID, result, log_text, start_time)
+        return {'result': result, 'log': log_text}
+
+
+    def run_browser_pool_job(self):
+        """关闭空闲的常驻浏览器；执行频繁，只在有关闭时打印，不写运行日志"""
+        try:
+            closed = BrowserPool(self.data_directory).reap_idle()
+            if closed:
+                print(f"【定时任务】回收空闲浏览器 {closed} 个")
+        except Exception as e:
+            print(f"【定时任务】回收空闲浏览器异常: {str(e)}")
+
+
+    def run_backup_job(self):
+        """创建数据库快照并轮换旧快照，结果记录到运行日志"""
+        print("【定时任务】执行数据库快照")
+        start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        result = "成功"
+        log_text = ""
+        try:
+            backup_model = BackupModel(self.plugin_name, self.data_directory)
+            results = backup_model.create_snapshot()
+            log_text = backup_model.format_results(results)
+            if not all(item['success'] for item in results):
+                result = "失败"
+        except Exception as e:
+            result = "失败"
+            log_text += f"数据库快照失败: {str(e)}\n{traceback.format_exc()}"
+            print(f"【定时任务】数据库快照异常: {str(e)}")
+        finally:
+            self.save_run_log(BUILTIN_TASK_ID, result, log_text, start_time)
+        return {'result': result, 'log': log_text}
+
+
     def add_task_to_scheduler(self, task):
         print(f"【定时任务】添加任务: {task['name']}，应用: {task['app']}")
         job_id = str(task['id'])
@@ -34,19 +196,7 @@ class TaskScheduler:
          
         print("task['freq_value']",task['freq_value'])
         
-        cron_parts = task['freq_value'].split()
-            # 兼容性处理，防止少参数
-        while len(cron_parts) < 5:
-            cron_parts.append('*')
-        
-        
-        trigger = CronTrigger(
-                minute=cron_parts[0],
-                hour=cron_parts[1],
-                day=cron_parts[2],
-                month=cron_parts[3],
-                day_of_week=cron_parts[4]
-            )
+        trigger = self.build_cron_trigger(task['freq_value'])
         
          
         self.scheduler.add_job(
@@ -121,6 +271,7 @@ class TaskScheduler:
 
     def reload_tasks(self):
         self.scheduler.remove_all_jobs()
+        self.register_builtin_jobs()
         self.load_tasks_from_db()
         
         
@@ -140,4 +291,20 @@ class TaskScheduler:
             self.runlog_model.add_log(log_data)
             print(f"【定时任务】日志已记录: task_id={task_id}, result={result}")
         except Exception as e:
-            print(f"【定时任务】记录日志失败: {e}")
\ No newline at end of file
+            print(f"【定时任务】记录日志失败: {e}")
+
+
+_main_scheduler = None
+_main_scheduler_lock = threading.Lock()
+
+
+def start_main_scheduler(plugin_name, data_directory):
+    """
+    主进程（界面/插件宿主）中常驻的调度器，进程内只创建一次
+    注册内置任务：数据库维护（含裁剪变更日志）、快照、归档、回收空闲常驻浏览器
+    """
+    global _main_scheduler
+    with _main_scheduler_lock:
+        if _main_scheduler is None:
+            _main_scheduler = TaskScheduler(plugin_name, data_directory, builtin_jobs=True)
+        return _main_scheduler